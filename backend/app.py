@@ -10,25 +10,68 @@ FastAPI 后端应用：
 如果未来调整了前端目录结构，请同步更新 FRONTEND_DIST_DIR 的路径逻辑。
 """
 
+import asyncio
 import os
 import sys
-from fastapi import FastAPI, UploadFile, File, HTTPException, Depends, BackgroundTasks
-from fastapi.responses import FileResponse
-from fastapi.staticfiles import StaticFiles
-from sqlmodel import Session, select
+import threading
+from typing import Literal, Optional
+from fastapi import FastAPI, UploadFile, File, HTTPException, Depends, BackgroundTasks, Query, Request, Header
+from fastapi.responses import FileResponse, Response
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers
+from sqlmodel import Session, func, select
+from . import json_codec
 from .database import create_db_and_tables, get_session
-from .models import Course, Chapter, Quiz, Question, QuizReadWithQuestions, ChapterRead, MistakeRecord
-from .services import parse_chapters_from_pdf, generate_quiz_for_chapter, save_quiz_to_db
+from .models import Course, Chapter, Quiz, Question, QuizReadWithQuestions, ChapterRead, MistakeRecord, Section, SectionRead
+from .services import (
+    generate_quiz_for_chapter,
+    parse_chapters_from_pdf,
+    save_chapter,
+    save_quiz_to_db,
+    select_generation_sections,
+)
+from .dedup import invalidate_course_index
+from .llm_usage import course_usage, llm_context
+from . import metrics
+from .profiling import (
+    PROFILING_ENABLED,
+    ProfilingMiddleware,
+    check_token,
+    list_profiles,
+    profile_path,
+    profile_task,
+    profiling_state,
+    set_profiling,
+)
+from .tracing import load_traces, span, trace, waterfall
+from .search import search
+from .quiz_cache import get_chapter_quiz_payload, invalidate_chapter_quiz
+from .exports import get_course_export_job, safe_filename, start_course_export, submit_chapter_export
+from .static_files import (
+    CompressedStaticFiles,
+    QuestionsStaticFiles,
+    etag_matches,
+    spa_index_response,
+    warm_asset_cache,
+)
 import shutil
 from pathlib import Path
 from datetime import datetime
 
 # === 创建 FastAPI 实例 ===
-app = FastAPI(title="AI 学习助手 Backend")
+# 默认使用 orjson（若已安装）序列化所有 JSON 响应
+app = FastAPI(title="AI 学习助手 Backend", default_response_class=json_codec.FastJSONResponse)
+# 按路由记录请求耗时，由 GET /metrics 输出
+app.add_middleware(metrics.MetricsMiddleware)
+# X-Profile 请求头或全局开关打开时剖析请求（见 profiling.py），只在 PROFILING_ENABLED=1 时挂载
+if PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware)
 
 @app.on_event("startup")
 def on_startup():
     create_db_and_tables()
+    # 前端目录诊断信息与预加载、压缩前端产物放到后台线程，不阻塞服务启动
+    threading.Thread(target=warm_frontend_cache, daemon=True).start()
 
 
 # === 静态文件 & 前端托管 ===
@@ -50,62 +93,73 @@ def resolve_frontend_dist_dir() -> str:
 
 FRONTEND_DIST_DIR = resolve_frontend_dist_dir()
 
-# 打印调试信息（在打包后的 exe 中也能看到）
-print(f"[INFO] Frontend dist directory: {FRONTEND_DIST_DIR}")
-print(f"[INFO] Directory exists: {os.path.isdir(FRONTEND_DIST_DIR)}")
-
-if not os.path.isdir(FRONTEND_DIST_DIR):
-    # 如果目录不存在，不要让应用崩掉，只提示一下
-    print(
-        f"[WARN] Frontend dist directory not found: {FRONTEND_DIST_DIR}. "
-        f"Please run `npm run build` (or `pnpm build` / `yarn build`) in frontend/ first."
-    )
-
 # 挂载静态资源，例如 /assets/*
 # 注意：mount 必须在路由之前，FastAPI 会按顺序匹配
+# 挂载时不检查目录：run_app.py 在后台构建前端，构建完成后无需重启即可访问；诊断信息由启动后的后台线程打印
 assets_dir = os.path.join(FRONTEND_DIST_DIR, "assets")
-if os.path.isdir(assets_dir):
-    app.mount("/assets", StaticFiles(directory=assets_dir), name="assets")
-    print(f"[INFO] Mounted /assets from: {assets_dir}")
-else:
-    print(f"[WARN] Assets directory not found: {assets_dir}")
+# 小文件常驻内存并预压缩，带哈希的产物长期缓存（见 static_files.CompressedStaticFiles）
+app.mount("/assets", CompressedStaticFiles(directory=assets_dir), name="assets")
 
 # 挂载 questions 目录（包含 manifest.json 和题库文件）
 # 必须在通配路由之前挂载，否则会被拦截
+# 缓存策略见 static_files.QuestionsStaticFiles：内容哈希 ETag + 条件请求，带哈希版本的文件长期缓存
 questions_dir = os.path.join(FRONTEND_DIST_DIR, "questions")
-if os.path.isdir(questions_dir):
-    app.mount("/questions", StaticFiles(directory=questions_dir), name="questions")
-    print(f"[INFO] Mounted /questions from: {questions_dir}")
-    # 列出 questions 目录中的文件，方便调试
-    try:
-        files = os.listdir(questions_dir)
-        print(f"[INFO] Questions directory contains: {', '.join(files[:10])}")  # 只显示前10个
-    except Exception as e:
-        print(f"[WARN] Cannot list questions directory: {e}")
-else:
-    print(f"[WARN] Questions directory not found: {questions_dir}")
-
-# 添加一个中间件来禁用 questions 目录的缓存
-@app.middleware("http")
-async def no_cache_questions(request, call_next):
-    response = await call_next(request)
-    # 如果是 questions 目录的请求，禁用缓存
-    if request.url.path.startswith("/questions/"):
-        response.headers["Cache-Control"] = "no-cache, no-store, must-revalidate"
-        response.headers["Pragma"] = "no-cache"
-        response.headers["Expires"] = "0"
-    return response
-
+app.mount("/questions", QuestionsStaticFiles(directory=questions_dir), name="questions")
 
 def index_html_path() -> str:
     return os.path.join(FRONTEND_DIST_DIR, "index.html")
 
 
+def log_frontend_dirs():
+    """打印前端目录的调试信息（在打包后的 exe 中也能看到）"""
+    print(f"[INFO] Frontend dist directory: {FRONTEND_DIST_DIR}")
+    print(f"[INFO] Directory exists: {os.path.isdir(FRONTEND_DIST_DIR)}")
+    if not os.path.isdir(FRONTEND_DIST_DIR):
+        # 如果目录不存在，不要让应用崩掉，只提示一下
+        print(
+            f"[WARN] Frontend dist directory not found: {FRONTEND_DIST_DIR}. "
+            f"Please run `npm run build` (or `pnpm build` / `yarn build`) in frontend/ first."
+        )
+
+    if os.path.isdir(assets_dir):
+        print(f"[INFO] Serving /assets from: {assets_dir}")
+    else:
+        print(f"[WARN] Assets directory not found: {assets_dir}")
+
+    if os.path.isdir(questions_dir):
+        print(f"[INFO] Serving /questions from: {questions_dir}")
+        # 列出 questions 目录中的文件，方便调试
+        try:
+            files = os.listdir(questions_dir)
+            print(f"[INFO] Questions directory contains: {', '.join(files[:10])}")  # 只显示前10个
+        except Exception as e:
+            print(f"[WARN] Cannot list questions directory: {e}")
+    else:
+        print(f"[WARN] Questions directory not found: {questions_dir}")
+
+
+def warm_frontend_cache():
+    log_frontend_dirs()
+    if not os.path.isdir(FRONTEND_DIST_DIR):
+        return
+    try:
+        count = warm_asset_cache(assets_dir) if os.path.isdir(assets_dir) else 0
+        spa_index_response(index_html_path(), Headers())
+        print(f"[INFO] Preloaded {count} frontend assets into memory")
+    except Exception as e:
+        print(f"[WARN] Failed to preload frontend assets: {e}")
+
+
 # === API 接口（必须在通配路由之前注册） ===
 @app.get("/api/health")
 async def api_health():
     return {"status": "ok"}
 
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Prometheus 文本格式的运行指标（见 metrics.py）"""
+    return Response(content=metrics.render_metrics(), media_type=metrics.CONTENT_TYPE)
+
 @app.post("/api/upload")
 def upload_file(file: UploadFile = File(...), session: Session = Depends(get_session)):
     """
@@ -115,22 +169,24 @@ def upload_file(file: UploadFile = File(...), session: Session = Depends(get_ses
     if not file.filename.endswith(".pdf"):
         raise HTTPException(status_code=400, detail="Only PDF files are allowed")
     
-    # 保存文件到 data 目录
-    upload_dir = Path("data")
-    upload_dir.mkdir(exist_ok=True)
-    file_path = upload_dir / file.filename
-    
-    # 使用 shutil.copyfileobj 高效写入
-    with file_path.open("wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    with trace("course.upload", filename=file.filename) as current:
+        # 保存文件到 data 目录
+        upload_dir = Path("data")
+        upload_dir.mkdir(exist_ok=True)
+        file_path = upload_dir / file.filename
         
-    # 创建数据库记录
-    # 简单起见，用文件名作为课程标题
-    course_title = file.filename.replace(".pdf", "")
-    course = Course(title=course_title, description="Uploaded via Web")
-    session.add(course)
-    session.commit()
-    session.refresh(course)
+        # 使用 shutil.copyfileobj 高效写入
+        with span("upload.write_file"), file_path.open("wb") as buffer:
+            shutil.copyfileobj(file.file, buffer)
+            
+        # 创建数据库记录
+        # 简单起见，用文件名作为课程标题
+        course_title = file.filename.replace(".pdf", "")
+        course = Course(title=course_title, description="Uploaded via Web")
+        session.add(course)
+        session.commit()
+        session.refresh(course)
+        current.set(course_id=course.id, bytes=file_path.stat().st_size)
     
     return {"status": "success", "course_id": course.id, "filename": file.filename}
 
@@ -247,6 +303,21 @@ async def get_courses(session: Session = Depends(get_session)):
     courses = session.exec(select(Course)).all()
     return courses
 
+@app.get("/api/search")
+def search_library(
+    q: str = Query(min_length=1, max_length=200),
+    course_id: Optional[int] = None,
+    kind: Optional[Literal["chapter", "question"]] = None,
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    session: Session = Depends(get_session),
+):
+    """
+    全文检索章节正文与题目（题干、解析），按相关度排序，snippet 中的命中词以 <mark> 标出
+    """
+    results = search(session.connection(), q, course_id=course_id, kind=kind, limit=limit, offset=offset)
+    return {"query": q, "results": results}
+
 def process_course_generation(course_id: int, filename: str, session: Session):
     """
     后台任务：解析 PDF -> 生成题目 -> 存入数据库
@@ -260,27 +331,23 @@ def process_course_generation(course_id: int, filename: str, session: Session):
         print(f"[Task] Parsed {len(chapters_data)} chapters")
         
         for ch_data in chapters_data:
-            # 保存章节
-            chapter = Chapter(
-                course_id=course_id,
-                title=ch_data["title"],
-                index=ch_data["index"],
-                content_text=ch_data["content"]
-            )
-            session.add(chapter)
-            session.commit()
-            session.refresh(chapter)
+            with span("chapter", title=ch_data["title"]):
+                # 保存章节（含小节）
+                chapter = save_chapter(session, course_id, ch_data)
+                session.commit()
+                session.refresh(chapter)
             
-            # 2. 生成题目
-            print(f"[Task] Generating quiz for chapter: {chapter.title}")
-            quiz_data = generate_quiz_for_chapter(chapter.content_text, chapter.title)
+                # 2. 生成题目
+                print(f"[Task] Generating quiz for chapter: {chapter.title}")
+                with llm_context(course_id=course_id, chapter_id=chapter.id):
+                    quiz_data = generate_quiz_for_chapter(chapter.content_text, chapter.title)
             
-            if quiz_data:
-                # 3. 保存题目
-                save_quiz_to_db(session, chapter.id, quiz_data)
-                print(f"[Task] Saved quiz for chapter: {chapter.title}")
-            else:
-                print(f"[Task] Failed to generate quiz for chapter: {chapter.title}")
+                if quiz_data:
+                    # 3. 保存题目
+                    save_quiz_to_db(session, chapter.id, quiz_data)
+                    print(f"[Task] Saved quiz for chapter: {chapter.title}")
+                else:
+                    print(f"[Task] Failed to generate quiz for chapter: {chapter.title}")
             
         # 更新课程状态
         course = session.get(Course, course_id)
@@ -315,14 +382,8 @@ def process_course_parsing(course_id: int, filename: str, session: Session):
         print(f"[Task] Parsed {len(chapters_data)} chapters")
         
         for ch_data in chapters_data:
-            # 保存章节
-            chapter = Chapter(
-                course_id=course_id,
-                title=ch_data["title"],
-                index=ch_data["index"],
-                content_text=ch_data["content"]
-            )
-            session.add(chapter)
+            # 保存章节（含小节）
+            save_chapter(session, course_id, ch_data)
         
         # 更新课程状态
         course = session.get(Course, course_id)
@@ -348,18 +409,34 @@ def process_course_generation_custom(course_id: int, config: dict, session: Sess
     """
     后台任务：根据配置生成题目
     config: { chapter_ids: [1, 2], num_mc: 5, num_fb: 5 }
+    - unit: "chapter"（默认）每章生成一份测验；"section" 按小节生成（见 select_generation_sections），没有小节的章节仍按整章生成
+    - section_ids: 只为指定小节生成（忽略 chapter_ids / unit）
     """
     try:
         print(f"[Task] Starting custom generation for course {course_id} with config {config}")
         
-        # 获取章节
-        statement = select(Chapter).where(Chapter.course_id == course_id)
-        if config.get("chapter_ids"):
-             statement = statement.where(Chapter.id.in_(config["chapter_ids"]))
+        # 出题单元：(章节, 小节或 None)
+        units = []
+        if config.get("section_ids"):
+            statement = (
+                select(Chapter, Section)
+                .join(Section, Section.chapter_id == Chapter.id)
+                .where(Chapter.course_id == course_id, Section.id.in_(config["section_ids"]))
+                .order_by(Chapter.index, Section.index)
+            )
+            units = list(session.exec(statement).all())
+        else:
+            # 获取章节
+            statement = select(Chapter).where(Chapter.course_id == course_id)
+            if config.get("chapter_ids"):
+                 statement = statement.where(Chapter.id.in_(config["chapter_ids"]))
+            
+            for chapter in session.exec(statement).all():
+                sections = select_generation_sections(chapter.sections) if config.get("unit") == "section" else []
+                units.extend((chapter, section) for section in sections or [None])
         
-        chapters = session.exec(statement).all()
-        total_chapters = len(chapters)
-        print(f"[Task] Generating for {total_chapters} chapters")
+        total_chapters = len(units)
+        print(f"[Task] Generating for {total_chapters} units")
         
         # 初始化进度
         course = session.get(Course, course_id)
@@ -370,41 +447,46 @@ def process_course_generation_custom(course_id: int, config: dict, session: Sess
             session.add(course)
             session.commit()
 
-        for i, chapter in enumerate(chapters):
-             # 更新章节开始进度
-            course = session.get(Course, course_id)
-            if course:
-                course.generation_current_chapter = i
-                course.generation_status_message = f"正在生成第 {i+1}/{total_chapters} 章: {chapter.title}"
-                session.add(course)
-                session.commit()
-
-             # 2. 生成题目
-            print(f"[Task] Generating quiz for chapter: {chapter.title}")
-            quiz_data = generate_quiz_for_chapter(
-                chapter.content_text, 
-                chapter.title,
-                num_mc=config.get("num_mc", 5),
-                num_multi=config.get("num_multi", 0),
-                num_tf=config.get("num_tf", 0),
-                num_fb=config.get("num_fb", 5),
-                num_short=config.get("num_short", 0),
-                num_code=config.get("num_code", 0),
-                difficulty=config.get("difficulty", "medium")
-            )
-            
-            if quiz_data:
-                # 3. 保存题目
-                save_quiz_to_db(session, chapter.id, quiz_data)
-                print(f"[Task] Saved quiz for chapter: {chapter.title}")
-            else:
-                print(f"[Task] Failed to generate quiz for chapter: {chapter.title} (Empty response)")
-                # 更新状态消息以反映错误
+        for i, (chapter, section) in enumerate(units):
+            title = f"{chapter.title} / {section.title}" if section else chapter.title
+            with span("generation_unit", chapter_id=chapter.id, section_id=section.id if section else None,
+                      title=title):
+                unit_name = "节" if section else "章"
+                 # 更新章节开始进度
                 course = session.get(Course, course_id)
                 if course:
-                    course.generation_status_message = f"生成失败: {chapter.title}"
+                    course.generation_current_chapter = i
+                    course.generation_status_message = f"正在生成第 {i+1}/{total_chapters} {unit_name}: {title}"
                     session.add(course)
                     session.commit()
+
+                 # 2. 生成题目
+                print(f"[Task] Generating quiz for {title}")
+                with llm_context(course_id=course_id, chapter_id=chapter.id):
+                    quiz_data = generate_quiz_for_chapter(
+                        section.content_text if section else chapter.content_text, 
+                        section.title if section else chapter.title,
+                        num_mc=config.get("num_mc", 5),
+                        num_multi=config.get("num_multi", 0),
+                        num_tf=config.get("num_tf", 0),
+                        num_fb=config.get("num_fb", 5),
+                        num_short=config.get("num_short", 0),
+                        num_code=config.get("num_code", 0),
+                        difficulty=config.get("difficulty", "medium")
+                    )
+            
+                if quiz_data:
+                    # 3. 保存题目
+                    save_quiz_to_db(session, chapter.id, quiz_data, section_id=section.id if section else None)
+                    print(f"[Task] Saved quiz for {title}")
+                else:
+                    print(f"[Task] Failed to generate quiz for {title} (Empty response)")
+                    # 更新状态消息以反映错误
+                    course = session.get(Course, course_id)
+                    if course:
+                        course.generation_status_message = f"生成失败: {title}"
+                        session.add(course)
+                        session.commit()
             
         # 最终更新
         course = session.get(Course, course_id)
@@ -447,8 +529,11 @@ async def delete_course(course_id: int, session: Session = Depends(get_session))
     # 当前模型除了标题外没有明确存储文件名。
     # 暂时跳过文件删除，以免误删。
     
+    chapter_ids = [ch.id for ch in course.chapters]
     session.delete(course)
     session.commit()
+    invalidate_chapter_quiz(chapter_ids)
+    invalidate_course_index([course_id])
     
     return {"status": "success", "message": "Course deleted successfully"}
 
@@ -457,17 +542,20 @@ def run_generation_task(course_id: int, filename: str):
     为后台任务创建新会话的包装器
     """
     from .database import engine
-    with Session(engine) as session:
+    with metrics.track_task("generation"), profile_task(f"generation-{course_id}"), \
+            trace("course.generation", course_id=course_id), Session(engine) as session:
         process_course_generation(course_id, filename, session)
 
 def run_parsing_task(course_id: int, filename: str):
     from .database import engine
-    with Session(engine) as session:
+    with metrics.track_task("parsing", queued=True), profile_task(f"parsing-{course_id}"), \
+            trace("course.parsing", course_id=course_id), Session(engine) as session:
         process_course_parsing(course_id, filename, session)
 
 def run_custom_generation_task(course_id: int, config: dict):
     from .database import engine
-    with Session(engine) as session:
+    with metrics.track_task("generation", queued=True), profile_task(f"generation-{course_id}"), \
+            trace("course.generation_custom", course_id=course_id), Session(engine) as session:
         process_course_generation_custom(course_id, config, session)
 
 @app.post("/api/courses/{course_id}/parse")
@@ -484,6 +572,7 @@ async def parse_course_endpoint(course_id: int, background_tasks: BackgroundTask
     session.add(course)
     session.commit()
     
+    metrics.task_queued("parsing")
     background_tasks.add_task(run_parsing_task, course_id, filename)
     return {"status": "accepted", "message": "Parsing task started"}
 
@@ -507,15 +596,39 @@ async def generate_course_endpoint(course_id: int, config: dict, background_task
     session.add(course)
     session.commit()
     
+    metrics.task_queued("generation")
     background_tasks.add_task(run_custom_generation_task, course_id, config)
     return {"status": "accepted", "message": "Generation task started"}
 
+@app.get("/api/courses/{course_id}/usage")
+def get_course_usage(course_id: int, session: Session = Depends(get_session)):
+    """
+    课程的 LLM 调用汇总：调用次数、失败与重试次数、token 用量、耗时，并按用途和章节细分
+    """
+    if not session.get(Course, course_id):
+        raise HTTPException(status_code=404, detail="Course not found")
+    return course_usage(session, course_id)
+
+@app.get("/api/courses/{course_id}/traces")
+def get_course_traces(course_id: int, limit: int = Query(20, ge=1, le=200)):
+    """
+    课程最近的链路（上传、解析、生成），新的在前；每条链路的 span 带相对开始时间与嵌套深度，可直接画瀑布图
+    链路写入 data/traces.jsonl（见 tracing.py），课程删除后仍保留
+    """
+    return {"course_id": course_id, "traces": [waterfall(record) for record in load_traces(course_id, limit)]}
+
 @app.get("/api/courses/{course_id}/chapters", response_model=list[ChapterRead])
 async def get_course_chapters(course_id: int, session: Session = Depends(get_session)):
     # 使用 selectinload 高效获取测验
     from sqlalchemy.orm import selectinload
     statement = select(Chapter).where(Chapter.course_id == course_id).options(selectinload(Chapter.quizzes))
     chapters = session.exec(statement).all()
+    section_counts = dict(session.exec(
+        select(Section.chapter_id, func.count(Section.id))
+        .join(Chapter, Section.chapter_id == Chapter.id)
+        .where(Chapter.course_id == course_id)
+        .group_by(Section.chapter_id)
+    ).all())
     
     result = []
     for ch in chapters:
@@ -524,83 +637,121 @@ async def get_course_chapters(course_id: int, session: Session = Depends(get_ses
             id=ch.id,
             title=ch.title,
             index=ch.index,
-            has_quiz=has_quiz
+            has_quiz=has_quiz,
+            section_count=section_counts.get(ch.id, 0)
         ))
     return result
 
+@app.get("/api/chapters/{chapter_id}/sections", response_model=list[SectionRead])
+def get_chapter_sections(chapter_id: int, session: Session = Depends(get_session)):
+    """
+    返回章节下的多级小节（按目录顺序，parent_id 表示层级关系；不含正文）
+    has_quiz 表示该小节已有按小节生成的测验，测验本身通过章节的 /quiz 接口获取（带 section_id）
+    """
+    with_quiz = set(session.exec(
+        select(Quiz.section_id).where(Quiz.chapter_id == chapter_id, Quiz.section_id.is_not(None))
+    ).all())
+    rows = session.exec(
+        select(Section.id, Section.parent_id, Section.title, Section.level, Section.index)
+        .where(Section.chapter_id == chapter_id)
+        .order_by(Section.index)
+    ).all()
+    return [
+        SectionRead(id=row.id, parent_id=row.parent_id, title=row.title, level=row.level, index=row.index,
+                    has_quiz=row.id in with_quiz)
+        for row in rows
+    ]
+
 @app.get("/api/chapters/{chapter_id}/quiz", response_model=list[QuizReadWithQuestions])
-async def get_chapter_quiz(chapter_id: int, session: Session = Depends(get_session)):
-    quizzes = session.exec(select(Quiz).where(Quiz.chapter_id == chapter_id)).all()
-    return quizzes
+def get_chapter_quiz(chapter_id: int, request: Request, session: Session = Depends(get_session)):
+    """
+    返回章节下的所有 quiz（含题目）
+    结果为缓存的 JSON bytes，客户端可带 If-None-Match 做条件请求
+    """
+    etag, payload = get_chapter_quiz_payload(session, chapter_id)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=payload, media_type="application/json", headers=headers)
 
 @app.get("/api/chapters/{chapter_id}/export-word")
 async def export_chapter_quiz_word(chapter_id: int, include_answers: bool = True, session: Session = Depends(get_session)):
     """
     导出章节题目为 Word 文档
+    - 题目数据复用 /quiz 接口的缓存（一次联表查询），内容哈希即缓存键
+    - Word 构建在独立线程池中进行，写入唯一临时文件；题目未变化时直接返回已生成的文件
     """
-    # 1. 获取题目数据
-    # 这里我们复用获取题目的逻辑，或者直接查库
-    # 为了方便，我们先查 Quiz，再查 Questions
-    # 注意：一个章节可能有多个 Quiz，这里我们默认导出第一个，或者合并所有
-    # 简单起见，导出该章节下的所有 Quiz
-    
-    quizzes = session.exec(select(Quiz).where(Quiz.chapter_id == chapter_id)).all()
+    def load_export_data():
+        content_hash, payload = get_chapter_quiz_payload(session, chapter_id)
+        quizzes = json_codec.loads(payload)
+        chapter = session.get(Chapter, chapter_id)
+        return content_hash, quizzes, (chapter.title if chapter else f"Chapter {chapter_id}")
+
+    content_hash, quizzes, chapter_title = await run_in_threadpool(load_export_data)
     if not quizzes:
         raise HTTPException(status_code=404, detail="No quizzes found for this chapter")
-    
-    # 构造导出数据
-    # 如果有多个 quiz，我们合并它们
-    chapter = session.get(Chapter, chapter_id)
-    chapter_title = chapter.title if chapter else f"Chapter {chapter_id}"
-    
-    all_questions = []
-    for quiz in quizzes:
-        # 加载 questions
-        # 注意：这里需要确保 questions 已经被加载
-        # 如果是 lazy load，可能需要显式查询
-        questions = session.exec(select(Question).where(Question.quiz_id == quiz.id)).all()
-        for q in questions:
-            all_questions.append({
-                "type": q.type,
-                "stem": q.stem,
-                "options_json": q.options_json,
-                "answer": q.answer,
-                "explanation": q.explanation
-            })
-            
+
+    # 如果有多个 quiz，合并它们
+    all_questions = [q for quiz in quizzes for q in quiz["questions"]]
     export_data = {
         "title": f"{chapter_title} - 练习题",
         "description": f"共 {len(all_questions)} 道题",
         "questions": all_questions
     }
-    
-    # 2. 生成 Word 文件
-    from .services import export_quiz_to_word
-    import tempfile
-    
-    # 创建临时文件
-    temp_dir = tempfile.gettempdir()
-    
+
     # 优化文件名：章节名_教师版/学生版.docx
     suffix = "教师版" if include_answers else "学生版"
-    # 清理文件名中的非法字符
-    safe_title = "".join([c for c in chapter_title if c.isalnum() or c in (' ', '-', '_', '.')]).strip()
-    filename = f"{safe_title}_{suffix}.docx"
-    
-    file_path = os.path.join(temp_dir, filename)
-    
-    success = export_quiz_to_word(export_data, file_path, include_answers=include_answers)
-    
-    if not success:
+    filename = f"{safe_filename(chapter_title)}_{suffix}.docx"
+
+    future = submit_chapter_export(chapter_id, include_answers, content_hash, export_data)
+    try:
+        file_path = await asyncio.wrap_future(future)
+    except RuntimeError:
         raise HTTPException(status_code=500, detail="Failed to generate Word document")
-        
-    # 3. 返回文件
+
     return FileResponse(
         path=file_path, 
         filename=filename,
         media_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
     )
 
+@app.post("/api/courses/{course_id}/export-jobs")
+def create_course_export_job(course_id: int, include_answers: bool = True, session: Session = Depends(get_session)):
+    """
+    创建整门课程的 Word 导出任务（每章一个 .docx，打包为 zip），通过 GET /api/export-jobs/{job_id} 查询进度
+    """
+    course = session.get(Course, course_id)
+    if not course:
+        raise HTTPException(status_code=404, detail="Course not found")
+    job = start_course_export(session, course_id, include_answers)
+    job.pop("path", None)
+    return job
+
+@app.get("/api/export-jobs/{job_id}")
+async def get_export_job(job_id: str):
+    job = get_course_export_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Export job not found")
+    job.pop("path", None)
+    return job
+
+@app.get("/api/export-jobs/{job_id}/download")
+def download_export_job(job_id: str, session: Session = Depends(get_session)):
+    job = get_course_export_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Export job not found")
+    if job["status"] != "completed":
+        raise HTTPException(status_code=409, detail=f"Export job is {job['status']}")
+
+    course = session.get(Course, job["course_id"])
+    course_title = course.title if course else f"Course {job['course_id']}"
+    suffix = "教师版" if job["include_answers"] else "学生版"
+    return FileResponse(
+        path=job["path"],
+        filename=f"{safe_filename(course_title)}_{suffix}.zip",
+        media_type="application/zip"
+    )
+
 from pydantic import BaseModel
 
 class GradeShortAnswerRequest(BaseModel):
@@ -614,24 +765,57 @@ class ReviewCodeRequest(BaseModel):
 @app.post("/api/grade/short-answer")
 def api_grade_short_answer(req: GradeShortAnswerRequest, session: Session = Depends(get_session)):
     from .services import grade_short_answer
+    from .grading import local_grade_short_answer, parse_string_list
     question = session.get(Question, req.question_id)
     if not question:
         raise HTTPException(status_code=404, detail="Question not found")
     
+    # 先尝试本地快速评分，结果不明确时再调用 LLM
+    result = local_grade_short_answer(question.answer, req.answer, parse_string_list(question.keywords_json))
+    if result is not None:
+        return result
+
     # 使用题干和参考答案进行评分
-    result = grade_short_answer(question.stem, question.answer, req.answer)
+    with llm_context(question_id=question.id):
+        result = grade_short_answer(question.stem, question.answer, req.answer)
     return result
 
 @app.post("/api/grade/code")
 def api_review_code(req: ReviewCodeRequest, session: Session = Depends(get_session)):
-    from .services import review_code
+    from .grading import grade_code_submission
     question = session.get(Question, req.question_id)
     if not question:
         raise HTTPException(status_code=404, detail="Question not found")
     
-    result = review_code(question.stem, question.answer, req.code)
+    # Python 代码在沙箱中执行测试判分，其余情况由 LLM 评审
+    result = grade_code_submission(session, question, req.code)
     return result
 
+class BatchGradeItem(BaseModel):
+    question_id: int
+    answer: str
+
+class BatchGradeRequest(BaseModel):
+    items: list[BatchGradeItem]
+
+@app.post("/api/grade/batch")
+def api_grade_batch(req: BatchGradeRequest, session: Session = Depends(get_session)):
+    """
+    批量评分简答题与代码题，立即返回任务状态，通过 GET /api/grade/batch/{job_id} 轮询结果
+    """
+    from .grading import start_batch_grading
+    if not req.items:
+        raise HTTPException(status_code=400, detail="No submissions provided")
+    return start_batch_grading(session, [item.model_dump() for item in req.items])
+
+@app.get("/api/grade/batch/{job_id}")
+async def api_get_grade_batch(job_id: str):
+    from .grading import get_grading_job
+    job = get_grading_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Grading job not found")
+    return job
+
 @app.get("/api/debug/manifest")
 async def debug_manifest():
     """调试接口：返回 manifest.json 的内容"""
@@ -653,6 +837,39 @@ async def debug_manifest():
         "exists": False
     }
 
+class ProfilingToggle(BaseModel):
+    enabled: bool
+    requests: Optional[int] = None  # 只剖析接下来的 N 个请求 / 后台任务，不填表示一直剖析到关闭
+
+def require_profiling(x_profile_token: Optional[str] = Header(None)):
+    """剖析接口只在 PROFILING_ENABLED=1 时存在；设置了 PROFILING_TOKEN 时需带 X-Profile-Token 请求头"""
+    if not PROFILING_ENABLED:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not check_token(x_profile_token):
+        raise HTTPException(status_code=403, detail="Invalid profiling token")
+
+@app.get("/api/debug/profiling", dependencies=[Depends(require_profiling)])
+async def get_profiling():
+    return profiling_state()
+
+@app.post("/api/debug/profiling", dependencies=[Depends(require_profiling)])
+async def toggle_profiling(toggle: ProfilingToggle):
+    """打开 / 关闭全局剖析开关（单个请求也可以用 X-Profile 请求头开启）"""
+    return set_profiling(toggle.enabled, toggle.requests)
+
+@app.get("/api/debug/profiles", dependencies=[Depends(require_profiling)])
+async def get_profiles():
+    """剖析结果列表（新的在前）：.folded 为请求采样，.prof / .txt 为后台任务的 cProfile 结果"""
+    return list_profiles()
+
+@app.get("/api/debug/profiles/{name}", dependencies=[Depends(require_profiling)])
+async def download_profile(name: str):
+    path = profile_path(name)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    media_type = "application/octet-stream" if path.suffix == ".prof" else "text/plain; charset=utf-8"
+    return FileResponse(path=str(path), filename=name, media_type=media_type)
+
 @app.get("/api/sample-quiz")
 async def api_sample_quiz():
     """
@@ -683,12 +900,12 @@ async def api_sample_quiz():
 
 # === 前端静态文件路由（必须在 API 路由之后，通配路由之前） ===
 @app.get("/")
-async def serve_index():
+async def serve_index(request: Request):
     """
-    返回打包后的前端 index.html
+    返回打包后的前端 index.html（内存缓存 + 压缩）
     """
-    index_path = index_html_path()
-    if not os.path.isfile(index_path):
+    response = spa_index_response(index_html_path(), request.headers)
+    if response is None:
         # 前端还没打包好的情况，用一个简单文本提示
         from fastapi.responses import PlainTextResponse
 
@@ -696,11 +913,11 @@ async def serve_index():
             "React 前端尚未构建，请先在 frontend/ 目录运行 `npm run build` 再重试。",
             status_code=500,
         )
-    return FileResponse(index_path)
+    return response
 
 
 @app.get("/{full_path:path}")
-async def serve_spa(full_path: str):
+async def serve_spa(full_path: str, request: Request):
     """
     将所有非 /api、/assets、/questions 开头的路径都指向前端的 index.html（支持 React Router 等）
     注意：这个通配路由必须在所有具体路由之后注册
@@ -710,9 +927,9 @@ async def serve_spa(full_path: str):
         from fastapi.responses import JSONResponse
         return JSONResponse({"detail": "Not Found"}, status_code=404)
 
-    index_path = index_html_path()
-    if os.path.isfile(index_path):
-        return FileResponse(index_path)
+    response = spa_index_response(index_html_path(), request.headers)
+    if response is not None:
+        return response
 
     from fastapi.responses import PlainTextResponse
 
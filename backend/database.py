@@ -1,4 +1,6 @@
+from sqlalchemy import inspect, text
 from sqlmodel import SQLModel, create_engine, Session
+from .metrics import instrument_engine
 from .models import * # 导入模型以将其注册到 SQLModel
 
 sqlite_file_name = "ai_learning.db"
@@ -6,9 +8,40 @@ sqlite_url = f"sqlite:///{sqlite_file_name}"
 
 connect_args = {"check_same_thread": False}
 engine = create_engine(sqlite_url, connect_args=connect_args)
+instrument_engine(engine)
 
 def create_db_and_tables():
+    from .search import create_search_index
+
     SQLModel.metadata.create_all(engine)
+    add_missing_columns()
+    create_search_index(engine)
+
+def add_missing_columns():
+    """
+    create_all 不会给已存在的表补充新增字段和索引，这里对旧数据库执行 ALTER TABLE ADD COLUMN / CREATE INDEX
+    """
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in SQLModel.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                default = ""
+                if column.default is not None and column.default.is_scalar:
+                    default = f" DEFAULT {column.default.arg!r}"
+                conn.execute(text(f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {column_type}{default}'))
+                print(f"[INFO] Added column {table.name}.{column.name}")
+            # 新增字段上的索引同样不会被 create_all 补建
+            existing_indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in existing_indexes:
+                    index.create(conn)
+                    print(f"[INFO] Created index {index.name}")
 
 def get_session():
     with Session(engine) as session:
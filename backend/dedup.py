@@ -0,0 +1,170 @@
+"""
+题干近似重复检测（MinHash + LSH）：
+
+- 题干规范化后取字符 3-gram 作为 shingle，计算 64 维 MinHash 签名；
+  选择题的选项也计入指纹，题干相同（如"下列说法正确的是"）但选项不同的题目不算重复
+- 签名切成 16 个 band（每个 4 行）放入哈希桶，只有落入同一桶的题目才作为候选，
+  再用 shingle 集合的 Jaccard 相似度精确确认，单题检测耗时在亚毫秒级
+- 每门课程一个索引，首次使用时从数据库构建，之后随 save_quiz_to_db 在提交成功后增量维护；
+  索引只在内存中，服务重启后按需重建
+"""
+
+import random
+import threading
+import zlib
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlmodel import Session, select
+
+from .models import Chapter, Question, Quiz
+from .schemas import decode_options
+from .text_utils import normalize_answer
+
+SHINGLE_SIZE = 3
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+
+# Jaccard 相似度达到该值即视为重复（16x4 的分带在该相似度下的召回率约 99%）
+DUPLICATE_THRESHOLD = 0.7
+
+# 每个"排列"用一个随机 32 位掩码与 shingle 的 crc32 异或实现（异或是 32 位空间上的置换），
+# 比 (a*h+b) mod p 的大整数运算快约 4 倍；误差由候选的精确 Jaccard 复核兜底
+_rng = random.Random(20240601)
+_MASKS = [_rng.getrandbits(32) for _ in range(NUM_PERM)]
+
+
+@dataclass(frozen=True)
+class Fingerprint:
+    shingles: frozenset
+    bands: Tuple[Tuple[int, ...], ...]
+
+
+def shingles(text: str) -> frozenset:
+    normalized = normalize_answer(text)
+    if len(normalized) <= SHINGLE_SIZE:
+        return frozenset([normalized]) if normalized else frozenset()
+    return frozenset(normalized[i:i + SHINGLE_SIZE] for i in range(len(normalized) - SHINGLE_SIZE + 1))
+
+
+def fingerprint(text: str, options: Optional[List[str]] = None) -> Fingerprint:
+    """题目指纹：text 为题干，选择题同时传入选项"""
+    if options:
+        text = "\n".join([text, *(str(option) for option in options)])
+    shingle_set = shingles(text)
+    if not shingle_set:
+        return Fingerprint(shingle_set, ())
+    hashes = [zlib.crc32(s.encode("utf-8")) for s in shingle_set]
+    signature = [min([h ^ mask for h in hashes]) for mask in _MASKS]
+    bands = tuple(tuple(signature[i:i + ROWS]) for i in range(0, NUM_PERM, ROWS))
+    return Fingerprint(shingle_set, bands)
+
+
+def jaccard(a: frozenset, b: frozenset) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class DedupIndex:
+    """单门课程的 LSH 索引"""
+
+    def __init__(self):
+        self._buckets: Dict[Tuple[int, Tuple[int, ...]], Set[int]] = defaultdict(set)
+        self._entries: Dict[int, Fingerprint] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def find_duplicate(self, fp: Fingerprint) -> Optional[Tuple[int, float]]:
+        """返回最相似的已有题目 (question_id, 相似度)，没有达到阈值的题目时返回 None"""
+        if not fp.bands:
+            return None
+        with self._lock:
+            candidates: Set[int] = set()
+            for band_index, band in enumerate(fp.bands):
+                candidates |= self._buckets.get((band_index, band), set())
+            best = None
+            for question_id in candidates:
+                similarity = jaccard(fp.shingles, self._entries[question_id].shingles)
+                if similarity >= DUPLICATE_THRESHOLD and (best is None or similarity > best[1]):
+                    best = (question_id, similarity)
+            return best
+
+    def add(self, question_id: int, fp: Fingerprint):
+        if not fp.bands:
+            return
+        with self._lock:
+            self._entries[question_id] = fp
+            for band_index, band in enumerate(fp.bands):
+                self._buckets[(band_index, band)].add(question_id)
+
+    def remove(self, question_id: int):
+        with self._lock:
+            fp = self._entries.pop(question_id, None)
+            if fp is None:
+                return
+            for band_index, band in enumerate(fp.bands):
+                bucket = self._buckets.get((band_index, band))
+                if bucket:
+                    bucket.discard(question_id)
+                    if not bucket:
+                        del self._buckets[(band_index, band)]
+
+
+# course_id -> 索引
+_indexes: Dict[int, DedupIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def iter_course_questions(
+    session: Session, course_id: int, include_flagged: bool = False
+) -> Iterable[Tuple[int, Fingerprint]]:
+    """按题目 id 顺序返回课程下的 (question_id, 指纹)，默认不含已标记为重复的题目"""
+    statement = (
+        select(Question.id, Question.stem, Question.options_json)
+        .join(Quiz, Question.quiz_id == Quiz.id)
+        .join(Chapter, Quiz.chapter_id == Chapter.id)
+        .where(Chapter.course_id == course_id)
+        .order_by(Question.id)
+    )
+    if not include_flagged:
+        statement = statement.where(Question.duplicate_of == None)  # noqa: E711
+    for question_id, stem, options_json in session.exec(statement):
+        yield question_id, fingerprint(stem, decode_options(options_json))
+
+
+def get_course_index(session: Session, course_id: int) -> DedupIndex:
+    with _indexes_lock:
+        index = _indexes.get(course_id)
+        if index is None:
+            index = DedupIndex()
+            for question_id, fp in iter_course_questions(session, course_id):
+                index.add(question_id, fp)
+            _indexes[course_id] = index
+        return index
+
+
+def invalidate_course_index(course_ids: Iterable[int]):
+    """课程题目被删除后调用，下次使用时从数据库重建"""
+    with _indexes_lock:
+        for course_id in course_ids:
+            _indexes.pop(course_id, None)
+
+
+def find_duplicate_groups(session: Session, course_id: int) -> List[Tuple[int, int, float]]:
+    """
+    批量检测：按 id 顺序逐题比对，返回 [(重复题目 id, 保留的原题 id, 相似度)]
+    """
+    index = DedupIndex()
+    duplicates: List[Tuple[int, int, float]] = []
+    for question_id, fp in iter_course_questions(session, course_id, include_flagged=True):
+        match = index.find_duplicate(fp)
+        if match:
+            duplicates.append((question_id, match[0], match[1]))
+        else:
+            index.add(question_id, fp)
+    return duplicates
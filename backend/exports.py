@@ -0,0 +1,273 @@
+"""
+Word 导出：
+
+- python-docx 构建是阻塞操作，统一提交到独立的线程池执行，不占用事件循环
+- 每次构建写入唯一的临时文件，避免同一章节并发导出时互相覆盖
+- 生成好的 .docx 按 (chapter_id, include_answers, 题目内容哈希) 缓存，题目未变化时直接复用；
+  被新版本取代的文件可能仍在被之前的下载读取，延迟 STALE_EXPORT_GRACE_SECONDS 后再删除
+- 整门课程导出为后台任务，在单独的线程池中执行（不占用单章导出的线程）：逐章在短事务中读取题目、
+  生成 Word 并追加进 zip，不长时间持有读游标，内存中只保留当前章节的题目，进度可轮询；
+  结束超过 COURSE_EXPORT_TTL_SECONDS 的任务及其 zip 文件会被清理
+"""
+
+import os
+import tempfile
+import threading
+import time
+import uuid
+import zipfile
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlmodel import Session, func, select
+
+from .metrics import register_executor
+from .models import Chapter, Question, Quiz
+
+# Word 构建的工作线程池（python-docx 构建较重，限制并发数）
+EXPORT_WORKERS = 2
+export_executor = ThreadPoolExecutor(max_workers=EXPORT_WORKERS, thread_name_prefix="word-export")
+register_executor("word-export", export_executor)
+# 整门课程导出耗时较长，使用单独的线程池，避免占满单章导出的线程
+COURSE_EXPORT_WORKERS = 1
+course_export_executor = ThreadPoolExecutor(max_workers=COURSE_EXPORT_WORKERS, thread_name_prefix="course-export")
+register_executor("course-export", course_export_executor)
+
+EXPORT_CACHE_DIR = os.path.join(tempfile.gettempdir(), "ai_learning_exports")
+# 被取代的导出文件保留多久再删除（留给正在进行的下载）
+STALE_EXPORT_GRACE_SECONDS = 600
+
+# (chapter_id, include_answers) -> (content_hash, 文件路径)
+_export_cache: Dict[Tuple[int, bool], Tuple[str, str]] = {}
+# (chapter_id, include_answers, content_hash) -> 正在构建的 Future，避免重复构建
+_pending: Dict[Tuple[int, bool, str], Future] = {}
+# (被取代的时间, 文件路径)，超过宽限期后由 _sweep_stale_exports 删除
+_stale_exports: List[Tuple[float, str]] = []
+_lock = threading.Lock()
+
+
+def safe_filename(title: str) -> str:
+    """清理文件名中的非法字符"""
+    return "".join([c for c in title if c.isalnum() or c in (' ', '-', '_', '.')]).strip()
+
+
+def new_export_path(suffix: str = ".docx") -> str:
+    """在导出目录下创建唯一的临时文件并返回路径"""
+    os.makedirs(EXPORT_CACHE_DIR, exist_ok=True)
+    fd, path = tempfile.mkstemp(suffix=suffix, dir=EXPORT_CACHE_DIR)
+    os.close(fd)
+    return path
+
+
+def _build_word(export_data: Dict[str, Any], include_answers: bool) -> str:
+    from .services import export_quiz_to_word
+
+    path = new_export_path()
+    if not export_quiz_to_word(export_data, path, include_answers=include_answers):
+        os.remove(path)
+        raise RuntimeError("Failed to generate Word document")
+    return path
+
+
+def _sweep_stale_exports():
+    """删除超过宽限期的旧导出文件"""
+    cutoff = time.monotonic() - STALE_EXPORT_GRACE_SECONDS
+    with _lock:
+        expired = [path for retired_at, path in _stale_exports if retired_at <= cutoff]
+        _stale_exports[:] = [(retired_at, path) for retired_at, path in _stale_exports if retired_at > cutoff]
+    for path in expired:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def _finish(key: Tuple[int, bool, str], future: Future):
+    chapter_id, include_answers, content_hash = key
+    with _lock:
+        _pending.pop(key, None)
+        if future.exception() is None:
+            previous = _export_cache.get((chapter_id, include_answers))
+            if previous and previous[1] != future.result():
+                # 之前的请求可能仍在通过 FileResponse 读取旧文件，不能立即删除
+                _stale_exports.append((time.monotonic(), previous[1]))
+            _export_cache[(chapter_id, include_answers)] = (content_hash, future.result())
+    _sweep_stale_exports()
+
+
+def submit_chapter_export(
+    chapter_id: int, include_answers: bool, content_hash: str, export_data: Dict[str, Any]
+) -> Future:
+    """
+    返回一个 Future，结果为生成好的 .docx 路径。
+    题目内容哈希未变化且文件仍存在时直接返回缓存结果；同一份导出正在构建时复用同一个 Future。
+    """
+    _sweep_stale_exports()
+    key = (chapter_id, include_answers, content_hash)
+    with _lock:
+        cached = _export_cache.get((chapter_id, include_answers))
+        if cached and cached[0] == content_hash and os.path.isfile(cached[1]):
+            future: Future = Future()
+            future.set_result(cached[1])
+            return future
+
+        pending = _pending.get(key)
+        if pending is not None:
+            return pending
+
+        future = export_executor.submit(_build_word, export_data, include_answers)
+        _pending[key] = future
+    future.add_done_callback(lambda f: _finish(key, f))
+    return future
+
+
+# === 整门课程导出任务 ===
+
+# 任务结束（完成或出错）后保留多久，超时后删除任务记录与 zip 文件
+COURSE_EXPORT_TTL_SECONDS = 3600
+
+# job_id -> 任务状态
+_course_jobs: Dict[str, Dict[str, Any]] = {}
+
+
+def _sweep_course_jobs():
+    """清理已过期的课程导出任务及其 zip 文件"""
+    now = datetime.now().isoformat()
+    with _lock:
+        expired = [job for job in _course_jobs.values() if job["expires_at"] and job["expires_at"] <= now]
+        for job in expired:
+            del _course_jobs[job["job_id"]]
+    for job in expired:
+        if job["path"]:
+            try:
+                os.remove(job["path"])
+            except OSError:
+                pass
+
+
+def get_course_export_job(job_id: str) -> Optional[Dict[str, Any]]:
+    _sweep_course_jobs()
+    with _lock:
+        job = _course_jobs.get(job_id)
+        return dict(job) if job else None
+
+
+def _update_job(job_id: str, **fields):
+    with _lock:
+        _course_jobs[job_id].update(fields)
+
+
+def _finish_job(job_id: str, **fields):
+    expires_at = datetime.now() + timedelta(seconds=COURSE_EXPORT_TTL_SECONDS)
+    _update_job(job_id, expires_at=expires_at.isoformat(), **fields)
+
+
+def start_course_export(session: Session, course_id: int, include_answers: bool) -> Dict[str, Any]:
+    """
+    创建整门课程的导出任务并提交到课程导出线程池，返回任务状态
+    """
+    _sweep_course_jobs()
+    total = session.exec(
+        select(func.count(func.distinct(Chapter.id)))
+        .join(Quiz, Quiz.chapter_id == Chapter.id)
+        .where(Chapter.course_id == course_id)
+    ).one()
+
+    job = {
+        "job_id": uuid.uuid4().hex,
+        "course_id": course_id,
+        "include_answers": include_answers,
+        "status": "pending",
+        "total_chapters": total,
+        "completed_chapters": 0,
+        "total_questions": 0,
+        "message": "等待导出...",
+        "error": None,
+        "path": None,
+        "created_at": datetime.now().isoformat(),
+        "expires_at": None,
+    }
+    with _lock:
+        _course_jobs[job["job_id"]] = job
+    course_export_executor.submit(_run_course_export, job["job_id"])
+    return dict(job)
+
+
+def _course_export_chapters(course_id: int) -> List[Tuple[int, int, str]]:
+    """按章节顺序返回课程中有题目的章节 (chapter_id, chapter_index, chapter_title)"""
+    from .database import engine
+
+    with Session(engine) as session:
+        return list(session.exec(
+            select(Chapter.id, Chapter.index, Chapter.title)
+            .where(Chapter.course_id == course_id)
+            .where(Chapter.id.in_(select(Quiz.chapter_id)))
+            .order_by(Chapter.index, Chapter.id)
+        ))
+
+
+def _load_chapter_questions(chapter_id: int) -> List[Dict[str, Any]]:
+    """在一个短事务中读取一章的全部题目（导出 Word 期间不持有数据库连接）"""
+    from .database import engine
+
+    with Session(engine) as session:
+        rows = session.exec(
+            select(Question.type, Question.stem, Question.options_json, Question.answer, Question.explanation)
+            .join(Quiz, Question.quiz_id == Quiz.id)
+            .where(Quiz.chapter_id == chapter_id)
+            .order_by(Quiz.id, Question.id)
+        ).all()
+    return [
+        {"type": q_type, "stem": stem, "options_json": options_json, "answer": answer, "explanation": explanation}
+        for q_type, stem, options_json, answer, explanation in rows
+    ]
+
+
+def _run_course_export(job_id: str):
+    from .services import export_quiz_to_word
+
+    job = get_course_export_job(job_id)
+    course_id, include_answers = job["course_id"], job["include_answers"]
+    suffix = "教师版" if include_answers else "学生版"
+    zip_path = new_export_path(".zip")
+    _update_job(job_id, status="running", message="正在导出...")
+    print(f"[Export] Starting course export {job_id} for course {course_id}")
+
+    try:
+        chapters = _course_export_chapters(course_id)
+        completed = 0
+        total_questions = 0
+        with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as zf:
+            for chapter_id, index, title in chapters:
+                questions = _load_chapter_questions(chapter_id)
+                if not questions:
+                    continue
+                _update_job(job_id, message=f"正在导出第 {completed + 1}/{job['total_chapters']} 章: {title}")
+
+                docx_path = new_export_path()
+                try:
+                    export_data = {
+                        "title": f"{title} - 练习题",
+                        "description": f"共 {len(questions)} 道题",
+                        "questions": questions,
+                    }
+                    if not export_quiz_to_word(export_data, docx_path, include_answers=include_answers):
+                        raise RuntimeError(f"Failed to generate Word document for chapter {chapter_id}")
+                    zf.write(docx_path, arcname=f"{index:02d}_{safe_filename(title)}_{suffix}.docx")
+                finally:
+                    os.remove(docx_path)
+
+                completed += 1
+                total_questions += len(questions)
+                _update_job(job_id, completed_chapters=completed, total_questions=total_questions)
+
+        _finish_job(job_id, status="completed", path=zip_path, message="导出完成！")
+        print(f"[Export] Completed course export {job_id}: {completed} chapters, {total_questions} questions")
+    except Exception as e:
+        print(f"[Export] Course export {job_id} failed: {e}")
+        _finish_job(job_id, status="error", error=str(e), message=f"导出出错: {e}")
+        try:
+            os.remove(zip_path)
+        except OSError:
+            pass
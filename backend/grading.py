@@ -0,0 +1,373 @@
+"""
+评分：
+
+- 本地快速评分：空答案、规范化后完全一致、关键词覆盖率与字符 n-gram 相似度均明确的答案，
+  直接在本地给分，只有模棱两可的答案才调用 LLM
+- 代码题：Python 代码在本地沙箱中运行测试用例判定正确性（见 sandbox.py），
+  LLM 只负责代码风格建议；非 Python 代码或无可用测试时退回 LLM 完整评审
+- 批量评分：
+  - 简答题：在 prompt 长度预算内把同一章节的多份答案打包进一次 LLM 调用（用量记在该章节名下）
+  - 代码题：每份代码单独评审（代码较长，不适合打包）
+  - 各批次在线程池中并发执行，结果按条目写回任务状态，客户端轮询获取
+  - 完成超过 GRADING_JOB_TTL_SECONDS 的任务在访问时清理，之后查询返回 404
+"""
+
+import re
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from sqlmodel import Session, select
+
+from . import json_codec
+from .llm_usage import llm_context
+from .metrics import register_executor
+from .models import Question, Quiz
+from .sandbox import is_python_code, run_tests, sandbox_available, valid_tests_for_reference
+from .text_utils import normalize_answer
+
+# 评分并发数（同时进行的 LLM 调用数）
+GRADING_WORKERS = 4
+grading_executor = ThreadPoolExecutor(max_workers=GRADING_WORKERS, thread_name_prefix="grading")
+register_executor("grading", grading_executor)
+
+# 单次简答题批量评分的 prompt 字符预算（中文约 1 字 ≈ 1 token）与条目上限
+BATCH_PROMPT_CHAR_BUDGET = 6000
+MAX_ITEMS_PER_PROMPT = 10
+
+SHORT_ANSWER_TYPES = {"short_answer"}
+CODE_TYPES = {"coding", "code"}
+
+# 本地评分阈值：覆盖全部关键词且与参考答案足够相似时直接判高分；
+# 不含任何关键词且几乎没有字符重叠时直接判 0 分；其余交给 LLM
+HIGH_SIMILARITY = 0.8
+NO_KEYWORD_HIGH_SIMILARITY = 0.9
+LOW_SIMILARITY = 0.08
+
+# 否定词：字符重叠无法区分"需要"与"不需要"，否定词数量与参考答案不一致时不在本地判高分
+_NEGATION_PATTERN = re.compile(r"[不没无非未]")
+
+# 评分任务完成后保留的时间（秒），客户端需在此之前取走结果
+GRADING_JOB_TTL_SECONDS = 3600
+# 最多记住多少道题的验证结果，超出后淘汰最久未用的（LRU）
+MAX_VALIDATED_QUESTIONS = 1024
+
+# job_id -> 任务状态
+_jobs: Dict[str, Dict[str, Any]] = {}
+_lock = threading.Lock()
+
+# question_id -> 已用参考代码验证过的 tests_json，避免每次评分都重新验证；按最近使用顺序排列
+_validated_tests: "OrderedDict[int, str]" = OrderedDict()
+# question_id -> [锁, 使用中的线程数]，同一道题的并发评分只生成一份测试；无人使用时删除
+_question_locks: Dict[int, List[Any]] = {}
+
+
+def _ngrams(text: str, n: int = 2) -> set:
+    if len(text) < n:
+        return {text} if text else set()
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+
+def ngram_similarity(a: str, b: str) -> float:
+    """字符 bigram 的 Dice 系数，中文无需分词即可衡量重叠程度（输入需已规范化）"""
+    grams_a, grams_b = _ngrams(a), _ngrams(b)
+    if not grams_a or not grams_b:
+        return 0.0
+    return 2 * len(grams_a & grams_b) / (len(grams_a) + len(grams_b))
+
+
+def parse_string_list(value_json: Optional[str]) -> List[str]:
+    """解析库中的 JSON 字符串数组字段（keywords_json / tests_json）"""
+    if not value_json:
+        return []
+    try:
+        values = json_codec.loads(value_json)
+    except json_codec.JSONDecodeError:
+        return []
+    return [str(v) for v in values if str(v).strip()] if isinstance(values, list) else []
+
+
+def local_grade_short_answer(
+    reference_answer: str, student_answer: str, keywords: List[str]
+) -> Optional[Dict[str, Any]]:
+    """
+    本地快速评分，结果明确时返回 {"score", "feedback", "graded_by": "local"}，否则返回 None（交给 LLM）
+    """
+    student = normalize_answer(student_answer)
+    if not student:
+        return {"score": 0, "feedback": "未作答。", "graded_by": "local"}
+
+    reference = normalize_answer(reference_answer)
+    if student == reference:
+        return {"score": 10, "feedback": "答案与参考答案一致。", "graded_by": "local"}
+
+    similarity = ngram_similarity(student, reference)
+    normalized_keywords = [k for k in (normalize_answer(k) for k in keywords) if k]
+    # 否定词数量不同（例如"需要移动"与"不需要移动"）时含义可能相反，不在本地判高分
+    same_polarity = len(_NEGATION_PATTERN.findall(student)) == len(_NEGATION_PATTERN.findall(reference))
+
+    if normalized_keywords:
+        hit = [k for k in normalized_keywords if k in student]
+        coverage = len(hit) / len(normalized_keywords)
+        if coverage == 1 and similarity >= HIGH_SIMILARITY and same_polarity:
+            score = round(10 * (0.5 * coverage + 0.5 * similarity))
+            return {"score": score, "feedback": "答案覆盖了全部要点。", "graded_by": "local"}
+        if coverage == 0 and similarity < LOW_SIMILARITY:
+            return {"score": 0, "feedback": "答案未涉及任何要点。", "graded_by": "local"}
+        return None
+
+    if similarity >= NO_KEYWORD_HIGH_SIMILARITY and same_polarity:
+        return {"score": round(10 * similarity), "feedback": "答案与参考答案基本一致。", "graded_by": "local"}
+    if similarity < LOW_SIMILARITY:
+        return {"score": 0, "feedback": "答案与参考答案无关。", "graded_by": "local"}
+    return None
+
+
+def _is_validated(question: Question) -> bool:
+    with _lock:
+        validated = _validated_tests.get(question.id)
+        if validated is not None:
+            _validated_tests.move_to_end(question.id)
+    return bool(question.tests_json) and validated == question.tests_json
+
+
+def ensure_code_tests(session: Session, question: Question) -> List[str]:
+    """
+    返回经参考代码验证的测试语句；题目没有测试时调用 LLM 生成并保存
+    参考代码不是 Python 或无法运行时返回空列表；同一道题同时只有一个线程生成和验证测试
+    """
+    if not sandbox_available() or not is_python_code(question.answer):
+        return []
+    if _is_validated(question):
+        return json_codec.loads(question.tests_json)
+
+    with _lock:
+        entry = _question_locks.setdefault(question.id, [threading.Lock(), 0])
+        entry[1] += 1
+    try:
+        with entry[0]:
+            # 等锁期间其他线程可能已生成并保存了测试，重新读取后再判断
+            session.refresh(question)
+            if _is_validated(question):
+                return json_codec.loads(question.tests_json)
+            return _generate_and_validate_tests(session, question)
+    finally:
+        with _lock:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del _question_locks[question.id]
+
+
+def _generate_and_validate_tests(session: Session, question: Question) -> List[str]:
+    from .services import generate_code_tests
+
+    tests = parse_string_list(question.tests_json)
+    if not tests:
+        with llm_context(question_id=question.id):
+            tests = generate_code_tests(question.stem, question.answer)
+    valid = valid_tests_for_reference(question.answer, tests) if tests else None
+    if not valid:
+        return []
+
+    tests_json = json_codec.dumps_str(valid)
+    if tests_json != question.tests_json:
+        question.tests_json = tests_json
+        session.add(question)
+        session.commit()
+    with _lock:
+        _validated_tests[question.id] = tests_json
+        _validated_tests.move_to_end(question.id)
+        while len(_validated_tests) > MAX_VALIDATED_QUESTIONS:
+            _validated_tests.popitem(last=False)
+    return valid
+
+
+def grade_code_submission(session: Session, question: Question, student_code: str) -> Dict[str, Any]:
+    """
+    沙箱执行测试判定正确性（按通过率给 0-10 分），LLM 仅给出风格建议；
+    无法本地执行时退回 LLM 完整评审
+    """
+    from .services import review_code, review_code_style
+
+    tests = ensure_code_tests(session, question)
+    if not tests:
+        with llm_context(question_id=question.id):
+            return review_code(question.stem, question.answer, student_code)
+
+    result = run_tests(student_code, tests)
+    passed = sum(1 for t in result["tests"] if t["passed"])
+    score = round(10 * passed / len(tests))
+
+    if result["setup_error"]:
+        feedback = f"代码无法运行：\n```\n{result['setup_error']}\n```"
+    else:
+        lines = [f"通过测试 {passed}/{len(tests)}。"]
+        for t in result["tests"]:
+            if not t["passed"]:
+                lines.append(f"- 未通过：`{t['test']}`（{t['error']}）")
+        feedback = "\n".join(lines)
+        with llm_context(question_id=question.id):
+            style = review_code_style(question.stem, student_code)
+        if style:
+            feedback += f"\n\n【代码风格】\n{style}"
+
+    return {
+        "score": score,
+        "feedback": feedback,
+        "tests_passed": passed,
+        "tests_total": len(tests),
+        "test_results": result["tests"],
+        "graded_by": "sandbox",
+    }
+
+
+def pack_batches(items: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+    """
+    按章节分组，再按字符预算与条目上限把简答题切分为若干批，单条超出预算时独占一批；
+    同一批只含一个章节的题目，LLM 用量可以准确记到章节与课程
+    """
+    by_chapter: Dict[Optional[int], List[Dict[str, Any]]] = {}
+    for item in items:
+        by_chapter.setdefault(item.get("chapter_id"), []).append(item)
+
+    batches: List[List[Dict[str, Any]]] = []
+    for chapter_items in by_chapter.values():
+        current: List[Dict[str, Any]] = []
+        current_size = 0
+        for item in chapter_items:
+            size = len(item["question"]) + len(item["reference"]) + len(item["answer"])
+            if current and (current_size + size > BATCH_PROMPT_CHAR_BUDGET or len(current) >= MAX_ITEMS_PER_PROMPT):
+                batches.append(current)
+                current, current_size = [], 0
+            current.append(item)
+            current_size += size
+        if current:
+            batches.append(current)
+    return batches
+
+
+def _sweep_jobs():
+    """清理完成后超过保留时间的评分任务"""
+    now = datetime.now().isoformat()
+    with _lock:
+        for job_id in [j["job_id"] for j in _jobs.values() if j["expires_at"] and j["expires_at"] <= now]:
+            del _jobs[job_id]
+
+
+def _expires_at() -> str:
+    return (datetime.now() + timedelta(seconds=GRADING_JOB_TTL_SECONDS)).isoformat()
+
+
+def get_grading_job(job_id: str) -> Optional[Dict[str, Any]]:
+    _sweep_jobs()
+    with _lock:
+        job = _jobs.get(job_id)
+        if not job:
+            return None
+        return {**job, "results": [dict(r) for r in job["results"]]}
+
+
+def _store_results(job_id: str, graded: List[Dict[str, Any]]):
+    with _lock:
+        job = _jobs[job_id]
+        for entry in graded:
+            job["results"][entry["index"]].update(entry, status="done")
+            job["completed"] += 1
+        if job["completed"] >= job["total"]:
+            job["status"] = "completed"
+            job["expires_at"] = _expires_at()
+
+
+def _grade_short_batch(job_id: str, batch: List[Dict[str, Any]]):
+    from .services import grade_short_answers_batch
+
+    # 同一批的题目属于同一章节：批量调用记在章节名下，逐题补评的调用在 services 中记到各自的题目
+    with llm_context(chapter_id=batch[0]["chapter_id"]):
+        scores = grade_short_answers_batch(batch)
+    _store_results(job_id, [
+        {"index": item["index"], "score": result.get("score", 0), "feedback": result.get("feedback", "")}
+        for item, result in zip(batch, scores)
+    ])
+
+
+def _review_code_item(job_id: str, item: Dict[str, Any]):
+    from .database import engine
+
+    with Session(engine) as session:
+        question = session.get(Question, item["question_id"])
+        result = grade_code_submission(session, question, item["answer"])
+    _store_results(job_id, [
+        {"index": item["index"], "score": result.get("score", 0), "feedback": result.get("feedback", "")}
+    ])
+
+
+def _run_safely(job_id: str, fn, payload, indexes: List[int]):
+    try:
+        fn(job_id, payload)
+    except Exception as e:
+        print(f"[Grading] Job {job_id} batch failed: {e}")
+        _store_results(job_id, [{"index": i, "score": 0, "feedback": "评分失败"} for i in indexes])
+
+
+def start_batch_grading(session: Session, submissions: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    创建批量评分任务。submissions: [{"question_id": 1, "answer": "..."}]
+    返回任务状态（含每条结果占位），之后通过 get_grading_job 轮询
+    """
+    _sweep_jobs()
+    question_ids = {s["question_id"] for s in submissions}
+    rows = session.exec(
+        select(Question, Quiz.chapter_id).join(Quiz, Question.quiz_id == Quiz.id).where(Question.id.in_(question_ids))
+    ).all()
+    questions = {q.id: q for q, _ in rows}
+    chapter_ids = {q.id: chapter_id for q, chapter_id in rows}
+
+    results: List[Dict[str, Any]] = []
+    short_items: List[Dict[str, Any]] = []
+    code_items: List[Dict[str, Any]] = []
+    for index, submission in enumerate(submissions):
+        question = questions.get(submission["question_id"])
+        result = {"index": index, "question_id": submission["question_id"], "status": "pending",
+                  "score": None, "feedback": None}
+        results.append(result)
+
+        if question is None:
+            result.update(status="error", feedback="Question not found")
+            continue
+        item = {"index": index, "question_id": question.id, "chapter_id": chapter_ids[question.id],
+                "question": question.stem, "reference": question.answer, "answer": submission["answer"]}
+        if question.type in SHORT_ANSWER_TYPES:
+            local = local_grade_short_answer(question.answer, submission["answer"],
+                                             parse_string_list(question.keywords_json))
+            if local is not None:
+                result.update(local, status="done")
+            else:
+                short_items.append(item)
+        elif question.type in CODE_TYPES:
+            code_items.append(item)
+        else:
+            result.update(status="error", feedback=f"Unsupported question type: {question.type}")
+
+    pending = len(short_items) + len(code_items)
+    job = {
+        "job_id": uuid.uuid4().hex,
+        "status": "running" if pending else "completed",
+        "total": pending,
+        "completed": 0,
+        "created_at": datetime.now().isoformat(),
+        "expires_at": None if pending else _expires_at(),
+        "results": results,
+    }
+    with _lock:
+        _jobs[job["job_id"]] = job
+
+    for batch in pack_batches(short_items):
+        grading_executor.submit(_run_safely, job["job_id"], _grade_short_batch, batch,
+                                [item["index"] for item in batch])
+    for item in code_items:
+        grading_executor.submit(_run_safely, job["job_id"], _review_code_item, item, [item["index"]])
+
+    return get_grading_job(job["job_id"])
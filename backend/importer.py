@@ -0,0 +1,364 @@
+"""
+题库批量导入：
+
+- 支持三种输入：
+  - export_db_to_json.py --format ndjson 导出的记录流（逐行读取，内存占用恒定）
+  - export_db_to_json.py 导出的嵌套 JSON（整文件读取，大库建议用 NDJSON）
+  - run_all.py 生成的题库文件 ch*_questions.json（{"meta": ..., "multiple_choice": [...], ...}）
+- 课程按标题、章节按 (课程, 序号)、小节按 (章节, 序号)、测验按 (章节, 标题) 匹配已有记录，不存在时创建；
+  小节的上下级关系与测验所属小节按导出文件中的 id 映射到新 id
+- 题目按 (quiz_id, content_hash) 幂等写入：已存在且内容相同则跳过，解析 / 关键词 / 测试用例有变化则更新
+- 题目使用 Core 批量 INSERT，每批一个事务；批量语句绕过 ORM 事件，全文索引在这里同步写入
+"""
+
+import gzip
+import json
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import bindparam, func, insert, select, update
+from sqlalchemy.engine import Connection
+
+from .models import Chapter, Course, Question, Quiz, Section
+from .schemas import QUESTION_SECTIONS, question_content_hash
+from .search import index_chapter, index_questions, remove_questions
+
+# 每批写入的题目数
+IMPORT_BATCH_SIZE = 5000
+
+_course = Course.__table__
+_chapter = Chapter.__table__
+_section = Section.__table__
+_quiz = Quiz.__table__
+_question = Question.__table__
+
+_CHAPTER_FILE_PATTERN = re.compile(r"ch(\d+)_questions", re.IGNORECASE)
+
+
+@dataclass
+class ImportStats:
+    courses: int = 0
+    chapters: int = 0
+    sections: int = 0
+    quizzes: int = 0
+    inserted: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    invalid: int = 0
+
+
+class QuestionImporter:
+    """在一个连接上累积题目并分批写入；使用完毕后调用 finish()"""
+
+    def __init__(self, connection: Connection, batch_size: int = IMPORT_BATCH_SIZE):
+        self.connection = connection
+        self.batch_size = batch_size
+        self.stats = ImportStats()
+        self._course_ids: Dict[str, int] = {}
+        self._chapter_ids: Dict[Tuple[int, int], int] = {}
+        self._section_ids: Dict[Tuple[int, int], int] = {}
+        self._quiz_ids: Dict[Tuple[int, str], int] = {}
+        # quiz_id -> (chapter_id, course_id)
+        self._quiz_owner: Dict[int, Tuple[int, int]] = {}
+        # quiz_id -> {content_hash: (question_id, explanation, keywords_json, tests_json)}
+        self._existing: Dict[int, Dict[str, Tuple[Optional[int], Any, Any, Any]]] = {}
+        self._inserts: List[Dict[str, Any]] = []
+        self._updates: List[Dict[str, Any]] = []
+        self.touched_chapters: set = set()
+        self.touched_courses: set = set()
+
+    # === 课程 / 章节 / 测验 ===
+
+    def course(self, title: str, description: Optional[str] = None, status: str = "ready") -> int:
+        if title in self._course_ids:
+            return self._course_ids[title]
+        course_id = self.connection.execute(
+            select(_course.c.id).where(_course.c.title == title).order_by(_course.c.id).limit(1)
+        ).scalar()
+        if course_id is None:
+            course_id = self.connection.execute(
+                insert(_course).values(**Course(title=title, description=description, status=status).model_dump(exclude={"id"}))
+            ).inserted_primary_key[0]
+            self.stats.courses += 1
+        self._course_ids[title] = course_id
+        return course_id
+
+    def chapter(self, course_id: int, index: int, title: str, content_text: Optional[str] = None) -> int:
+        key = (course_id, index)
+        if key in self._chapter_ids:
+            return self._chapter_ids[key]
+        chapter_id = self.connection.execute(
+            select(_chapter.c.id).where(_chapter.c.course_id == course_id, _chapter.c["index"] == index)
+            .order_by(_chapter.c.id).limit(1)
+        ).scalar()
+        if chapter_id is None:
+            chapter_id = self.connection.execute(
+                insert(_chapter).values(course_id=course_id, index=index, title=title, content_text=content_text)
+            ).inserted_primary_key[0]
+            index_chapter(self.connection, chapter_id, course_id, title, content_text)
+            self.stats.chapters += 1
+        self._chapter_ids[key] = chapter_id
+        return chapter_id
+
+    def section(self, chapter_id: int, index: int, title: str, level: int, parent_id: Optional[int] = None,
+                content_text: Optional[str] = None) -> int:
+        key = (chapter_id, index)
+        if key in self._section_ids:
+            return self._section_ids[key]
+        section_id = self.connection.execute(
+            select(_section.c.id).where(_section.c.chapter_id == chapter_id, _section.c["index"] == index)
+            .order_by(_section.c.id).limit(1)
+        ).scalar()
+        if section_id is None:
+            section_id = self.connection.execute(
+                insert(_section).values(chapter_id=chapter_id, parent_id=parent_id, title=title, level=level,
+                                        index=index, content_text=content_text)
+            ).inserted_primary_key[0]
+            self.stats.sections += 1
+        self._section_ids[key] = section_id
+        return section_id
+
+    def quiz(self, chapter_id: int, title: str, description: Optional[str] = None,
+             section_id: Optional[int] = None) -> int:
+        key = (chapter_id, title)
+        if key in self._quiz_ids:
+            return self._quiz_ids[key]
+        row = self.connection.execute(
+            select(_quiz.c.id, _chapter.c.course_id)
+            .select_from(_quiz.join(_chapter, _quiz.c.chapter_id == _chapter.c.id))
+            .where(_quiz.c.chapter_id == chapter_id, _quiz.c.title == title)
+            .order_by(_quiz.c.id).limit(1)
+        ).first()
+        if row is None:
+            course_id = self.connection.execute(
+                select(_chapter.c.course_id).where(_chapter.c.id == chapter_id)
+            ).scalar_one()
+            quiz_id = self.connection.execute(
+                insert(_quiz).values(**Quiz(chapter_id=chapter_id, section_id=section_id, title=title,
+                                            description=description).model_dump(exclude={"id"}))
+            ).inserted_primary_key[0]
+            self._existing[quiz_id] = {}
+            self.stats.quizzes += 1
+        else:
+            quiz_id, course_id = row
+        self._quiz_ids[key] = quiz_id
+        self._quiz_owner[quiz_id] = (chapter_id, course_id)
+        return quiz_id
+
+    # === 题目 ===
+
+    def _existing_hashes(self, quiz_id: int) -> Dict[str, Tuple[Optional[int], Any, Any, Any]]:
+        existing = self._existing.get(quiz_id)
+        if existing is None:
+            existing = {}
+            rows = self.connection.execute(
+                select(_question.c.id, _question.c.type, _question.c.stem, _question.c.options_json,
+                       _question.c.answer, _question.c.explanation, _question.c.keywords_json,
+                       _question.c.tests_json, _question.c.content_hash)
+                .where(_question.c.quiz_id == quiz_id)
+            )
+            for row in rows:
+                content_hash = row.content_hash or question_content_hash(
+                    row.type, row.stem, json.loads(row.options_json) if row.options_json else None, row.answer
+                )
+                existing[content_hash] = (row.id, row.explanation, row.keywords_json, row.tests_json)
+            self._existing[quiz_id] = existing
+        return existing
+
+    def add_question(self, quiz_id: int, q_type: str, stem: str, answer: str,
+                     options_json: Optional[str] = None, explanation: Optional[str] = None,
+                     keywords_json: Optional[str] = None, tests_json: Optional[str] = None):
+        options = json.loads(options_json) if options_json else None
+        content_hash = question_content_hash(q_type, stem, options, answer)
+        existing = self._existing_hashes(quiz_id)
+        known = existing.get(content_hash)
+
+        if known is None:
+            existing[content_hash] = (None, explanation, keywords_json, tests_json)
+            self._inserts.append({
+                "quiz_id": quiz_id, "type": q_type, "stem": stem, "options_json": options_json, "answer": answer,
+                "explanation": explanation, "keywords_json": keywords_json, "tests_json": tests_json,
+                "duplicate_of": None, "content_hash": content_hash,
+            })
+        elif known[0] is not None and known[1:] != (explanation, keywords_json, tests_json):
+            existing[content_hash] = (known[0], explanation, keywords_json, tests_json)
+            self._updates.append({
+                "question_id": known[0], "quiz_id": quiz_id, "stem": stem, "explanation": explanation,
+                "keywords_json": keywords_json, "tests_json": tests_json, "content_hash": content_hash,
+            })
+        else:
+            # 已存在，或与本批次中尚未写入的题目重复
+            self.stats.unchanged += 1
+            return
+
+        if len(self._inserts) + len(self._updates) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """写入当前批次并提交事务"""
+        if self._inserts:
+            # SQLite 上带顺序保证的 RETURNING 会退化为逐行执行；改为一次 executemany，
+            # 再按 id 区间取回新行（同一事务内新 rowid 均大于插入前的最大值，且按插入顺序递增）
+            before = self.connection.execute(select(func.coalesce(func.max(_question.c.id), 0))).scalar_one()
+            self.connection.execute(insert(_question), self._inserts)
+            inserted = self.connection.execute(
+                select(_question.c.id).where(_question.c.id > before).order_by(_question.c.id)
+            ).scalars().all()
+            entries = []
+            for question_id, row in zip(inserted, self._inserts):
+                self._existing[row["quiz_id"]][row["content_hash"]] = (
+                    question_id, row["explanation"], row["keywords_json"], row["tests_json"]
+                )
+                chapter_id, course_id = self._quiz_owner[row["quiz_id"]]
+                entries.append((question_id, chapter_id, course_id, row["stem"], row["explanation"]))
+            index_questions(self.connection, entries)
+            self.stats.inserted += len(inserted)
+
+        if self._updates:
+            self.connection.execute(
+                update(_question).where(_question.c.id == bindparam("question_id")).values(
+                    explanation=bindparam("explanation"), keywords_json=bindparam("keywords_json"),
+                    tests_json=bindparam("tests_json"), content_hash=bindparam("content_hash"),
+                ),
+                self._updates,
+            )
+            remove_questions(self.connection, [row["question_id"] for row in self._updates])
+            index_questions(self.connection, [
+                (row["question_id"], *self._quiz_owner[row["quiz_id"]], row["stem"], row["explanation"])
+                for row in self._updates
+            ])
+            self.stats.updated += len(self._updates)
+
+        for row in self._inserts + self._updates:
+            chapter_id, course_id = self._quiz_owner[row["quiz_id"]]
+            self.touched_chapters.add(chapter_id)
+            self.touched_courses.add(course_id)
+        self._inserts, self._updates = [], []
+        self.connection.commit()
+
+    def finish(self) -> ImportStats:
+        from .dedup import invalidate_course_index
+        from .quiz_cache import invalidate_chapter_quiz
+
+        self.flush()
+        invalidate_chapter_quiz(self.touched_chapters)
+        invalidate_course_index(self.touched_courses)
+        return self.stats
+
+
+# === 输入格式 ===
+
+def _open_text(path: Path):
+    if path.suffix == ".gz":
+        return gzip.open(path, "rt", encoding="utf-8")
+    return open(path, "r", encoding="utf-8")
+
+
+def _nested_to_records(courses: List[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    """把嵌套导出结构展开为与 NDJSON 相同的记录流"""
+    for course in courses:
+        yield {"record": "course", **{k: v for k, v in course.items() if k != "chapters"}}
+        for chapter in course.get("chapters") or []:
+            yield {"record": "chapter", **{k: v for k, v in chapter.items() if k not in ("sections", "quizzes")}}
+            for section in chapter.get("sections") or []:
+                yield {"record": "section", **section}
+            for quiz in chapter.get("quizzes") or []:
+                yield {"record": "quiz", **{k: v for k, v in quiz.items() if k != "questions"}}
+                for question in quiz.get("questions") or []:
+                    yield {"record": "question", **question}
+
+
+def iter_input(path: Path) -> Iterator[Dict[str, Any]]:
+    """
+    逐条产出输入中的记录；题库文件产出一条 {"record": "bank", ...}
+    """
+    name = path.name[:-3] if path.suffix == ".gz" else path.name
+    with _open_text(path) as f:
+        if name.endswith((".ndjson", ".jsonl")):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+            return
+        data = json.load(f)
+
+    if isinstance(data, list):
+        yield from _nested_to_records(data)
+    elif isinstance(data, dict):
+        match = _CHAPTER_FILE_PATTERN.search(name)
+        yield {"record": "bank", "file_chapter_index": int(match.group(1)) if match else None, **data}
+    else:
+        raise ValueError(f"无法识别的输入格式：{path}")
+
+
+def import_bank(importer: QuestionImporter, bank: Dict[str, Any], course_title: str):
+    """导入 run_all.py 生成的单章题库文件"""
+    meta = bank.get("meta") or {}
+    index = meta.get("chapter_index") or bank.get("file_chapter_index") or 1
+    chapter_title = meta.get("chapter_title") or f"第 {index} 章"
+
+    course_id = importer.course(course_title)
+    chapter_id = importer.chapter(course_id, int(index), chapter_title)
+    quiz_id = importer.quiz(chapter_id, meta.get("quiz_title") or f"{chapter_title} - 练习题",
+                            meta.get("quiz_description"))
+
+    for q_type, payload_model in QUESTION_SECTIONS.items():
+        for q in bank.get(q_type) or []:
+            try:
+                payload = payload_model.model_validate(q)
+            except ValidationError:
+                importer.stats.invalid += 1
+                continue
+            importer.add_question(
+                quiz_id, q_type, payload.question, payload.answer_text(),
+                options_json=payload.options_json(), explanation=payload.explanation,
+                keywords_json=payload.keywords_json(), tests_json=payload.tests_json(),
+            )
+
+
+def import_records(importer: QuestionImporter, records: Iterator[Dict[str, Any]],
+                   course_title: Optional[str] = None):
+    """
+    导入记录流；导出文件中的 id 只用于关联父子记录，写入时按内容匹配或生成新 id
+    course_title 用于题库文件，也可用于把导出记录合并到指定课程
+    """
+    course_map: Dict[Any, int] = {}
+    chapter_map: Dict[Any, int] = {}
+    section_map: Dict[Any, int] = {}
+    quiz_map: Dict[Any, int] = {}
+
+    for record in records:
+        kind = record.get("record")
+        if kind == "bank":
+            if not course_title:
+                raise ValueError("导入题库文件需要指定课程标题（--course-title）")
+            import_bank(importer, record, course_title)
+        elif kind == "course":
+            course_map[record.get("id")] = importer.course(
+                course_title or record["title"], record.get("description"), record.get("status") or "ready"
+            )
+        elif kind == "chapter" and record.get("course_id") in course_map:
+            chapter_map[record.get("id")] = importer.chapter(
+                course_map[record["course_id"]], int(record["index"]), record["title"], record.get("content_text")
+            )
+        elif kind == "section" and record.get("chapter_id") in chapter_map:
+            # 导出按目录顺序输出小节，上级小节总在下级之前
+            section_map[record.get("id")] = importer.section(
+                chapter_map[record["chapter_id"]], int(record["index"]), record["title"], int(record["level"]),
+                section_map.get(record.get("parent_id")), record.get("content_text")
+            )
+        elif kind == "quiz" and record.get("chapter_id") in chapter_map:
+            quiz_map[record.get("id")] = importer.quiz(
+                chapter_map[record["chapter_id"]], record["title"], record.get("description"),
+                section_map.get(record.get("section_id"))
+            )
+        elif kind == "question" and record.get("quiz_id") in quiz_map and record.get("stem") and record.get("type"):
+            importer.add_question(
+                quiz_map[record["quiz_id"]], record["type"], record["stem"], record.get("answer") or "",
+                options_json=record.get("options_json"), explanation=record.get("explanation"),
+                keywords_json=record.get("keywords_json"), tests_json=record.get("tests_json"),
+            )
+        else:
+            importer.stats.invalid += 1
@@ -0,0 +1,42 @@
+"""
+JSON 编解码：优先使用 orjson（比标准库快数倍），未安装时退回标准库 json。
+统一返回 / 接收 UTF-8 bytes，中文不转义。
+"""
+
+import json
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson 为可选依赖
+    orjson = None
+
+
+def dumps(obj: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def dumps_str(obj: Any) -> str:
+    """用于写入数据库文本字段"""
+    return dumps(obj).decode("utf-8")
+
+
+def loads(data) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+# 两种实现解析失败时抛出的异常（orjson.JSONDecodeError 是 json.JSONDecodeError 的子类）
+JSONDecodeError = json.JSONDecodeError
+
+
+class FastJSONResponse(JSONResponse):
+    """使用 json_codec 序列化的 JSONResponse，作为应用的默认响应类"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,179 @@
+"""
+基于版式的章节识别（用于没有目录书签的 PDF）：
+
+- 从均匀抽样的若干页中统计各字体样式（字号、是否加粗）的字符数，字符最多的是正文样式
+- 对全书逐页读取 page.get_text("dict")：同一次遍历既拼出页面文本，也标出候选标题行
+  （整行同一样式的短文本，字号明显大于正文、或与正文同号但加粗）；
+  页数较多时按页段分给多个进程并行扫描，进程池不可用时退化为顺序扫描
+- 按字号从大到小选择第一个“出现次数合理、且不是每页都出现（页眉）”的样式作为章标题，
+  在标题行处切分章节；找不到合适的样式时返回 None，由调用方退化为整本书一个章节
+- 章节正文按 text_clean.py 的规则去掉页眉页脚、页码并合并断行
+"""
+
+import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import fitz  # PyMuPDF
+
+from .text_clean import find_noise_lines, merge_lines, normalize_line
+
+# 用于学习版式的抽样页数
+SAMPLE_PAGES = 30
+# 页数达到该值才启用多进程扫描（进程启动本身有开销）
+PARALLEL_MIN_PAGES = 200
+MAX_WORKERS = 4
+
+# 标题行字号至少为正文的倍数；同号时要求加粗且正文不加粗
+HEADING_SIZE_RATIO = 1.15
+MAX_HEADING_CHARS = 80
+# 候选样式出现在超过该比例的页面上时视为页眉 / 页脚
+MAX_PAGE_RATIO = 0.5
+MIN_CHAPTERS = 2
+MAX_CHAPTERS = 200
+
+# (字号（取 0.5 的整数倍）, 是否加粗)
+Style = Tuple[float, bool]
+# 每页的行：(候选样式或 None, 行文本)
+PageLines = List[Tuple[Optional[Style], str]]
+
+
+def _span_style(span: Dict[str, Any]) -> Style:
+    bold = bool(span["flags"] & fitz.TEXT_FONT_BOLD) or "bold" in span["font"].lower()
+    return round(span["size"] * 2) / 2, bold
+
+
+def _iter_lines(page: "fitz.Page"):
+    """逐行产出 (各 span 的样式列表, 行文本)，忽略纯空白的 span"""
+    blocks = page.get_text("dict", flags=fitz.TEXTFLAGS_TEXT)["blocks"]
+    for block in blocks:
+        for line in block.get("lines", []):
+            spans = [span for span in line["spans"] if span["text"].strip()]
+            if spans:
+                yield [(_span_style(span), len(span["text"])) for span in spans], "".join(s["text"] for s in spans)
+
+
+def _line_style(styles: List[Tuple[Style, int]], text: str) -> Optional[Style]:
+    """整行只有一种样式且足够短时返回该样式"""
+    first = styles[0][0]
+    if len(text.strip()) > MAX_HEADING_CHARS or any(style != first for style, _ in styles):
+        return None
+    return first
+
+
+def learn_body_style(doc: "fitz.Document") -> Optional[Style]:
+    """抽样统计各样式的字符数，字符最多的即正文样式"""
+    page_count = doc.page_count
+    step = max(1, page_count // SAMPLE_PAGES)
+    chars: Counter = Counter()
+    for page_no in range(0, page_count, step):
+        for styles, _ in _iter_lines(doc[page_no]):
+            for style, length in styles:
+                chars[style] += length
+    return chars.most_common(1)[0][0] if chars else None
+
+
+def _is_heading_style(style: Style, body: Style) -> bool:
+    size, bold = style
+    body_size, body_bold = body
+    return size >= body_size * HEADING_SIZE_RATIO or (size >= body_size and bold and not body_bold)
+
+
+def _scan_pages(pdf_path: str, start: int, stop: int, body: Style) -> List[PageLines]:
+    """扫描 [start, stop) 页；作为进程池任务时在子进程中重新打开文档"""
+    pages: List[PageLines] = []
+    with fitz.open(pdf_path) as doc:
+        for page_no in range(start, stop):
+            lines: PageLines = []
+            for line_styles, text in _iter_lines(doc[page_no]):
+                style = _line_style(line_styles, text)
+                lines.append((style if style is not None and _is_heading_style(style, body) else None, text))
+            pages.append(lines)
+    return pages
+
+
+def scan_document(pdf_path: str, page_count: int, body: Style) -> List[PageLines]:
+    if page_count < PARALLEL_MIN_PAGES:
+        return _scan_pages(pdf_path, 0, page_count, body)
+
+    workers = min(MAX_WORKERS, os.cpu_count() or 1)
+    chunk = -(-page_count // workers)
+    ranges = [(start, min(start + chunk, page_count)) for start in range(0, page_count, chunk)]
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_scan_pages, pdf_path, start, stop, body) for start, stop in ranges]
+            return [page for future in futures for page in future.result()]
+    except Exception as e:
+        # 打包环境或受限环境中可能无法创建子进程
+        print(f"[WARN] Parallel layout scan failed, falling back to sequential: {e}")
+        return _scan_pages(pdf_path, 0, page_count, body)
+
+
+def _pick_style(pages: List[PageLines]) -> Optional[Style]:
+    """候选样式按字号从大到小、加粗优先依次检查"""
+    styles = {style for lines in pages for style, _ in lines if style is not None}
+    for style in sorted(styles, key=lambda style: (-style[0], not style[1])):
+        count = 0
+        page_hits = 0
+        for lines in pages:
+            hits = sum(1 for line_style, _ in lines if line_style == style)
+            count += hits
+            page_hits += hits > 0
+        if MIN_CHAPTERS <= count <= MAX_CHAPTERS and page_hits <= max(1, len(pages) * MAX_PAGE_RATIO):
+            return style
+    return None
+
+
+def detect_layout_chapters(pdf_path: str) -> Optional[List[Dict[str, Any]]]:
+    """
+    按版式切分章节，返回格式与 parse_chapters_from_pdf 相同：[{"title", "index", "content"}]
+    无法识别时返回 None
+    """
+    with fitz.open(pdf_path) as doc:
+        page_count = doc.page_count
+        body = learn_body_style(doc)
+    if body is None:
+        return None
+
+    pages = scan_document(pdf_path, page_count, body)
+    heading_style = _pick_style(pages)
+    if heading_style is None:
+        return None
+
+    # 去掉页眉页脚、页码，正文行合并断行（标题行保持原样）
+    normalized = [[normalize_line(text) for _, text in lines] for lines in pages]
+    noise = find_noise_lines(normalized)
+
+    chapters: List[Dict[str, Any]] = []
+    preface: List[str] = []
+    current: List[str] = preface
+    previous_heading = False
+    for lines, texts, drop in zip(pages, normalized, noise):
+        body: List[str] = []
+        for i, ((style, _), text) in enumerate(zip(lines, texts)):
+            is_heading = style == heading_style
+            if i in drop and not is_heading:
+                continue
+            if is_heading:
+                current.extend(merge_lines(body))
+                body = []
+            if is_heading and previous_heading:
+                # 跨行的标题（如“第1章”与“绪论”分两行）合并为一个
+                chapters[-1]["title"] += " " + text
+                current.append(text)
+            elif is_heading:
+                current = [text]
+                chapters.append({"title": text, "index": len(chapters) + 1, "lines": current})
+            else:
+                body.append(text)
+            previous_heading = is_heading
+        current.extend(merge_lines(body))
+        current.append("")
+        previous_heading = False
+
+    # 第一个标题之前的内容（封面、前言等）并入第一章
+    chapters[0]["lines"][:0] = preface
+    for chapter in chapters:
+        chapter["content"] = "\n".join(chapter.pop("lines")).strip()
+    return chapters
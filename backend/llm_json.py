@@ -0,0 +1,179 @@
+"""
+容错解析 LLM 输出的 JSON：
+
+- 去掉 ```json 代码块标记与前后的说明文字（不会误删内容中的 "json" 字样）
+- 删除 } / ] 之前多余的逗号，容忍字符串中未转义的换行
+- 输出被截断时，丢弃未写完的数组元素对象（例如最后一道题），补全括号，保留此前所有完整的题目
+- 通过 ParseReport 报告做了哪些修复、丢弃了哪些条目
+
+只依赖标准库，experiments/ 下的脚本也可直接导入。
+"""
+
+import json
+from dataclasses import dataclass, field
+from typing import Any, List, Optional, Tuple
+
+_CLOSERS = {"{": "}", "[": "]"}
+
+
+@dataclass
+class ParseReport:
+    repaired: bool = False
+    truncated: bool = False
+    # 因截断而被丢弃的条目路径，例如 "multiple_choice[7]"
+    dropped: List[str] = field(default_factory=list)
+
+    def summary(self) -> str:
+        parts = []
+        if self.truncated:
+            parts.append("输出被截断")
+        if self.dropped:
+            parts.append(f"丢弃不完整条目 {', '.join(self.dropped)}")
+        if self.repaired and not parts:
+            parts.append("已修复格式问题")
+        return "；".join(parts)
+
+
+@dataclass
+class _Container:
+    kind: str                    # "{" 或 "["
+    start: int                   # 在输出缓冲中的起始位置
+    last_good: int               # 截断时可安全切断的位置（最后一个完整值之后）
+    expect_key: bool = True      # 仅对象：下一个字符串是否为键
+    key: Optional[str] = None    # 仅对象：当前键
+    index: int = 0               # 仅数组：当前元素下标
+
+
+def strip_code_fence(text: str) -> str:
+    """
+    从第一个 { 或 [ 开始截取，并去掉末尾的代码块标记；
+    只处理首尾，题目内容（如代码题答案）中的 ``` 不受影响
+    """
+    text = text.strip()
+    starts = [i for i in (text.find("{"), text.find("[")) if i >= 0]
+    if starts:
+        text = text[min(starts):]
+    if text.endswith("```"):
+        text = text[:-3].rstrip()
+    return text
+
+
+def _path(stack: List[_Container]) -> str:
+    parts = []
+    for container in stack:
+        if container.kind == "[":
+            parts.append(f"[{container.index}]")
+        elif container.key is not None:
+            parts.append(("." if parts else "") + container.key)
+    return "".join(parts) or "$"
+
+
+def _repair(text: str, report: ParseReport) -> str:
+    """
+    单次扫描：删除多余逗号；若扫描结束时仍有未闭合的括号，按截断处理
+    """
+    out: List[str] = []
+    stack: List[_Container] = []
+    in_string = False
+    escaped = False
+    string_start = 0
+    end_of_root = None
+
+    for ch in text:
+        if in_string:
+            out.append(ch)
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+                if stack:
+                    top = stack[-1]
+                    if top.kind == "{" and top.expect_key:
+                        top.key = "".join(out[string_start + 1:-1])
+                    else:
+                        top.last_good = len(out)
+            continue
+
+        if ch == '"':
+            in_string = True
+            string_start = len(out)
+            out.append(ch)
+        elif ch in "{[":
+            stack.append(_Container(kind=ch, start=len(out), last_good=len(out) + 1))
+            out.append(ch)
+        elif ch in "}]":
+            # 删除收尾括号前多余的逗号
+            while out and out[-1].isspace():
+                out.pop()
+            if out and out[-1] == ",":
+                out.pop()
+                report.repaired = True
+            if not stack:
+                break
+            stack.pop()
+            out.append(ch)
+            if not stack:
+                end_of_root = len(out)
+                break
+            stack[-1].last_good = len(out)
+        elif ch == ",":
+            if stack:
+                top = stack[-1]
+                if top.kind == "{":
+                    top.expect_key = True
+                else:
+                    top.index += 1
+                top.last_good = len(out)
+            out.append(ch)
+        elif ch == ":":
+            if stack and stack[-1].kind == "{":
+                stack[-1].expect_key = False
+            out.append(ch)
+        else:
+            # 数字 / true / false / null 只有遇到后面的 , 或括号才算写完，因此不更新 last_good
+            out.append(ch)
+
+    if end_of_root is not None or not stack:
+        return "".join(out)
+
+    # === 截断：丢弃未完成的数组元素对象，补全剩余括号 ===
+    report.truncated = True
+    report.repaired = True
+    cut_level = None
+    for level in range(1, len(stack)):
+        if stack[level].kind == "{" and stack[level - 1].kind == "[":
+            cut_level = level
+            break
+
+    if cut_level is not None:
+        report.dropped.append(_path(stack[:cut_level]))
+        cut = stack[cut_level].start
+        stack = stack[:cut_level]
+    else:
+        cut = stack[-1].last_good
+
+    repaired = "".join(out[:cut]).rstrip()
+    if repaired.endswith(","):
+        repaired = repaired[:-1]
+    return repaired + "".join(_CLOSERS[c.kind] for c in reversed(stack))
+
+
+def parse_llm_json(text: str) -> Tuple[Any, ParseReport]:
+    """
+    解析模型输出，返回 (数据, 修复报告)；无法修复时抛出 ValueError
+    """
+    report = ParseReport()
+    cleaned = strip_code_fence(text or "")
+    try:
+        return json.loads(cleaned, strict=False), report
+    except json.JSONDecodeError:
+        pass
+
+    repaired = _repair(cleaned, report)
+    report.repaired = True
+    try:
+        return json.loads(repaired, strict=False), report
+    except json.JSONDecodeError as e:
+        raise ValueError(f"无法解析模型输出的 JSON: {e}") from e
@@ -0,0 +1,132 @@
+"""
+LLM 调用用量记录：
+
+- services._chat_completion 每次调用（含重试）结束后写入一行 LLMCall：用途、模型、结果、
+  prompt / completion / 缓存命中 token、总耗时与尝试次数
+- 调用归属（课程 / 章节 / 题目）通过 contextvar 传递：调用方用 `with llm_context(...)` 包住 LLM 调用即可，
+  不需要逐层传参；只给出题目或章节时自动补全所属章节与课程
+- 线程池中的任务不会继承调用方的 context，需在任务函数内部设置
+- 写入使用独立连接，失败只打印警告，不影响调用本身
+- 同时记录到 /metrics 的 LLM 耗时直方图与 token 计数器（见 metrics.py）
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import case, func, insert, select, text
+from sqlmodel import Session
+
+from .metrics import observe_llm_call
+from .models import Chapter, LLMCall
+
+_context: ContextVar[Dict[str, Optional[int]]] = ContextVar("llm_context", default={})
+
+
+@contextmanager
+def llm_context(course_id: Optional[int] = None, chapter_id: Optional[int] = None,
+                question_id: Optional[int] = None):
+    """在当前上下文中标记 LLM 调用的归属，嵌套时内层未给出的字段沿用外层"""
+    fields = {"course_id": course_id, "chapter_id": chapter_id, "question_id": question_id}
+    merged = {**_context.get(), **{k: v for k, v in fields.items() if v is not None}}
+    token = _context.set(merged)
+    try:
+        yield
+    finally:
+        _context.reset(token)
+
+
+def _resolve_owner(connection, owner: Dict[str, Optional[int]]) -> Dict[str, Optional[int]]:
+    owner = dict(owner)
+    if owner.get("question_id") and not owner.get("chapter_id"):
+        row = connection.execute(text(
+            "SELECT quiz.chapter_id FROM question JOIN quiz ON question.quiz_id = quiz.id WHERE question.id = :id"
+        ), {"id": owner["question_id"]}).first()
+        if row:
+            owner["chapter_id"] = row.chapter_id
+    if owner.get("chapter_id") and not owner.get("course_id"):
+        owner["course_id"] = connection.execute(
+            text("SELECT course_id FROM chapter WHERE id = :id"), {"id": owner["chapter_id"]}
+        ).scalar()
+    return owner
+
+
+def record_llm_call(purpose: str, model: str, status: str, latency_ms: int, attempts: int,
+                    usage: Optional[Dict[str, Any]] = None, error: Optional[str] = None):
+    from .database import engine
+
+    usage = usage or {}
+    observe_llm_call(purpose, status, latency_ms, attempts, usage)
+    try:
+        with engine.begin() as connection:
+            owner = _resolve_owner(connection, _context.get())
+            connection.execute(insert(LLMCall.__table__).values(
+                **LLMCall(
+                    purpose=purpose,
+                    model=model,
+                    status=status,
+                    course_id=owner.get("course_id"),
+                    chapter_id=owner.get("chapter_id"),
+                    question_id=owner.get("question_id"),
+                    prompt_tokens=usage.get("prompt_tokens") or 0,
+                    completion_tokens=usage.get("completion_tokens") or 0,
+                    cached_tokens=usage.get("prompt_cache_hit_tokens") or 0,
+                    latency_ms=latency_ms,
+                    attempts=attempts,
+                    error=error[:500] if error else None,
+                ).model_dump(exclude={"id"})
+            ))
+    except Exception as e:
+        print(f"[WARN] Failed to record LLM usage: {e}")
+
+
+def _rollup_columns():
+    return [
+        func.count(LLMCall.id).label("calls"),
+        func.sum(case((LLMCall.status != "ok", 1), else_=0)).label("errors"),
+        func.sum(LLMCall.attempts - 1).label("retries"),
+        func.sum(LLMCall.prompt_tokens).label("prompt_tokens"),
+        func.sum(LLMCall.completion_tokens).label("completion_tokens"),
+        func.sum(LLMCall.cached_tokens).label("cached_tokens"),
+        func.sum(LLMCall.latency_ms).label("total_latency_ms"),
+        func.avg(LLMCall.latency_ms).label("avg_latency_ms"),
+        func.max(LLMCall.latency_ms).label("max_latency_ms"),
+    ]
+
+
+def _rollup_dict(row) -> Dict[str, Any]:
+    return {
+        "calls": row.calls,
+        "errors": row.errors or 0,
+        "retries": row.retries or 0,
+        "prompt_tokens": row.prompt_tokens or 0,
+        "completion_tokens": row.completion_tokens or 0,
+        "cached_tokens": row.cached_tokens or 0,
+        "total_latency_ms": row.total_latency_ms or 0,
+        "avg_latency_ms": round(row.avg_latency_ms or 0),
+        "max_latency_ms": row.max_latency_ms or 0,
+    }
+
+
+def course_usage(session: Session, course_id: int) -> Dict[str, Any]:
+    """课程的 LLM 用量汇总：总计、按用途、按章节（按 token 总量降序）"""
+    where = LLMCall.course_id == course_id
+    total = session.exec(select(*_rollup_columns()).where(where)).one()
+
+    by_purpose: List[Dict[str, Any]] = [
+        {"purpose": row.purpose, **_rollup_dict(row)}
+        for row in session.exec(
+            select(LLMCall.purpose, *_rollup_columns()).where(where).group_by(LLMCall.purpose).order_by(LLMCall.purpose)
+        )
+    ]
+    by_chapter: List[Dict[str, Any]] = [
+        {"chapter_id": row.chapter_id, "title": row.title, **_rollup_dict(row)}
+        for row in session.exec(
+            select(LLMCall.chapter_id, Chapter.title, *_rollup_columns())
+            .join(Chapter, Chapter.id == LLMCall.chapter_id, isouter=True)
+            .where(where)
+            .group_by(LLMCall.chapter_id, Chapter.title)
+            .order_by((func.sum(LLMCall.prompt_tokens) + func.sum(LLMCall.completion_tokens)).desc())
+        )
+    ]
+    return {"course_id": course_id, **_rollup_dict(total), "by_purpose": by_purpose, "by_chapter": by_chapter}
@@ -0,0 +1,275 @@
+"""
+Prometheus 指标（文本格式 0.0.4，由 GET /metrics 输出）：
+
+- 不依赖 prometheus_client：计数器 / 仪表 / 直方图都是带锁的字典，记录一次只需一次加锁和二分查找，
+  可以常开
+- HTTP：纯 ASGI 中间件按路由模板（而非原始路径，避免标签爆炸）记录请求耗时与进行中的请求数
+- LLM：llm_usage.record_llm_call 写入调用记录时同时记录耗时与 token
+- 数据库：engine 的 before / after_cursor_execute 事件记录语句数与耗时（按 SELECT / INSERT 等分类）
+- 后台任务：
+  - 线程池（Word 导出、课程导出、批量评分）的排队数在抓取时读取；
+    线程池在所属模块首次导入时登记，此前不出现在指标中
+  - 解析 / 生成任务由 FastAPI BackgroundTasks 执行：接受请求后到开始执行前计入 queued_tasks，
+    运行期间计入 active_tasks
+  - PDF 解析页数与耗时的计数器相除即为每秒解析页数
+"""
+
+import bisect
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+LabelValues = Tuple[str, ...]
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LLM_BUCKETS = (0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 90.0, 120.0, 180.0)
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return self._header() + [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}" for labels, value in items
+        ]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 callback: Optional[Callable[[], Iterable[Tuple[LabelValues, float]]]] = None):
+        super().__init__(name, documentation, labelnames)
+        self._callback = callback
+
+    def dec(self, *labels: str, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+    def set(self, value: float, *labels: str):
+        with self._lock:
+            self._values[labels] = value
+
+    def render(self) -> List[str]:
+        if self._callback is not None:
+            values = dict(self._callback())
+            with self._lock:
+                self._values = values
+        return super().render()
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [各桶计数（非累计，最后一个为 +Inf）, 总和]
+        self._values: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, *labels: str):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = ([0] * (len(self.buckets) + 1), [0.0])
+            entry[0][index] += 1
+            entry[1][0] += value
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted((labels, (list(counts), total[0])) for labels, (counts, total) in self._values.items())
+        lines = self._header()
+        for labels, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+_registry: List[_Metric] = []
+
+
+def _register(metric):
+    _registry.append(metric)
+    return metric
+
+
+def render_metrics() -> str:
+    lines: List[str] = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# === 指标定义 ===
+
+http_request_duration = _register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template", ("method", "route", "status")))
+http_requests_in_progress = _register(Gauge(
+    "http_requests_in_progress", "HTTP requests currently being served", ("method",)))
+
+llm_request_duration = _register(Histogram(
+    "llm_request_duration_seconds", "LLM call latency including retries", ("purpose", "status"), LLM_BUCKETS))
+llm_tokens = _register(Counter("llm_tokens_total", "LLM tokens consumed", ("purpose", "kind")))
+llm_retries = _register(Counter("llm_retries_total", "LLM call retries", ("purpose",)))
+
+db_query_duration = _register(Histogram(
+    "db_query_duration_seconds", "Database statement latency", ("operation",), DB_BUCKETS))
+
+queued_tasks = _register(Gauge(
+    "queued_tasks", "Background parsing / generation tasks accepted but not yet started", ("kind",)))
+active_tasks = _register(Gauge("active_tasks", "Background parsing / generation tasks running", ("kind",)))
+pdf_pages_parsed = _register(Counter("pdf_pages_parsed_total", "PDF pages parsed"))
+pdf_parse_seconds = _register(Counter(
+    "pdf_parse_seconds_total", "Time spent parsing PDFs; rate(pages) / rate(seconds) = pages per second"))
+
+_executors: Dict[str, object] = {}
+# ThreadPoolExecutor 没有公开排队数的接口，读取其内部队列
+executor_queue_depth = _register(Gauge(
+    "executor_queue_depth", "Work items waiting in background thread pools", ("executor",),
+    callback=lambda: [((name, ), executor._work_queue.qsize()) for name, executor in _executors.items()],
+))
+
+
+def register_executor(name: str, executor):
+    """登记线程池，抓取时读取其排队任务数"""
+    _executors[name] = executor
+
+
+def observe_llm_call(purpose: str, status: str, latency_ms: int, attempts: int, usage: Optional[dict]):
+    llm_request_duration.observe(latency_ms / 1000, purpose, status)
+    if attempts > 1:
+        llm_retries.inc(purpose, amount=attempts - 1)
+    if usage:
+        llm_tokens.inc(purpose, "prompt", amount=usage.get("prompt_tokens") or 0)
+        llm_tokens.inc(purpose, "completion", amount=usage.get("completion_tokens") or 0)
+
+
+def observe_pdf_parse(pages: int, seconds: float):
+    pdf_pages_parsed.inc(amount=pages)
+    pdf_parse_seconds.inc(amount=seconds)
+
+
+def task_queued(kind: str):
+    """后台任务加入 BackgroundTasks 时调用，任务开始执行（track_task(kind, queued=True)）时移出"""
+    queued_tasks.inc(kind)
+
+
+class track_task:
+    """with track_task("generation"): ... 运行期间计入 active_tasks；queued=True 表示之前调用过 task_queued"""
+
+    def __init__(self, kind: str, queued: bool = False):
+        self.kind = kind
+        self.queued = queued
+
+    def __enter__(self):
+        if self.queued:
+            queued_tasks.dec(self.kind)
+        active_tasks.inc(self.kind)
+
+    def __exit__(self, *exc):
+        active_tasks.dec(self.kind)
+
+
+# === 数据库 ===
+
+def instrument_engine(engine: Engine):
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        context._metrics_started = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, "_metrics_started", None)
+        if started is None:
+            return
+        operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+        if operation not in ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH"):
+            operation = "OTHER"
+        db_query_duration.observe(time.perf_counter() - started, operation)
+
+
+# === HTTP ===
+
+class MetricsMiddleware:
+    """纯 ASGI 中间件（不使用 BaseHTTPMiddleware，避免额外的任务与流式响应缓冲）"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status = ["500"]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = str(message["status"])
+            await send(message)
+
+        started = time.perf_counter()
+        http_requests_in_progress.inc(method)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_requests_in_progress.dec(method)
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or "unmatched"
+            http_request_duration.observe(time.perf_counter() - started, method, route_path, status[0])
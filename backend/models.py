@@ -1,5 +1,6 @@
 from datetime import datetime
 from typing import List, Optional
+from sqlalchemy import Index
 from sqlmodel import Field, Relationship, SQLModel
 
 # === 模型 ===
@@ -27,10 +28,24 @@ class Chapter(SQLModel, table=True):
     
     course: Course = Relationship(back_populates="chapters")
     quizzes: List["Quiz"] = Relationship(back_populates="chapter", sa_relationship_kwargs={"cascade": "all, delete-orphan"})
+    sections: List["Section"] = Relationship(back_populates="chapter", sa_relationship_kwargs={"cascade": "all, delete-orphan"})
+
+class Section(SQLModel, table=True):
+    # 章节下的多级目录（节、小节），正文为章节正文的切片
+    id: Optional[int] = Field(default=None, primary_key=True)
+    chapter_id: int = Field(foreign_key="chapter.id")
+    parent_id: Optional[int] = Field(default=None, foreign_key="section.id") # 上级小节，顶层小节为空
+    title: str
+    level: int  # 目录层级（章为 1，节从 2 开始）
+    index: int  # 在章节内按目录顺序的序号
+    content_text: Optional[str] = Field(default=None) # 包含下级小节的正文
+
+    chapter: Chapter = Relationship(back_populates="sections")
 
 class Quiz(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     chapter_id: int = Field(foreign_key="chapter.id")
+    section_id: Optional[int] = Field(default=None, foreign_key="section.id") # 按小节生成时记录所属小节
     title: str
     description: Optional[str] = None
     created_at: datetime = Field(default_factory=datetime.now)
@@ -39,6 +54,9 @@ class Quiz(SQLModel, table=True):
     questions: List["Question"] = Relationship(back_populates="quiz", sa_relationship_kwargs={"cascade": "all, delete-orphan"})
 
 class Question(SQLModel, table=True):
+    # 导入时按 (quiz_id, content_hash) 查找已有题目，实现幂等导入
+    __table_args__ = (Index("ix_question_quiz_content_hash", "quiz_id", "content_hash"),)
+
     id: Optional[int] = Field(default=None, primary_key=True)
     quiz_id: int = Field(foreign_key="quiz.id")
     type: str  # "multiple_choice", "multi_select", "fill_in_blank", "true_false", "short_answer", "code"
@@ -48,6 +66,10 @@ class Question(SQLModel, table=True):
     options_json: Optional[str] = None # JSON string for options ["A...", "B..."]（仅单选/多选题）
     answer: str
     explanation: Optional[str] = None
+    keywords_json: Optional[str] = None # JSON string for keywords ["...", "..."]（仅简答题，用于本地快速评分）
+    tests_json: Optional[str] = None # JSON string for test statements ["assert f(1) == 1", ...]（仅代码题，用于沙箱执行评分）
+    duplicate_of: Optional[int] = None # 与同课程已有题目近似重复时记录原题 ID（见 dedup.py）
+    content_hash: Optional[str] = None # 题型 + 题干 + 选项 + 答案的哈希（见 schemas.question_content_hash）
     
     quiz: Quiz = Relationship(back_populates="questions")
 
@@ -63,6 +85,7 @@ class QuestionRead(SQLModel):
 
 class QuizReadWithQuestions(SQLModel):
     id: int
+    section_id: Optional[int] = None
     title: str
     description: Optional[str] = None
     questions: List[QuestionRead] = []
@@ -72,6 +95,15 @@ class ChapterRead(SQLModel):
     title: str
     index: int
     has_quiz: bool = False
+    section_count: int = 0
+
+class SectionRead(SQLModel):
+    id: int
+    parent_id: Optional[int] = None
+    title: str
+    level: int
+    index: int
+    has_quiz: bool = False
 
 
 # 新增：错题记录表
@@ -80,4 +112,21 @@ class MistakeRecord(SQLModel, table=True):
     question_id: int = Field(foreign_key="question.id") # 关联题目ID
     course_id: int = Field(foreign_key="course.id")     # 关联课程ID 
     created_at: datetime = Field(default_factory=datetime.utcnow) # 记录错题时间
-    
\ No newline at end of file
+    
+
+# LLM 调用记录（用量、耗时与结果，见 llm_usage.py）
+class LLMCall(SQLModel, table=True):
+    id: Optional[int] = Field(default=None, primary_key=True)
+    created_at: datetime = Field(default_factory=datetime.now)
+    purpose: str  # generate_quiz / grade_short_answer / grade_short_batch / review_code / code_tests / code_style
+    model: str
+    status: str  # ok / error / timeout
+    course_id: Optional[int] = Field(default=None, index=True)
+    chapter_id: Optional[int] = None
+    question_id: Optional[int] = None
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cached_tokens: int = 0 # DeepSeek 上下文缓存命中的 prompt token
+    latency_ms: int = 0 # 含重试的总耗时
+    attempts: int = 1
+    error: Optional[str] = None
@@ -0,0 +1,253 @@
+"""
+按需性能剖析：
+
+- 默认完全关闭：只有启动服务时设置了环境变量 PROFILING_ENABLED=1 才挂载中间件并开放 /api/debug 剖析接口，
+  否则请求路径上没有任何剖析代码，接口返回 404
+- 同时设置 PROFILING_TOKEN 时，X-Profile 请求头的值必须等于该令牌，剖析接口也必须带 X-Profile-Token 请求头
+- 开启方式：单个请求带 `X-Profile: 1`（或令牌）请求头；或 POST /api/debug/profiling 打开全局开关
+  （可指定剖析接下来的 N 个请求），后台任务在全局开关打开时也会被剖析
+- 请求：采样剖析。后台线程每隔 SAMPLE_INTERVAL 秒抓取所有线程的调用栈
+  （同步路由在线程池中执行，async 路由在事件循环线程中执行，两种都能采到），
+  输出 collapsed stack 格式（.folded），可用 speedscope / flamegraph.pl 查看；空闲等待的栈会被过滤。
+  采样不区分请求：同一时间其他请求与后台任务的栈也会计入，需要干净的结果时应在没有并发流量时剖析
+- 后台任务（run_*_task）：在单个线程中执行，使用 cProfile，输出 .prof（pstats 格式）和按累计耗时排序的 .txt；
+  同一时间只剖析一个任务（Python 3.12 起只允许一个 cProfile 处于启用状态），其余任务照常执行、不剖析
+- 结果保存在 data/profiles，GET /api/debug/profiles 列出，GET /api/debug/profiles/{name} 下载；
+  带请求头的请求会在响应头 X-Profile-Id 中返回剖析文件名
+- 请求触发的 BackgroundTasks 在响应发出后、仍在同一请求内执行，因此也会出现在该请求的采样结果中
+"""
+
+import cProfile
+import hmac
+import io
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+PROFILE_DIR = Path("data") / "profiles"
+SAMPLE_INTERVAL = 0.005
+# 最多保留的剖析次数（任务剖析每次生成 .prof 与 .txt 两个文件），超出后删除最早的文件
+MAX_PROFILES = 200
+PROFILE_HEADER = b"x-profile"
+
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "").strip().lower() in ("1", "true", "yes")
+PROFILING_TOKEN = os.getenv("PROFILING_TOKEN") or None
+
+# 全局开关：remaining 为剩余要剖析的请求数，None 表示不限
+_state: Dict[str, Any] = {"enabled": False, "remaining": None}
+_state_lock = threading.Lock()
+# 带 X-Profile 请求头的请求中启动的后台任务同样剖析（线程池会复制当前 context）
+_requested: ContextVar[bool] = ContextVar("profile_requested", default=False)
+
+# 线程空闲等待时所在的函数，采样时跳过这些栈
+_IDLE_FRAMES = {
+    ("threading.py", "wait"), ("queue.py", "get"), ("selectors.py", "select"),
+    ("thread.py", "_worker"), ("base_events.py", "_run_once"),
+}
+_SAFE_NAME_PATTERN = re.compile(r"[^A-Za-z0-9_.-]+")
+# 同一时间只允许一个任务剖析
+_task_profiler_lock = threading.Lock()
+
+
+def check_token(token: Optional[str]) -> bool:
+    """未设置 PROFILING_TOKEN 时不校验"""
+    return PROFILING_TOKEN is None or hmac.compare_digest((token or "").encode(), PROFILING_TOKEN.encode())
+
+
+def profiling_state() -> Dict[str, Any]:
+    with _state_lock:
+        return dict(_state)
+
+
+def set_profiling(enabled: bool, requests: Optional[int] = None) -> Dict[str, Any]:
+    with _state_lock:
+        _state["enabled"] = enabled
+        _state["remaining"] = requests if enabled else None
+    return profiling_state()
+
+
+def _take_global_slot() -> bool:
+    """全局开关打开时占用一个剖析名额"""
+    if not _state["enabled"]:
+        return False
+    with _state_lock:
+        if not _state["enabled"]:
+            return False
+        if _state["remaining"] is not None:
+            _state["remaining"] -= 1
+            if _state["remaining"] <= 0:
+                _state["enabled"] = False
+                _state["remaining"] = None
+        return True
+
+
+def _artifact_path(kind: str, label: str, suffix: str) -> Path:
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+    label = _SAFE_NAME_PATTERN.sub("_", label).strip("_")[:80] or "root"
+    return PROFILE_DIR / f"{stamp}-{kind}-{label}{suffix}"
+
+
+def _prune():
+    files = sorted(PROFILE_DIR.glob("*"), key=lambda p: p.stat().st_mtime)
+    for path in files[:max(len(files) - MAX_PROFILES * 2, 0)]:
+        path.unlink(missing_ok=True)
+
+
+class StackSampler:
+    """定时抓取所有线程的调用栈，按 collapsed stack 统计出现次数"""
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL):
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self) -> Counter:
+        self._stop.set()
+        self._thread.join()
+        return self.samples
+
+    def _run(self):
+        names = {}
+        while not self._stop.wait(self.interval):
+            own = threading.get_ident()
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                code = frame.f_code
+                if (os.path.basename(code.co_filename), code.co_name) in _IDLE_FRAMES:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                if thread_id not in names:
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                stack.append(names.get(thread_id, str(thread_id)))
+                self.samples[";".join(reversed(stack))] += 1
+
+
+def _write_folded(path: Path, samples: Counter):
+    with path.open("w", encoding="utf-8") as f:
+        for stack, count in samples.most_common():
+            f.write(f"{stack} {count}\n")
+
+
+@contextmanager
+def profile_task(name: str):
+    """
+    剖析后台任务（cProfile），全局开关打开或由带 X-Profile 的请求触发时生效，否则不做任何事
+    """
+    if not (_requested.get() or _take_global_slot()):
+        yield
+        return
+    if not _task_profiler_lock.acquire(blocking=False):
+        print(f"[INFO] Another task is being profiled, running {name} without profiling")
+        yield
+        return
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError as e:
+        # 其他剖析工具（调试器、覆盖率等）已占用时不剖析，任务照常执行
+        _task_profiler_lock.release()
+        print(f"[WARN] Cannot profile {name}: {e}")
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        _task_profiler_lock.release()
+        try:
+            path = _artifact_path("task", name, ".prof")
+            profiler.dump_stats(str(path))
+            summary = io.StringIO()
+            stats = pstats.Stats(profiler, stream=summary).sort_stats("cumulative")
+            summary.write(f"# {name}: {time.perf_counter() - started:.3f}s\n")
+            stats.print_stats(60)
+            path.with_suffix(".txt").write_text(summary.getvalue(), encoding="utf-8")
+            _prune()
+            print(f"[INFO] Saved task profile {path.name}")
+        except Exception as e:
+            print(f"[WARN] Failed to save task profile for {name}: {e}")
+
+
+def list_profiles() -> List[Dict[str, Any]]:
+    if not PROFILE_DIR.is_dir():
+        return []
+    files = sorted(PROFILE_DIR.iterdir(), key=lambda p: p.stat().st_mtime, reverse=True)
+    return [
+        {"name": path.name, "size": path.stat().st_size,
+         "created_at": datetime.fromtimestamp(path.stat().st_mtime).isoformat(timespec="seconds")}
+        for path in files if path.is_file()
+    ]
+
+
+def profile_path(name: str) -> Optional[Path]:
+    """按文件名取剖析文件，拒绝目录穿越"""
+    if _SAFE_NAME_PATTERN.search(name) or name.startswith("."):
+        return None
+    path = PROFILE_DIR / name
+    return path if path.is_file() else None
+
+
+class ProfilingMiddleware:
+    """纯 ASGI 中间件：X-Profile 请求头或全局开关打开时对该请求采样剖析"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not (_wants_profile(scope) or _take_global_slot()):
+            await self.app(scope, receive, send)
+            return
+
+        path = _artifact_path("request", f"{scope['method']}-{scope['path']}", ".folded")
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(b"x-profile-id", path.name.encode())]
+            await send(message)
+
+        token = _requested.set(True)
+        sampler = StackSampler().start()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            samples = sampler.stop()
+            _requested.reset(token)
+            try:
+                _write_folded(path, samples)
+                _prune()
+                print(f"[INFO] Saved request profile {path.name} "
+                      f"({time.perf_counter() - started:.3f}s, {sum(samples.values())} samples)")
+            except Exception as e:
+                print(f"[WARN] Failed to save request profile: {e}")
+
+
+def _wants_profile(scope) -> bool:
+    for key, value in scope["headers"]:
+        if key == PROFILE_HEADER:
+            if PROFILING_TOKEN is not None:
+                return check_token(value.decode("latin-1"))
+            return value not in (b"0", b"false", b"")
+    return False
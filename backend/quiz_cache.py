@@ -0,0 +1,101 @@
+"""
+章节题目读取缓存：
+
+- 用一次联表查询取出章节下所有 Quiz 及其 Question，避免逐个 quiz 懒加载 questions
+- 序列化结果（JSON bytes）按章节缓存，并附带基于内容哈希的 ETag；
+  最多缓存 MAX_CACHED_CHAPTERS 个章节，超出后淘汰最久未访问的章节（LRU）
+- 保存 / 删除 quiz 时需调用 invalidate_chapter_quiz 使缓存失效
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlmodel import Session, select
+
+from . import json_codec
+from .models import Question, Quiz
+
+MAX_CACHED_CHAPTERS = 256
+
+# chapter_id -> (etag, payload bytes)，按最近访问顺序排列
+_cache: "OrderedDict[int, Tuple[str, bytes]]" = OrderedDict()
+# chapter_id -> 失效次数，防止并发读取把失效前的旧数据写回缓存
+_versions: Dict[int, int] = {}
+_lock = threading.Lock()
+
+
+def _question_dict(q: Question) -> dict:
+    # 字段与 QuestionRead 保持一致
+    return {
+        "id": q.id,
+        "type": q.type,
+        "stem": q.stem,
+        "options_json": q.options_json,
+        "answer": q.answer,
+        "explanation": q.explanation,
+    }
+
+
+def load_chapter_quizzes(session: Session, chapter_id: int) -> List[dict]:
+    """
+    一次联表查询取出章节下的全部 quiz 与题目，返回与 QuizReadWithQuestions 相同结构的字典列表
+    """
+    statement = (
+        select(Quiz, Question)
+        .join(Question, Question.quiz_id == Quiz.id, isouter=True)
+        .where(Quiz.chapter_id == chapter_id)
+        .order_by(Quiz.id, Question.id)
+    )
+
+    quizzes: List[dict] = []
+    current: Optional[dict] = None
+    for quiz, question in session.exec(statement):
+        if current is None or current["id"] != quiz.id:
+            current = {
+                "id": quiz.id,
+                "section_id": quiz.section_id,
+                "title": quiz.title,
+                "description": quiz.description,
+                "questions": [],
+            }
+            quizzes.append(current)
+        if question is not None:
+            current["questions"].append(_question_dict(question))
+    return quizzes
+
+
+def get_chapter_quiz_payload(session: Session, chapter_id: int) -> Tuple[str, bytes]:
+    """
+    返回 (etag, JSON bytes)。命中缓存时不访问数据库。
+    """
+    with _lock:
+        cached = _cache.get(chapter_id)
+        if cached is not None:
+            _cache.move_to_end(chapter_id)
+        version = _versions.get(chapter_id, 0)
+    if cached is not None:
+        return cached
+
+    quizzes = load_chapter_quizzes(session, chapter_id)
+    payload = json_codec.dumps(quizzes)
+    etag = f'"{hashlib.blake2b(payload, digest_size=16).hexdigest()}"'
+
+    with _lock:
+        if _versions.get(chapter_id, 0) == version:
+            _cache[chapter_id] = (etag, payload)
+            _cache.move_to_end(chapter_id)
+            while len(_cache) > MAX_CACHED_CHAPTERS:
+                _cache.popitem(last=False)
+    return etag, payload
+
+
+def invalidate_chapter_quiz(chapter_ids: Iterable[int]):
+    """
+    使指定章节的缓存失效（保存或删除 quiz 后调用）
+    """
+    with _lock:
+        for chapter_id in chapter_ids:
+            _cache.pop(chapter_id, None)
+            _versions[chapter_id] = _versions.get(chapter_id, 0) + 1
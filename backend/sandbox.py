@@ -0,0 +1,386 @@
+"""
+代码题本地执行沙箱：
+
+- 学生代码在独立的 Python 子进程中运行，限制 CPU 时间、内存、输出文件大小与墙钟时间；
+  限制在 runner 内设置（不使用 preexec_fn，多线程服务中 fork 后执行 Python 代码不安全）
+- 以 root 运行时子进程降权为 nobody 并禁止再创建进程，文件系统对其只读
+- 子进程内通过审计钩子：
+  - 禁止网络、创建子进程、加载动态库以及 os / shutil 的文件操作（删除、重命名、建目录等）
+  - open 只允许读取标准库目录（导入模块需要）与读写自己的临时工作目录
+  - 禁止导入 os、_posixsubprocess、ctypes、socket 等模块
+  - 禁止 sys._getframe、sys.settrace、gc.get_objects 等可以拿到栈帧或任意对象的接口
+- 每个子进程使用独立的临时工作目录，任务结束后删除；环境变量清空
+- 返回给学生的错误只有一行（异常类型、消息与所在行号），不包含 traceback
+- 学生代码与判定结果在同一解释器中：runner 的状态都是学生代码运行前绑定的局部变量，
+  取栈帧、遍历对象、注册审计钩子的接口被禁止；结果行带上父进程为每个任务生成的随机 nonce，
+  学生代码伪造的输出没有 nonce，会被父进程丢弃；测试使用独立的 globals 与 builtins 副本
+  （断言仍会调用学生返回对象的 __eq__ 等方法，这类作弊需要人工复核）
+- 预先启动若干"热"解释器等待任务，每个进程只执行一次任务后退出，用完后在后台补充
+- 仅支持 Python 代码；打包为 exe 运行时（sys.frozen）无法启动独立解释器，此时沙箱不可用
+- 审计钩子并非严格的安全边界，需要更强隔离时应在容器 / 独立用户下运行整个服务
+"""
+
+import ast
+import json
+import os
+import queue
+import secrets
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+from typing import Any, Dict, List, Optional
+
+# 资源限制
+CPU_TIME_LIMIT = 5            # 秒
+WALL_TIME_LIMIT = 10          # 秒
+MEMORY_LIMIT = 256 * 1024 * 1024
+FILE_SIZE_LIMIT = 1024 * 1024
+MAX_OUTPUT_CHARS = 2000
+# 单条错误信息的最大长度
+MAX_ERROR_CHARS = 300
+
+# 热解释器池大小
+POOL_SIZE = 2
+
+# 以 root 运行时子进程降权到的用户（nobody）
+SANDBOX_UID = 65534
+SANDBOX_GID = 65534
+
+# 子进程内执行的 runner：先完成限制设置，再阻塞读取 stdin 上的任务（含 nonce），之后才安装钩子、执行学生代码
+# argv: CPU 秒数、内存字节数、文件大小字节数、错误信息最大长度、降权 uid、降权 gid
+_RUNNER = r'''
+import builtins, io, json, os, stat, sys
+
+# 常用标准库在降权与安装钩子前预先导入（降权后可能无法再读取标准库目录）
+import array, bisect, collections, copy, dataclasses, datetime, decimal, enum, fractions, functools, heapq
+import itertools, math, operator, random, re, statistics, string, textwrap, typing
+
+CPU_LIMIT, MEMORY_LIMIT, FILE_SIZE_LIMIT, MAX_ERROR = (int(v) for v in sys.argv[1:5])
+
+if os.name == "posix":
+    import resource
+    resource.setrlimit(resource.RLIMIT_CPU, (CPU_LIMIT, CPU_LIMIT))
+    resource.setrlimit(resource.RLIMIT_AS, (MEMORY_LIMIT, MEMORY_LIMIT))
+    resource.setrlimit(resource.RLIMIT_FSIZE, (FILE_SIZE_LIMIT, FILE_SIZE_LIMIT))
+    if os.getuid() == 0:
+        os.setgroups([])
+        os.setgid(int(sys.argv[6]))
+        os.setuid(int(sys.argv[5]))
+        resource.setrlimit(resource.RLIMIT_NPROC, (0, 0))
+
+
+def _sandbox(type=type, str=str, bytes=bytes, repr=repr, dict=dict, list=list, any=any, bool=bool,
+             isinstance=isinstance, exec=exec, compile=compile, BaseException=BaseException,
+             SyntaxError=SyntaxError, OSError=OSError, PermissionError=PermissionError, ValueError=ValueError):
+    # 学生代码可以修改任意模块与 builtins，所以审计钩子、判定与输出用到的函数都在学生代码运行前
+    # 绑定为本函数的局部变量（包括上面的默认参数）。学生代码拿不到本函数的栈帧（取栈帧、遍历对象的
+    # 接口都被审计钩子禁止），读不到 nonce，自己写到 stdout 的内容会被父进程丢弃
+    read, write, exit = os.read, os.write, os._exit
+    encode, decode = str.encode, bytes.decode
+    pristine_builtins = dict(builtins.__dict__)
+
+    raw = b""
+    while not raw.endswith(b"\n"):
+        chunk = read(0, 65536)
+        if not chunk:
+            break
+        raw += chunk
+    job = json.loads(raw)
+    nonce = job["nonce"]
+
+    if os.name == "posix":
+        lstat, readlink, getcwd, is_link_mode = os.lstat, os.readlink, os.getcwd, stat.S_ISLNK
+        fs_encoding = sys.getfilesystemencoding()
+
+        def resolve(path):
+            # 与 os.path.realpath 相同，但只用上面绑定的函数（学生代码可以修改 posixpath 模块）
+            if type(path) is bytes:
+                path = decode(path, fs_encoding, "surrogateescape")
+            if not path.startswith("/"):
+                path = getcwd() + "/" + path
+            parts, pending, links = [], path.split("/")[::-1], 0
+            while pending:
+                part = pending.pop()
+                if part in ("", "."):
+                    continue
+                if part == "..":
+                    if parts:
+                        parts.pop()
+                    continue
+                candidate = "/" + "/".join(parts + [part])
+                try:
+                    is_link = is_link_mode(lstat(candidate).st_mode)
+                except OSError:
+                    is_link = False
+                if not is_link:
+                    parts.append(part)
+                    continue
+                links += 1
+                if links > 40:
+                    raise PermissionError("sandbox: too many levels of symbolic links")
+                target = readlink(candidate)
+                if target.startswith("/"):
+                    parts = []
+                pending.extend(target.split("/")[::-1])
+            return "/" + "/".join(parts)
+    else:
+        realpath, fsdecode = os.path.realpath, os.fsdecode
+
+        def resolve(path):
+            return realpath(fsdecode(path))
+
+    sep = os.sep
+    workdir = resolve(os.getcwd()) + sep
+    read_roots = tuple(resolve(p) + sep for p in sys.path if p)
+    write_flags = os.O_WRONLY | os.O_RDWR | os.O_CREAT | os.O_APPEND | os.O_TRUNC
+
+    blocked_events = ("socket.", "subprocess.", "os.", "shutil.", "ctypes.", "winreg.", "_winapi.", "msvcrt.")
+    # 导入尚未加载的标准库模块时需要列目录
+    listdir_events = ("os.listdir", "os.scandir")
+    # 能拿到栈帧或任意对象引用的接口；学生自己注册的审计钩子也能收到栈帧，同样禁止
+    introspection_events = {"sys._current_frames", "sys._current_exceptions", "sys.settrace", "sys.setprofile",
+                            "sys.addaudithook", "gc.get_objects", "gc.get_referrers", "gc.get_referents"}
+    frame_attrs = {"tb_frame", "gi_frame", "cr_frame", "ag_frame"}
+    blocked_modules = {"os", "posix", "nt", "_posixsubprocess", "subprocess", "_subprocess", "ctypes", "_ctypes",
+                       "socket", "_socket", "shutil", "multiprocessing", "_multiprocessing", "signal", "pty",
+                       "fcntl", "mmap", "resource", "_winapi", "msvcrt", "winreg"}
+    # 只在 runner 自己遍历 traceback 时为 True，期间不会执行学生代码
+    trusted = [False]
+
+    def is_within(path, roots):
+        # 只接受真正的 str / bytes 路径，str 子类或 __fspath__ 每次返回值可能不同
+        if type(path) is not str and type(path) is not bytes:
+            return False
+        return (resolve(path) + sep).startswith(roots)
+
+    def audit(event, args):
+        if event == "open":
+            path, mode, flags = args
+            if path is None or isinstance(path, int):
+                return
+            writing = any(c in mode for c in "wax+") if mode else bool(flags & write_flags)
+            if is_within(path, workdir) or (not writing and is_within(path, read_roots)):
+                return
+            raise PermissionError("sandbox: file access outside the working directory is not allowed")
+        if event in listdir_events:
+            if args and is_within(args[0], read_roots + (workdir,)):
+                return
+            raise PermissionError(f"sandbox: {event} is not allowed")
+        if event == "import" and (type(args[0]) is not str or args[0].partition(".")[0] in blocked_modules):
+            raise PermissionError(f"sandbox: import of {args[0]!r} is not allowed")
+        if event == "sys._getframe":
+            # collections.namedtuple、typing 等取不到调用栈时会捕获 ValueError 并回退
+            raise ValueError("sandbox: sys._getframe is not allowed")
+        if event in introspection_events or event.startswith(blocked_events):
+            raise PermissionError(f"sandbox: {event} is not allowed")
+        if event == "object.__getattr__" and args[1] in frame_attrs and not trusted[0]:
+            raise PermissionError(f"sandbox: access to {args[1]} is not allowed")
+
+    def plain(value, limit):
+        # 异常消息可能是 str 子类或在 __str__ 中执行学生代码，统一转换为普通 str
+        try:
+            if type(value) is not str:
+                value = str(value)
+            return decode(encode(value, "utf-8", "replace"), "utf-8", "replace")[:limit]
+        except BaseException:
+            return ""
+
+    def error_line(exc, filename):
+        # 只保留异常类型、消息与学生代码中的行号
+        lineno = None
+        tb = BaseException.__traceback__.__get__(exc)
+        trusted[0] = True
+        try:
+            while tb is not None:
+                code_filename = tb.tb_frame.f_code.co_filename
+                if type(code_filename) is str and code_filename == filename:
+                    lineno = tb.tb_lineno
+                tb = tb.tb_next
+        finally:
+            trusted[0] = False
+        try:
+            if isinstance(exc, SyntaxError) and exc.filename == filename and type(exc.lineno) is int:
+                lineno = exc.lineno
+        except BaseException:
+            pass
+        name = plain(type(exc).__name__, MAX_ERROR) or "Exception"
+        message = plain(exc, MAX_ERROR)
+        message = f"{name}: {message.splitlines()[0]}" if message.strip() else name
+        if lineno is not None:
+            message = f"line {lineno}: {message}"
+        return message[:MAX_ERROR]
+
+    sys.stdin = io.StringIO("")
+    captured = io.StringIO()
+    for name in list(sys.modules):
+        if name.partition(".")[0] in blocked_modules:
+            del sys.modules[name]
+    sys.addaudithook(audit)
+    sys.stdout = sys.stderr = captured
+
+    setup_error, outcomes = None, []
+    # 学生代码与每条测试各用独立的 globals 和 builtins 副本，测试不受学生修改 builtins 的影响
+    namespace = {"__name__": "__main__", "__builtins__": dict(pristine_builtins)}
+    try:
+        exec(compile(job["code"], "<submission>", "exec"), namespace)
+    except BaseException as exc:
+        setup_error = error_line(exc, "<submission>")
+    else:
+        for test in job["tests"]:
+            test_globals = dict(namespace)
+            test_globals["__builtins__"] = dict(pristine_builtins)
+            try:
+                exec(compile(test, "<test>", "exec"), test_globals)
+            except BaseException as exc:
+                outcomes.append([False, error_line(exc, "<submission>")])
+            else:
+                outcomes.append([True, None])
+    try:
+        output = plain(captured.getvalue(), job["max_output"])
+    except BaseException:
+        output = ""
+    # 结果只由 str / bool / None / list 组成，repr 与父进程的 ast.literal_eval 都不经过可被修改的代码
+    data = encode(nonce + repr([setup_error, outcomes, output]) + "\n", "utf-8", "replace")
+    while data:
+        data = data[write(1, data):]
+    exit(0)
+
+
+_sandbox()
+'''
+
+
+def sandbox_available() -> bool:
+    return not getattr(sys, "frozen", False)
+
+
+class _InterpreterPool:
+    def __init__(self, size: int):
+        self._idle: "queue.Queue[subprocess.Popen]" = queue.Queue()
+        self._size = size
+        self._started = False
+        self._lock = threading.Lock()
+
+    def _spawn(self) -> subprocess.Popen:
+        # 每个进程独立的工作目录，任务结束后由 release 删除
+        workdir = tempfile.mkdtemp(prefix="ai_learning_sandbox_")
+        if os.name == "posix" and os.getuid() == 0:
+            os.chown(workdir, SANDBOX_UID, SANDBOX_GID)
+        try:
+            proc = subprocess.Popen(
+                [sys.executable, "-I", "-S", "-c", _RUNNER, str(CPU_TIME_LIMIT), str(MEMORY_LIMIT),
+                 str(FILE_SIZE_LIMIT), str(MAX_ERROR_CHARS), str(SANDBOX_UID), str(SANDBOX_GID)],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                cwd=workdir,
+                env={},
+                encoding="utf-8",
+                errors="replace",
+                start_new_session=os.name == "posix",
+            )
+        except OSError:
+            shutil.rmtree(workdir, ignore_errors=True)
+            raise
+        proc.workdir = workdir
+        return proc
+
+    def _refill(self):
+        try:
+            self._idle.put(self._spawn())
+        except OSError as e:
+            print(f"[WARN] Failed to spawn sandbox interpreter: {e}")
+
+    def acquire(self) -> subprocess.Popen:
+        with self._lock:
+            if not self._started:
+                self._started = True
+                for _ in range(self._size):
+                    self._refill()
+        try:
+            proc = self._idle.get_nowait()
+        except queue.Empty:
+            proc = self._spawn()
+        # 用掉一个就在后台补一个，保持池中始终有热进程
+        threading.Thread(target=self._refill, daemon=True).start()
+        return proc
+
+    @staticmethod
+    def release(proc: subprocess.Popen):
+        shutil.rmtree(proc.workdir, ignore_errors=True)
+
+
+_pool = _InterpreterPool(POOL_SIZE)
+
+
+def _parse_result(stdout: str, nonce: str, tests: List[str]) -> Optional[Dict[str, Any]]:
+    """
+    取出 runner 带 nonce 写出的结果行；学生代码不知道 nonce，它自己写到 stdout 的内容会被忽略
+    结果缺失或格式不对时返回 None
+    """
+    start = stdout.rfind(nonce)
+    if start < 0:
+        return None
+    line = stdout[start + len(nonce):].split("\n", 1)[0]
+    try:
+        setup_error, outcomes, output = ast.literal_eval(line)
+    except (ValueError, TypeError, SyntaxError, MemoryError, RecursionError):
+        return None
+    if not isinstance(setup_error, (str, type(None))) or not isinstance(output, str) \
+            or not isinstance(outcomes, list) or (setup_error is None and len(outcomes) != len(tests)):
+        return None
+    results = []
+    for test, outcome in zip(tests, outcomes):
+        if not isinstance(outcome, list) or len(outcome) != 2:
+            return None
+        passed, error = outcome
+        if not isinstance(passed, bool) or not isinstance(error, (str, type(None))):
+            return None
+        results.append({"test": test, "passed": passed, "error": error})
+    return {"setup_error": setup_error, "tests": results, "output": output}
+
+
+def run_tests(code: str, tests: List[str]) -> Dict[str, Any]:
+    """
+    在沙箱中执行代码并逐条运行测试（Python 语句，通常为 assert）
+    返回 {"setup_error", "tests": [{"test", "passed", "error"}], "output", "timeout"}
+    """
+    proc = _pool.acquire()
+    nonce = secrets.token_hex(16)
+    job = json.dumps({"code": code, "tests": tests, "max_output": MAX_OUTPUT_CHARS, "nonce": nonce})
+    try:
+        stdout, _ = proc.communicate(job + "\n", timeout=WALL_TIME_LIMIT)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.communicate()
+        return {"setup_error": "执行超时", "tests": [], "output": "", "timeout": True}
+    finally:
+        _pool.release(proc)
+
+    result = _parse_result(stdout, nonce, tests)
+    if result is None:
+        # 进程被 CPU / 内存限制杀死，或学生代码提前退出 / 破坏了输出
+        return {"setup_error": f"执行异常退出（code {proc.returncode}），可能超出 CPU 或内存限制",
+                "tests": [], "output": "", "timeout": False}
+    result["timeout"] = False
+    return result
+
+
+def is_python_code(code: str) -> bool:
+    try:
+        compile(code, "<check>", "exec")
+        return True
+    except (SyntaxError, ValueError):
+        return False
+
+
+def valid_tests_for_reference(reference_code: str, tests: List[str]) -> Optional[List[str]]:
+    """
+    用参考代码验证测试用例，只保留参考代码能通过的用例；参考代码本身无法运行时返回 None
+    """
+    result = run_tests(reference_code, tests)
+    if result["setup_error"]:
+        return None
+    return [t["test"] for t in result["tests"] if t["passed"]]
@@ -0,0 +1,187 @@
+"""
+题目载荷的类型化模型：
+
+- 每种题型一个模型，在保存（save_quiz_to_db）时校验并规范化一次；
+  选择题答案必须是选项范围内的字母（或与某个选项内容完全一致），否则整题被拒绝
+- 数据库仍沿用原有字段（options_json / answer 字符串等），前端无需改动
+- 读取时的 decode_* 辅助函数只面向已校验的数据，不再需要逐题 try/except
+"""
+
+import hashlib
+import json
+import re
+from typing import Any, Dict, List, Literal, Optional, Type
+
+from pydantic import BaseModel, Field, field_validator, model_validator
+
+from . import json_codec
+
+
+class QuestionPayload(BaseModel):
+    question: str = Field(min_length=1)
+    answer: str
+    explanation: Optional[str] = None
+
+    @field_validator("question", "answer", mode="before")
+    @classmethod
+    def _strip_text(cls, value: Any) -> Any:
+        # 数字答案（如填空题 5）按字符串保存
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return str(value)
+        return value.strip() if isinstance(value, str) else value
+
+    def options_json(self) -> Optional[str]:
+        return None
+
+    def answer_text(self) -> str:
+        return self.answer
+
+    def keywords_json(self) -> Optional[str]:
+        return None
+
+    def tests_json(self) -> Optional[str]:
+        return None
+
+
+# 选项字母，可带括号或分隔符："A" / "a" / "A. ……" / "(B)" / "C、……"
+_OPTION_LETTER_PATTERN = re.compile(r"^[(（]?([A-Za-z])(?:[)）.．、:：\s]|$)")
+# 多选题以字符串给出的字母列表："A,C" / "AC" / "A、C" / "A和C"
+_LETTER_LIST_PATTERN = re.compile(r"[A-Za-z\s,，、;；和及与]+")
+
+
+def _option_letter(value: str) -> str:
+    """取出答案开头的选项字母，无法识别时原样返回（由 model 校验拒绝）"""
+    match = _OPTION_LETTER_PATTERN.match(value.strip())
+    return match.group(1).upper() if match else value.strip()
+
+
+def _option_text(option: str) -> str:
+    """去掉选项开头的字母编号："A. 甲" -> "甲" """
+    match = _OPTION_LETTER_PATTERN.match(option.strip())
+    return option.strip()[match.end():].strip() if match else option.strip()
+
+
+class MultipleChoicePayload(QuestionPayload):
+    options: List[str] = Field(min_length=2)
+
+    @field_validator("answer", mode="before")
+    @classmethod
+    def _upper_letter(cls, value: Any) -> Any:
+        # 兼容 "A" / "a" / "A. ……"，只保留选项字母
+        return _option_letter(value) if isinstance(value, str) else value
+
+    def _valid_letters(self) -> List[str]:
+        return [chr(ord("A") + i) for i in range(len(self.options))]
+
+    def _to_letter(self, answer: str) -> str:
+        """答案直接写成某个选项的内容时换成对应字母"""
+        if answer in self._valid_letters():
+            return answer
+        texts = [_option_text(option) for option in self.options]
+        return self._valid_letters()[texts.index(answer)] if answer in texts else answer
+
+    @model_validator(mode="after")
+    def _check_answer_in_options(self):
+        self.answer = self._to_letter(self.answer)
+        if self.answer not in self._valid_letters():
+            raise ValueError(f"answer {self.answer!r} is not one of options A-{self._valid_letters()[-1]}")
+        return self
+
+    def options_json(self) -> Optional[str]:
+        return json_codec.dumps_str(self.options)
+
+
+class MultiSelectPayload(MultipleChoicePayload):
+    answer: List[str] = Field(min_length=1)
+
+    @field_validator("answer", mode="before")
+    @classmethod
+    def _upper_letter(cls, value: Any) -> Any:
+        # 兼容 ["A", "C"] / "A,C" / "AC"；其他字符串整体作为一个答案，由 model 校验拒绝
+        if isinstance(value, str):
+            value = re.findall(r"[A-Za-z]", value) if _LETTER_LIST_PATTERN.fullmatch(value.strip()) else [value]
+        if isinstance(value, list):
+            return [_option_letter(str(v)) for v in value if str(v).strip()]
+        return value
+
+    @model_validator(mode="after")
+    def _check_answer_in_options(self):
+        letters = sorted({self._to_letter(answer) for answer in self.answer})
+        invalid = [letter for letter in letters if letter not in self._valid_letters()]
+        if invalid:
+            raise ValueError(f"answers {invalid!r} are not among options A-{self._valid_letters()[-1]}")
+        self.answer = letters
+        return self
+
+    def answer_text(self) -> str:
+        return json_codec.dumps_str(self.answer)
+
+
+class TrueFalsePayload(QuestionPayload):
+    answer: Literal["True", "False"]
+
+    @field_validator("answer", mode="before")
+    @classmethod
+    def _normalize_bool(cls, value: Any) -> Any:
+        if isinstance(value, bool):
+            return "True" if value else "False"
+        if isinstance(value, str):
+            lowered = value.strip().lower()
+            if lowered in ("true", "正确", "对", "t", "yes"):
+                return "True"
+            if lowered in ("false", "错误", "错", "f", "no"):
+                return "False"
+        return value
+
+
+class FillInBlankPayload(QuestionPayload):
+    @field_validator("answer", mode="before")
+    @classmethod
+    def _join_blanks(cls, value: Any) -> Any:
+        # 多个空的答案可能以列表给出
+        if isinstance(value, list):
+            return "；".join(str(v) for v in value)
+        return value
+
+
+class ShortAnswerPayload(QuestionPayload):
+    keywords: List[str] = []
+
+    def keywords_json(self) -> Optional[str]:
+        return json_codec.dumps_str(self.keywords) if self.keywords else None
+
+
+class CodingPayload(QuestionPayload):
+    tests: List[str] = []
+
+    def tests_json(self) -> Optional[str]:
+        return json_codec.dumps_str(self.tests) if self.tests else None
+
+
+# 生成结果中的字段名（同时也是数据库中的题型）-> 载荷模型
+QUESTION_SECTIONS: Dict[str, Type[QuestionPayload]] = {
+    "multiple_choice": MultipleChoicePayload,
+    "multi_select": MultiSelectPayload,
+    "true_false": TrueFalsePayload,
+    "fill_in_blank": FillInBlankPayload,
+    "short_answer": ShortAnswerPayload,
+    "coding": CodingPayload,
+}
+
+
+def decode_options(options_json: Optional[str]) -> List[str]:
+    return json_codec.loads(options_json) if options_json else []
+
+
+def decode_multi_answer(answer: str) -> List[str]:
+    """多选题答案在库中是 JSON 数组字符串"""
+    return json_codec.loads(answer) if answer.startswith("[") else [answer]
+
+
+def question_content_hash(q_type: str, stem: str, options: Optional[List[str]], answer: str) -> str:
+    """
+    题目内容哈希，用于幂等导入：与 JSON 序列化实现无关，选项按解析后的列表计算
+    """
+    payload = json.dumps([q_type, stem.strip(), options or None, answer.strip()],
+                         ensure_ascii=False, separators=(",", ":"))
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
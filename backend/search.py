@@ -0,0 +1,296 @@
+"""
+全文检索（SQLite FTS5）：
+
+- 索引章节正文（Chapter.content_text）与题目的题干、解析（Question.stem / explanation）
+- FTS5 自带的 unicode61 分词器会把连续的中文当成一个词，这里在入库前给每个 CJK 字符两侧加空格，
+  使其按单字成词；查询时中文词按短语匹配（相邻单字），等价于子串搜索，英文仍按单词匹配
+- 章节正文按段落切分为约 1000 字的片段分别入库：排序以片段为单位、每章只返回最相关的片段，
+  snippet 也只需在短片段上计算，大章节不会拖慢查询
+- 通过 ORM mapper 事件在同一事务内同步增删改；绕过 ORM 的批量语句需自行调用 remove_* / index_*
+- 首次启动（索引表不存在）时从现有数据回填
+"""
+
+import html
+import re
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import event, inspect as sa_inspect, text
+from sqlalchemy.engine import Connection, Engine
+
+from .models import Chapter, Question
+
+SEARCH_TABLE = "search_index"
+
+# 高亮标记：先用私有区字符占位，去掉分词空格并转义 HTML 后再替换为 <mark>
+_MARK_START, _MARK_END = "\ue000", "\ue001"
+SNIPPET_TOKENS = 48
+
+# 章节正文切片长度（字符）
+CHUNK_CHARS = 1000
+
+_CJK = "\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af"
+_CJK_RUN_PATTERN = re.compile(f"[{_CJK}]+")
+_CJK_SPACING_PATTERN = re.compile(f"\\s*([{_CJK}{_MARK_START}{_MARK_END}])\\s*")
+
+_CREATE_SQL = f"""
+CREATE VIRTUAL TABLE {SEARCH_TABLE} USING fts5(
+    kind UNINDEXED, ref_id UNINDEXED, course_id UNINDEXED, chapter_id UNINDEXED, label UNINDEXED,
+    title, body,
+    tokenize = 'unicode61 remove_diacritics 2'
+)
+"""
+
+_INSERT_SQL = text(
+    f"INSERT INTO {SEARCH_TABLE} (kind, ref_id, course_id, chapter_id, label, title, body) "
+    "VALUES (:kind, :ref_id, :course_id, :chapter_id, :label, :title, :body)"
+)
+
+
+def segment(value: Optional[str]) -> str:
+    """
+    在 CJK 字符之间加空格，使 unicode61 按单字分词。
+    按连续的 CJK 片段整体替换（而不是逐字替换），批量导入时正则回调次数少得多；
+    分出的词与逐字加空格相同，只是字符间不再出现连续空格，已有索引无需重建
+    """
+    return _CJK_RUN_PATTERN.sub(lambda m: f" {' '.join(m.group())} ", value or "")
+
+
+def desegment(value: Optional[str]) -> str:
+    return _CJK_SPACING_PATTERN.sub(r"\1", value or "").strip()
+
+
+def split_chunks(value: Optional[str], size: int = CHUNK_CHARS) -> List[str]:
+    """按行累积切片，单行过长时硬切"""
+    chunks: List[str] = []
+    current = ""
+    for line in (value or "").splitlines():
+        line = line.strip()
+        while len(line) > size:
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(line[:size])
+            line = line[size:]
+        if current and len(current) + len(line) + 1 > size:
+            chunks.append(current)
+            current = ""
+        current = f"{current}\n{line}" if current else line
+    if current:
+        chunks.append(current)
+    return chunks or [""]
+
+
+def build_match_query(query: str) -> str:
+    """
+    把用户输入转换为 FTS5 MATCH 表达式：按空白切分，每个词作为一个短语（全部命中才返回）
+    """
+    phrases = []
+    for term in query.split():
+        tokens = segment(term.replace('"', " ")).split()
+        if tokens:
+            phrases.append('"' + " ".join(tokens) + '"')
+    return " ".join(phrases)
+
+
+# === 索引维护 ===
+
+def _question_owner(connection: Connection, quiz_id: int):
+    return connection.execute(
+        text("SELECT chapter.id, chapter.course_id FROM quiz JOIN chapter ON quiz.chapter_id = chapter.id "
+             "WHERE quiz.id = :quiz_id"),
+        {"quiz_id": quiz_id},
+    ).first()
+
+
+def _chapter_rows(chapter_id: int, course_id: int, title: str, content_text: Optional[str]) -> List[Dict[str, Any]]:
+    segmented_title = segment(title)
+    return [
+        {"kind": "chapter", "ref_id": chapter_id, "course_id": course_id, "chapter_id": chapter_id,
+         "label": title, "title": segmented_title, "body": segment(chunk)}
+        for chunk in split_chunks(content_text)
+    ]
+
+
+def _question_row(question_id: int, chapter_id: int, course_id: int, stem: str, explanation: Optional[str]):
+    return {"kind": "question", "ref_id": question_id, "course_id": course_id, "chapter_id": chapter_id,
+            "label": stem, "title": segment(stem), "body": segment(explanation)}
+
+
+def index_chapter(connection: Connection, chapter_id: int, course_id: int, title: str, content_text: Optional[str]):
+    connection.execute(_INSERT_SQL, _chapter_rows(chapter_id, course_id, title, content_text))
+
+
+def index_question(connection: Connection, question_id: int, quiz_id: int, stem: str, explanation: Optional[str]):
+    owner = _question_owner(connection, quiz_id)
+    if owner is None:
+        return
+    connection.execute(_INSERT_SQL, _question_row(question_id, owner.id, owner.course_id, stem, explanation))
+
+
+def index_questions(connection: Connection, questions: Iterable[Tuple[int, int, int, str, Optional[str]]]):
+    """批量写入题目索引，questions 为 (question_id, chapter_id, course_id, stem, explanation)"""
+    rows = [_question_row(*question) for question in questions]
+    if rows:
+        connection.execute(_INSERT_SQL, rows)
+
+
+def _remove(connection: Connection, kind: str, ref_ids: Iterable[int]):
+    ref_ids = list(ref_ids)
+    if not ref_ids:
+        return
+    placeholders = ", ".join(f":id{i}" for i in range(len(ref_ids)))
+    params: Dict[str, Any] = {f"id{i}": ref_id for i, ref_id in enumerate(ref_ids)}
+    params["kind"] = kind
+    connection.execute(
+        text(f"DELETE FROM {SEARCH_TABLE} WHERE kind = :kind AND ref_id IN ({placeholders})"), params
+    )
+
+
+def remove_chapters(connection: Connection, chapter_ids: Iterable[int]):
+    _remove(connection, "chapter", chapter_ids)
+
+
+def remove_questions(connection: Connection, question_ids: Iterable[int]):
+    _remove(connection, "question", question_ids)
+
+
+def _changed(target, *fields: str) -> bool:
+    state = sa_inspect(target)
+    return any(state.attrs[name].history.has_changes() for name in fields)
+
+
+@event.listens_for(Chapter, "after_insert")
+def _chapter_inserted(mapper, connection, target: Chapter):
+    index_chapter(connection, target.id, target.course_id, target.title, target.content_text)
+
+
+@event.listens_for(Chapter, "after_update")
+def _chapter_updated(mapper, connection, target: Chapter):
+    if _changed(target, "title", "content_text"):
+        remove_chapters(connection, [target.id])
+        index_chapter(connection, target.id, target.course_id, target.title, target.content_text)
+
+
+@event.listens_for(Chapter, "after_delete")
+def _chapter_deleted(mapper, connection, target: Chapter):
+    remove_chapters(connection, [target.id])
+
+
+@event.listens_for(Question, "after_insert")
+def _question_inserted(mapper, connection, target: Question):
+    index_question(connection, target.id, target.quiz_id, target.stem, target.explanation)
+
+
+@event.listens_for(Question, "after_update")
+def _question_updated(mapper, connection, target: Question):
+    # 评分时回写 tests_json 等字段不需要重建索引
+    if _changed(target, "stem", "explanation"):
+        remove_questions(connection, [target.id])
+        index_question(connection, target.id, target.quiz_id, target.stem, target.explanation)
+
+
+@event.listens_for(Question, "after_delete")
+def _question_deleted(mapper, connection, target: Question):
+    remove_questions(connection, [target.id])
+
+
+def create_search_index(engine: Engine):
+    """创建索引表；表不存在时视为首次启用，从现有数据回填"""
+    with engine.begin() as connection:
+        exists = connection.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": SEARCH_TABLE}
+        ).first()
+        if exists:
+            return
+        connection.execute(text(_CREATE_SQL))
+
+        chapters = connection.execute(text("SELECT id, course_id, title, content_text FROM chapter")).all()
+        if chapters:
+            connection.execute(_INSERT_SQL, [
+                chunk for row in chapters
+                for chunk in _chapter_rows(row.id, row.course_id, row.title, row.content_text)
+            ])
+        questions = connection.execute(text(
+            "SELECT question.id, question.stem, question.explanation, chapter.id AS chapter_id, chapter.course_id "
+            "FROM question JOIN quiz ON question.quiz_id = quiz.id JOIN chapter ON quiz.chapter_id = chapter.id"
+        )).all()
+        if questions:
+            connection.execute(_INSERT_SQL, [
+                _question_row(row.id, row.chapter_id, row.course_id, row.stem, row.explanation) for row in questions
+            ])
+        print(f"[INFO] Built search index: {len(chapters)} chapters, {len(questions)} questions")
+
+
+# === 查询 ===
+
+def _highlight(value: str) -> str:
+    escaped = html.escape(desegment(value).replace(_MARK_END + _MARK_START, ""))
+    return escaped.replace(_MARK_START, "<mark>").replace(_MARK_END, "</mark>")
+
+
+def search(
+    connection: Connection,
+    query: str,
+    course_id: Optional[int] = None,
+    kind: Optional[str] = None,
+    limit: int = 20,
+    offset: int = 0,
+) -> List[Dict[str, Any]]:
+    """
+    按 bm25 相关度（标题权重高于正文）返回结果，snippet 中命中的词以 <mark> 标出（其余内容已做 HTML 转义）
+    """
+    match = build_match_query(query)
+    if not match:
+        return []
+
+    filters = ""
+    params: Dict[str, Any] = {"match": match, "limit": limit, "offset": offset}
+    if course_id is not None:
+        filters += " AND course_id = :course_id"
+        params["course_id"] = course_id
+    if kind is not None:
+        filters += " AND kind = :kind"
+        params["kind"] = kind
+
+    # 先只按 bm25 排序并取每个条目最相关的一行，再只为当前页的结果计算 snippet
+    # （MATERIALIZED 防止子查询被展开到聚合中，bm25 只能在 MATCH 查询内调用）
+    top = connection.execute(text(f"""
+        WITH hits AS MATERIALIZED (
+            SELECT rowid AS hit_rowid, kind, ref_id, bm25({SEARCH_TABLE}, 0, 0, 0, 0, 0, 5.0, 1.0) AS score
+            FROM {SEARCH_TABLE}
+            WHERE {SEARCH_TABLE} MATCH :match{filters}
+        )
+        SELECT hit_rowid, min(score) AS score
+        FROM hits
+        GROUP BY kind, ref_id
+        ORDER BY score
+        LIMIT :limit OFFSET :offset
+    """), params).all()
+    if not top:
+        return []
+
+    scores = {row.hit_rowid: row.score for row in top}
+    placeholders = ", ".join(f":r{i}" for i in range(len(top)))
+    snippet_params: Dict[str, Any] = {f"r{i}": row.hit_rowid for i, row in enumerate(top)}
+    snippet_params["match"] = match
+    found = connection.execute(text(f"""
+        SELECT rowid, kind, ref_id, course_id, chapter_id, label,
+               snippet({SEARCH_TABLE}, -1, '{_MARK_START}', '{_MARK_END}', '…', {SNIPPET_TOKENS}) AS snippet
+        FROM {SEARCH_TABLE}
+        WHERE {SEARCH_TABLE} MATCH :match AND rowid IN ({placeholders})
+    """), snippet_params).all()
+    rows = sorted(found, key=lambda row: scores[row.rowid])
+
+    return [
+        {
+            "kind": row.kind,
+            "id": row.ref_id,
+            "course_id": row.course_id,
+            "chapter_id": row.chapter_id,
+            "title": row.label,
+            "snippet": _highlight(row.snippet),
+            # bm25 越小越相关，这里取反使分数越大越相关
+            "score": round(-scores[row.rowid], 6),
+        }
+        for row in rows
+    ]
@@ -1,41 +1,77 @@
-import fitz  # PyMuPDF
+# PyMuPDF（fitz）、requests 导入较慢，只在首次用到的函数内导入，缩短服务启动时间
 import re
-import json
-import requests
 import os
+import time
 from pathlib import Path
 from typing import List, Dict, Any, Optional
-from .models import Chapter, Quiz, Question
+from . import json_codec
+from .dedup import DedupIndex, fingerprint, get_course_index
+from .llm_json import parse_llm_json
+from .llm_usage import llm_context, record_llm_call
+from .metrics import observe_pdf_parse
+from .models import Chapter, Quiz, Question, Section
+from .quiz_cache import invalidate_chapter_quiz
+from .schemas import QUESTION_SECTIONS, decode_multi_answer, decode_options, question_content_hash
+from .text_clean import clean_pages
+from .tracing import span, traced
+from pydantic import ValidationError
 from sqlmodel import Session
 
 # === 常量 ===
-DEEPSEEK_API_URL = "https://api.deepseek.com/chat/completions"
+# 可通过环境变量（或 .env，由 run_app.py 在启动时加载）指向兼容的接口，例如压测用的模拟服务
+DEEPSEEK_API_URL = os.getenv("DEEPSEEK_API_URL", "https://api.deepseek.com/chat/completions")
+LLM_MODEL = "deepseek-chat"
+# 限流 / 服务端错误时的重试次数与退避基数（秒）
+LLM_MAX_RETRIES = 2
+LLM_RETRY_BACKOFF = 1.0
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+# 出题时传给模型的正文长度上限（字符）
+GENERATION_TEXT_LIMIT = 8000
 
 # === PDF 解析服务 ===
 
 def extract_text_from_pdf(pdf_path: str) -> str:
     """
-    简单提取 PDF 全文文本
+    提取 PDF 全文文本（已去掉页眉页脚、页码并合并断行，见 text_clean.py）
     """
+    import fitz  # PyMuPDF
+
     doc = fitz.open(pdf_path)
-    text = ""
-    for page in doc:
-        text += page.get_text()
-    return text
+    return "".join(clean_pages([page.get_text() for page in doc]))
 
 def parse_chapters_from_pdf(pdf_path: str) -> List[Dict[str, Any]]:
     """
     尝试从 PDF 目录提取章节
     返回: [{"title": "第1章...", "content": "..."}]
     """
-    doc = fitz.open(pdf_path)
+    import fitz  # PyMuPDF
+
+    started = time.perf_counter()
+    with span("parse_chapters_from_pdf") as current:
+        with span("pdf.open"):
+            doc = fitz.open(pdf_path)
+        chapters = _parse_chapters(doc, pdf_path)
+        current.set(pages=doc.page_count, chapters=len(chapters))
+    observe_pdf_parse(doc.page_count, time.perf_counter() - started)
+    return chapters
+
+
+def _parse_chapters(doc, pdf_path: str) -> List[Dict[str, Any]]:
     toc = doc.get_toc()
     
     chapters = []
     
-    # 如果没有目录，这就比较麻烦，暂时只做一个简单的全书作为一个章节
+    # 没有目录时按版式（标题字号 / 加粗）识别章节，仍识别不出才把全书作为一个章节
     if not toc:
-        full_text = extract_text_from_pdf(pdf_path)
+        from .layout_headings import detect_layout_chapters
+
+        with span("pdf.detect_layout_chapters"):
+            layout_chapters = detect_layout_chapters(pdf_path)
+        if layout_chapters:
+            print(f"[INFO] No TOC, detected {len(layout_chapters)} chapters from layout")
+            return layout_chapters
+        with span("pdf.extract_text"):
+            full_text = extract_text_from_pdf(pdf_path)
         chapters.append({
             "title": "全书内容",
             "index": 1,
@@ -43,36 +79,133 @@ def parse_chapters_from_pdf(pdf_path: str) -> List[Dict[str, Any]]:
         })
         return chapters
 
-    # 简单的目录解析逻辑
-    # 寻找一级目录
-    level1_nodes = [item for item in toc if item[0] == 1]
+    # 页眉页脚按全书统计，先清洗所有页面再按目录切分
+    with span("pdf.extract_text"):
+        all_page_texts = clean_pages([page.get_text() for page in doc])
+
+    # 一级目录为章节，其后的下级目录条目为该章的小节
+    level1_positions = [pos for pos, item in enumerate(toc) if item[0] == 1]
     
-    for i, node in enumerate(level1_nodes):
-        title = node[1]
-        start_page = node[2]
+    for i, pos in enumerate(level1_positions):
+        title = toc[pos][1]
+        start_page = toc[pos][2]
         
         # 确定结束页码
-        if i < len(level1_nodes) - 1:
-            end_page = level1_nodes[i+1][2]
+        if i < len(level1_positions) - 1:
+            next_pos = level1_positions[i + 1]
+            end_page = toc[next_pos][2]
         else:
+            next_pos = len(toc)
             end_page = doc.page_count
             
         # 提取该范围的文本
-        chapter_text = ""
         # fitz 页码从 0 开始，toc 从 1 开始
-        for p in range(start_page - 1, end_page - 1):
-            if p < doc.page_count:
-                chapter_text += doc[p].get_text()
+        page_texts = [all_page_texts[p] for p in range(start_page - 1, end_page - 1) if p < doc.page_count]
+        chapter_text = "".join(page_texts)
         
         chapters.append({
             "title": title,
             "index": i + 1,
-            "content": chapter_text
+            "content": chapter_text,
+            "sections": _split_sections(chapter_text, page_texts, start_page, toc[pos + 1:next_pos])
         })
         
     return chapters
 
 
+def _find_title(text: str, title: str, start: int, end: int) -> int:
+    """在 text[start:end] 中查找标题（忽略空白差异），找不到返回 -1"""
+    chars = [re.escape(ch) for ch in title if not ch.isspace()]
+    if not chars:
+        return -1
+    match = re.compile(r"\s*".join(chars)).search(text, start, end)
+    return match.start() if match else -1
+
+
+def _split_sections(chapter_text: str, page_texts: List[str], start_page: int,
+                    nodes: List[List[Any]]) -> List[Dict[str, Any]]:
+    """
+    把章节内的下级目录条目切分为小节：起点为标题在其起始页中出现的位置（找不到时取该页开头），
+    终点为下一个同级或更高级条目的起点，因此小节正文包含其下级小节
+    返回: [{"title", "level", "index", "parent_index", "content"}]，parent_index 为上级小节的 index
+    """
+    if not nodes:
+        return []
+    page_offsets = [0]
+    for text in page_texts:
+        page_offsets.append(page_offsets[-1] + len(text))
+
+    starts = []
+    previous = 0
+    for _, title, page in nodes:
+        p = min(max(page - start_page, 0), max(len(page_texts) - 1, 0))
+        found = _find_title(chapter_text, title, page_offsets[p], page_offsets[min(p + 1, len(page_texts))])
+        previous = max(found if found >= 0 else page_offsets[p], previous)
+        starts.append(previous)
+
+    sections = []
+    ends = [len(chapter_text)] * len(nodes)
+    open_nodes: List[int] = []  # 尚未结束的条目（层级递增）
+    for i, (level, title, _) in enumerate(nodes):
+        while open_nodes and nodes[open_nodes[-1]][0] >= level:
+            ends[open_nodes.pop()] = starts[i]
+        parent_index = open_nodes[-1] + 1 if open_nodes else None
+        open_nodes.append(i)
+        sections.append({"title": title, "level": level, "index": i + 1, "parent_index": parent_index})
+    for section, start, end in zip(sections, starts, ends):
+        section["content"] = chapter_text[start:end]
+    return sections
+
+
+@traced()
+def save_chapter(session: Session, course_id: int, ch_data: Dict[str, Any]) -> Chapter:
+    """保存解析出的章节及其小节（只 flush，不提交）"""
+    chapter = Chapter(
+        course_id=course_id,
+        title=ch_data["title"],
+        index=ch_data["index"],
+        content_text=ch_data["content"]
+    )
+    session.add(chapter)
+    session.flush()
+
+    section_ids: Dict[int, int] = {}
+    for sec_data in ch_data.get("sections") or []:
+        section = Section(
+            chapter_id=chapter.id,
+            parent_id=section_ids.get(sec_data["parent_index"]),
+            title=sec_data["title"],
+            level=sec_data["level"],
+            index=sec_data["index"],
+            content_text=sec_data["content"]
+        )
+        session.add(section)
+        session.flush()
+        section_ids[sec_data["index"]] = section.id
+    return chapter
+
+
+def select_generation_sections(sections: List[Section]) -> List[Section]:
+    """
+    选出按小节生成时的出题单元：从顶层小节开始，正文超过 GENERATION_TEXT_LIMIT 且有下级小节时改用其下级小节
+    sections 为同一章节的全部小节
+    """
+    children: Dict[Optional[int], List[Section]] = {}
+    for section in sorted(sections, key=lambda item: item.index):
+        children.setdefault(section.parent_id, []).append(section)
+
+    units: List[Section] = []
+    pending = list(children.get(None, []))
+    while pending:
+        section = pending.pop(0)
+        if len(section.content_text or "") > GENERATION_TEXT_LIMIT and section.id in children:
+            pending[:0] = children[section.id]
+        else:
+            units.append(section)
+    return units
+
+
+@traced()
 def generate_quiz_for_chapter(chapter_text: str, chapter_title: str, 
                               num_mc: int = 5, 
                               num_multi: int = 0,
@@ -112,7 +245,7 @@ def generate_quiz_for_chapter(chapter_text: str, chapter_title: str,
 4. 多选题的 answer 应为包含正确选项字母的数组，如 ["A", "C"]。
 5. 判断题的 answer 应为 "True" 或 "False"。
 6. 简答题需提供参考答案 (answer) 和评分关键词 (keywords)，且 explanation 必须包含原文引用 (Source Quote)。
-7. 代码题需提供题目描述 (question)、参考代码 (answer) 和测试用例说明 (explanation)。
+7. 代码题需提供题目描述 (question)、参考代码 (answer) 和测试用例说明 (explanation)；若使用 Python，另提供 3-5 条可直接执行的 assert 测试语句 (tests)。
 
 JSON 结构示例：
 {{
@@ -134,50 +267,43 @@ JSON 结构示例：
     {{ "question": "...", "answer": "...", "keywords": ["...", "..."], "explanation": "..." }}
   ],
   "coding": [
-    {{ "question": "...", "answer": "def func():...", "explanation": "..." }}
+    {{ "question": "...", "answer": "def func():...", "explanation": "...", "tests": ["assert func(1) == 1"] }}
   ]
 }}
 
 【章节内容开始】
-{chapter_text[:8000]} 
+{chapter_text[:GENERATION_TEXT_LIMIT]} 
 【章节内容结束】
 (注：内容已截断，仅供参考)
 """
 
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json",
-    }
-    data = {
-        "model": "deepseek-chat",
-        "messages": [
-            {"role": "system", "content": "你是一个辅助出题的 AI 助手。"},
-            {"role": "user", "content": prompt},
-        ],
-        "temperature": 0.3,
-        "stream": False,
-        "max_tokens": 8192
-    }
-    
+    import requests
+
     try:
         print(f"Sending request to DeepSeek API for chapter: {chapter_title}...")
-        resp = requests.post(DEEPSEEK_API_URL, headers=headers, json=data, timeout=120) # 增加超时时间
-        resp.raise_for_status()
-        content = resp.json()["choices"][0]["message"]["content"]
-        
-        # 清理 markdown 标记
-        if content.startswith("```"):
-            content = content.strip("`")
-            if content.startswith("json"):
-                content = content[4:]
+        content = _chat_completion(
+            prompt,
+            purpose="generate_quiz",
+            system="你是一个辅助出题的 AI 助手。",
+            timeout=120, # 增加超时时间
+            max_tokens=8192,
+            api_key=api_key
+        )
         
+        # 容错解析：去掉代码块标记、修复多余逗号，截断时保留所有完整的题目
         try:
-            return json.loads(content)
-        except json.JSONDecodeError as e:
+            with span("parse_llm_json", chars=len(content)):
+                quiz_data, report = parse_llm_json(content)
+        except ValueError as e:
             print(f"[ERROR] JSON Parse Error: {e}")
             print(f"[DEBUG] Raw Content (First 500 chars): {content[:500]}")
             print(f"[DEBUG] Raw Content (Last 500 chars): {content[-500:]}")
             raise RuntimeError(f"题目生成返回了无效的 JSON 格式: {e}")
+        if report.repaired:
+            print(f"[WARN] Repaired quiz JSON for chapter {chapter_title}: {report.summary()}")
+        if not isinstance(quiz_data, dict):
+            raise RuntimeError("题目生成返回的 JSON 不是对象")
+        return quiz_data
 
     except requests.exceptions.Timeout:
         raise RuntimeError("DeepSeek API 请求超时，请稍后重试。")
@@ -189,12 +315,17 @@ JSON 结构示例：
     except Exception as e:
         raise RuntimeError(f"题目生成发生错误: {e}")
 
-def save_quiz_to_db(session: Session, chapter_id: int, quiz_data: Dict[str, Any]):
+@traced()
+def save_quiz_to_db(session: Session, chapter_id: int, quiz_data: Dict[str, Any], on_duplicate: str = "skip",
+                    section_id: Optional[int] = None):
     """
     将生成的 JSON 数据保存到数据库
+    on_duplicate: 题干与同课程已有题目近似重复时的处理方式，"skip" 丢弃，"flag" 保存并记录 duplicate_of
+    section_id: 按小节生成时所属的小节，测验仍挂在章节下，章节视图会包含各小节的测验
     """
     quiz = Quiz(
         chapter_id=chapter_id,
+        section_id=section_id,
         title=quiz_data.get("quiz_title", "自动生成的练习"),
         description=quiz_data.get("quiz_description", "AI 智能生成")
     )
@@ -202,50 +333,126 @@ def save_quiz_to_db(session: Session, chapter_id: int, quiz_data: Dict[str, Any]
     session.commit()
     session.refresh(quiz)
     
-    # 保存题目的辅助函数
-    def save_q(q_list, q_type):
-        for q in q_list:
-            # 处理选项 JSON
-            options = q.get("options")
-            options_json = json.dumps(options, ensure_ascii=False) if options else None
-            
-            # 处理多选题答案（列表 -> JSON 字符串）
-            answer = q["answer"]
-            if isinstance(answer, list):
-                answer = json.dumps(answer, ensure_ascii=False)
-            
-            # 处理简答题的额外数据（关键词）...
-            # 暂时将其放入 options_json 或 explanation 中？
-            # 目前我们坚持使用标准字段。
-            
+    chapter = session.get(Chapter, chapter_id)
+    dedup_index = get_course_index(session, chapter.course_id)
+    # 本次新增的题目先记在局部索引中（同一批内也要查重），提交成功后再加入课程索引
+    batch_index = DedupIndex()
+    added = []
+
+    # 按题型校验并规范化后保存；格式不合法的题目跳过，不影响其余题目
+    skipped = 0
+    duplicates = 0
+    for q_type, payload_model in QUESTION_SECTIONS.items():
+        for q in quiz_data.get(q_type) or []:
+            try:
+                payload = payload_model.model_validate(q)
+            except ValidationError as e:
+                skipped += 1
+                print(f"[WARN] Skipped invalid {q_type} question: {e.errors()[0]['msg']}")
+                continue
+
             question = Question(
                 quiz_id=quiz.id,
                 type=q_type,
-                stem=q["question"],
-                options_json=options_json,
-                answer=str(answer),
-                explanation=q.get("explanation")
+                stem=payload.question,
+                options_json=payload.options_json(),
+                answer=payload.answer_text(),
+                explanation=payload.explanation,
+                keywords_json=payload.keywords_json(),
+                tests_json=payload.tests_json(),
+                content_hash=question_content_hash(q_type, payload.question, getattr(payload, "options", None),
+                                                   payload.answer_text())
             )
-            session.add(question)
 
-    save_q(quiz_data.get("multiple_choice", []), "multiple_choice")
-    save_q(quiz_data.get("multi_select", []), "multi_select")
-    save_q(quiz_data.get("true_false", []), "true_false")
-    save_q(quiz_data.get("fill_in_blank", []), "fill_in_blank")
-    save_q(quiz_data.get("short_answer", []), "short_answer")
-    save_q(quiz_data.get("coding", []), "coding")
+            fp = fingerprint(payload.question, getattr(payload, "options", None))
+            match = dedup_index.find_duplicate(fp) or batch_index.find_duplicate(fp)
+            if match:
+                duplicates += 1
+                if on_duplicate != "flag":
+                    continue
+                question.duplicate_of = match[0]
+            session.add(question)
+            if not match:
+                session.flush()
+                batch_index.add(question.id, fp)
+                added.append((question.id, fp))
+    if skipped:
+        print(f"[WARN] Skipped {skipped} invalid questions for chapter {chapter_id}")
+    if duplicates:
+        action = "Flagged" if on_duplicate == "flag" else "Skipped"
+        print(f"[WARN] {action} {duplicates} near-duplicate questions for chapter {chapter_id}")
         
     session.commit()
+    for question_id, fp in added:
+        dedup_index.add(question_id, fp)
+    invalidate_chapter_quiz([chapter_id])
     return quiz
 
+def _load_api_key() -> Optional[str]:
+    from dotenv import load_dotenv
+    env_path = Path(__file__).parent.parent / ".env"
+    load_dotenv(dotenv_path=env_path, override=True)
+    return os.getenv("DEEPSEEK_API_KEY")
+
+def _chat_completion(prompt: str, purpose: str = "chat", timeout: int = 30, temperature: float = 0.3,
+                     system: Optional[str] = None, max_tokens: Optional[int] = None,
+                     api_key: Optional[str] = None) -> str:
+    """
+    单轮对话调用 DeepSeek，返回模型输出的 content
+    - 限流（429）、服务端错误（5xx）和连接失败最多重试 LLM_MAX_RETRIES 次；超时不重试
+    - 每次调用（含重试）的用量、耗时与结果记录到 LLMCall（见 llm_usage.py），purpose 为调用用途
+    """
+    import requests
+
+    headers = {"Authorization": f"Bearer {api_key or _load_api_key()}", "Content-Type": "application/json"}
+    messages = [{"role": "user", "content": prompt}]
+    if system:
+        messages.insert(0, {"role": "system", "content": system})
+    data = {
+        "model": LLM_MODEL,
+        "messages": messages,
+        "temperature": temperature,
+        "stream": False
+    }
+    if max_tokens:
+        data["max_tokens"] = max_tokens
+
+    started = time.perf_counter()
+    attempts = 0
+    while True:
+        attempts += 1
+        try:
+            with span("llm.request", purpose=purpose, attempt=attempts) as current:
+                resp = requests.post(DEEPSEEK_API_URL, headers=headers, json=data, timeout=timeout)
+                current.set(status_code=resp.status_code)
+                resp.raise_for_status()
+                body = resp.json()
+                content = body["choices"][0]["message"]["content"]
+                current.set(**{k: v for k, v in (body.get("usage") or {}).items() if isinstance(v, int)})
+        except requests.exceptions.RequestException as e:
+            status_code = e.response.status_code if e.response is not None else None
+            retryable = isinstance(e, requests.exceptions.ConnectionError) or status_code in RETRY_STATUS_CODES
+            if retryable and attempts <= LLM_MAX_RETRIES:
+                print(f"[WARN] DeepSeek request failed ({e}), retrying ({attempts}/{LLM_MAX_RETRIES})...")
+                time.sleep(LLM_RETRY_BACKOFF * 2 ** (attempts - 1))
+                continue
+            status = "timeout" if isinstance(e, requests.exceptions.Timeout) else "error"
+            record_llm_call(purpose, LLM_MODEL, status, _elapsed_ms(started), attempts, error=str(e))
+            raise
+        except (KeyError, IndexError, ValueError) as e:
+            record_llm_call(purpose, LLM_MODEL, "error", _elapsed_ms(started), attempts, error=f"Invalid response: {e}")
+            raise
+        record_llm_call(purpose, body.get("model") or LLM_MODEL, "ok", _elapsed_ms(started), attempts,
+                        usage=body.get("usage"))
+        return content
+
+def _elapsed_ms(started: float) -> int:
+    return round((time.perf_counter() - started) * 1000)
+
 def grade_short_answer(question_text: str, reference_answer: str, student_answer: str) -> Dict[str, Any]:
     """
     AI 评分简答题
     """
-    from dotenv import load_dotenv
-    env_path = Path(__file__).parent.parent / ".env"
-    load_dotenv(dotenv_path=env_path, override=True)
-    api_key = os.getenv("DEEPSEEK_API_KEY")
     prompt = f"""
 请对学生的简答题答案进行评分。
 题目：{question_text}
@@ -258,32 +465,57 @@ def grade_short_answer(question_text: str, reference_answer: str, student_answer
 
 输出 JSON 格式：{{ "score": 8, "feedback": "..." }}
 """
-    # ... call API (simplified) ...
-    # 为了简洁，重用请求逻辑或假设有一个辅助函数会更好。
-    # 我现在将内联实现。
-    headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
-    data = {
-        "model": "deepseek-chat",
-        "messages": [{"role": "user", "content": prompt}],
-        "temperature": 0.3
-    }
     try:
-        resp = requests.post(DEEPSEEK_API_URL, headers=headers, json=data, timeout=30)
-        content = resp.json()["choices"][0]["message"]["content"]
-        if content.startswith("```"): content = content.strip("`").replace("json", "")
-        return json.loads(content)
+        return parse_llm_json(_chat_completion(prompt, purpose="grade_short_answer", timeout=30))[0]
     except:
         return {"score": 0, "feedback": "评分失败"}
 
+def grade_short_answers_batch(items: List[Dict[str, str]]) -> List[Dict[str, Any]]:
+    """
+    一次调用批量评分多道简答题
+    items: [{"question": 题干, "reference": 参考答案, "answer": 学生答案, "question_id": 可选}]
+    返回与 items 顺序一致的 [{"score": 8, "feedback": "..."}]；模型漏掉的条目单独补评，用量记到该题
+    """
+    blocks = []
+    for i, item in enumerate(items):
+        blocks.append(f"""【第 {i} 份】
+题目：{item["question"]}
+参考答案：{item["reference"]}
+学生答案：{item["answer"]}""")
+    joined_blocks = "\n\n".join(blocks)
+    prompt = f"""
+请对以下 {len(items)} 份学生简答题答案分别进行评分，每份相互独立。
+
+{joined_blocks}
+
+要求：
+1. 每份给出 0-10 分的评分。
+2. 评语应简洁，指出学生答案的准确性及遗漏点。
+
+输出 JSON 数组，index 为上面的份号：[{{ "index": 0, "score": 8, "feedback": "..." }}]
+"""
+    results: List[Optional[Dict[str, Any]]] = [None] * len(items)
+    try:
+        entries, report = parse_llm_json(_chat_completion(prompt, purpose="grade_short_batch", timeout=60))
+        if report.dropped:
+            print(f"[WARN] Batch grading output repaired: {report.summary()}")
+        for entry in entries:
+            index = entry.get("index")
+            if isinstance(index, int) and 0 <= index < len(items):
+                results[index] = {"score": entry.get("score", 0), "feedback": entry.get("feedback", "")}
+    except Exception as e:
+        print(f"[WARN] Batch grading failed, falling back to single grading: {e}")
+
+    for i, result in enumerate(results):
+        if result is None:
+            with llm_context(question_id=items[i].get("question_id")):
+                results[i] = grade_short_answer(items[i]["question"], items[i]["reference"], items[i]["answer"])
+    return results
+
 def review_code(question_text: str, reference_code: str, student_code: str) -> Dict[str, Any]:
     """
     AI 代码评审
     """
-    from dotenv import load_dotenv
-    env_path = Path(__file__).parent.parent / ".env"
-    load_dotenv(dotenv_path=env_path, override=True)
-    api_key = os.getenv("DEEPSEEK_API_KEY")
-    
     prompt = f"""
 请对学生提交的代码进行 Code Review。
 题目：{question_text}
@@ -309,20 +541,53 @@ def review_code(question_text: str, reference_code: str, student_code: str) -> D
 
 输出 JSON 格式：{{ "score": 8, "feedback": "..." }}
 """
-    headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
-    data = {
-        "model": "deepseek-chat",
-        "messages": [{"role": "user", "content": prompt}],
-        "temperature": 0.3
-    }
     try:
-        resp = requests.post(DEEPSEEK_API_URL, headers=headers, json=data, timeout=30)
-        content = resp.json()["choices"][0]["message"]["content"]
-        if content.startswith("```"): content = content.strip("`").replace("json", "")
-        return json.loads(content)
+        return parse_llm_json(_chat_completion(prompt, purpose="review_code", timeout=30))[0]
     except:
         return {"score": 0, "feedback": "评审失败"}
 
+def generate_code_tests(question_text: str, reference_code: str) -> List[str]:
+    """
+    为没有测试用例的代码题生成 assert 测试语句
+    """
+    prompt = f"""
+请为以下编程题编写 5 条 Python 测试语句，用于自动判定学生代码的正确性。
+题目：{question_text}
+参考代码：
+{reference_code}
+
+要求：
+1. 每条测试是一行可直接执行的 assert 语句，只调用参考代码中定义的函数或类。
+2. 覆盖常规输入与边界情况，不要读写文件、访问网络或打印输出。
+
+输出 JSON 格式：{{ "tests": ["assert func(1) == 1", "..."] }}
+"""
+    try:
+        tests = parse_llm_json(_chat_completion(prompt, purpose="code_tests", timeout=30))[0].get("tests", [])
+        return [t for t in tests if isinstance(t, str) and t.strip()]
+    except Exception as e:
+        print(f"[WARN] Failed to generate code tests: {e}")
+        return []
+
+def review_code_style(question_text: str, student_code: str) -> str:
+    """
+    仅对代码风格与可读性给出建议（正确性由沙箱执行判定）
+    """
+    prompt = f"""
+请对学生提交的代码给出简短的代码风格与可读性建议，不需要判断功能是否正确。
+题目：{question_text}
+
+学生代码：
+{student_code}
+
+要求：评语简洁，使用 Markdown 列表列出 1-3 条建议。
+输出 JSON 格式：{{ "feedback": "..." }}
+"""
+    try:
+        return parse_llm_json(_chat_completion(prompt, purpose="code_style", timeout=30))[0].get("feedback", "")
+    except:
+        return ""
+
 def export_quiz_to_word(quiz_data: Dict[str, Any], output_path: str, include_answers: bool = True):
     """
     将题目数据导出为 Word 文档
@@ -380,15 +645,15 @@ def export_quiz_to_word(quiz_data: Dict[str, Any], output_path: str, include_ans
         run.font.size = Pt(12)
         
         # 选项 (单选/多选)
-        if q.get("options_json"):
-            try:
-                options = json.loads(q["options_json"])
-                for i, opt in enumerate(options):
-                    # A, B, C...
-                    letter = chr(65 + i)
-                    doc.add_paragraph(f"   {letter}. {opt}")
-            except:
-                pass
+        try:
+            options = decode_options(q.get("options_json"))
+        except json_codec.JSONDecodeError:
+            # 旧数据中格式错误的选项不影响整份文档导出
+            options = []
+        for i, opt in enumerate(options if isinstance(options, list) else []):
+            # A, B, C...
+            letter = chr(65 + i)
+            doc.add_paragraph(f"   {letter}. {opt}")
         
         # 答案和解析
         if include_answers:
@@ -397,12 +662,10 @@ def export_quiz_to_word(quiz_data: Dict[str, Any], output_path: str, include_ans
             # 格式化答案显示
             ans_text = q.get('answer')
             if q_type_name == "多选题":
+                # JSON 数组字符串，转为 A, B, C；旧数据无法解析时按原样显示
                 try:
-                    # 如果是 JSON 数组字符串，转为 A,B,C
-                    ans_list = json.loads(ans_text) if isinstance(ans_text, str) and ans_text.startswith("[") else ans_text
-                    if isinstance(ans_list, list):
-                        ans_text = ", ".join(ans_list)
-                except:
+                    ans_text = ", ".join(map(str, decode_multi_answer(ans_text)))
+                except (json_codec.JSONDecodeError, AttributeError, TypeError):
                     pass
             elif q_type_name == "判断题":
                 ans_text = "正确" if str(ans_text).lower() == "true" else "错误"
@@ -0,0 +1,318 @@
+"""
+静态文件托管的缓存策略：
+
+- /questions：以文件内容哈希作为 ETag，支持 If-None-Match → 304
+  - manifest.json 及普通题库文件：Cache-Control: no-cache（每次都做廉价的条件请求校验）
+  - 带内容哈希的文件（ch1_questions.<hash>.md）或 ?v=<hash> 与内容一致的请求：长期 immutable 缓存
+- /assets 与 index.html：小文件常驻内存并预压缩（gzip，安装了 brotli 时额外提供 br），
+  按 Accept-Encoding 协商；Vite 带哈希的产物使用长期 immutable 缓存
+- 两者挂载时都不检查目录（前端可能在服务启动后才构建完成），目录不存在时返回 404
+"""
+
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import threading
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+from starlette.datastructures import Headers, QueryParams
+from starlette.exceptions import HTTPException
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.types import Scope
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli 为可选依赖
+    brotli = None
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+# 文件名中的内容哈希片段，例如 ch1_questions.3f2a9c1b7d4e.md
+HASHED_NAME_PATTERN = re.compile(r"\.([0-9a-f]{8,32})\.[^./]+$")
+# ?v= 版本号至少需要的哈希前缀长度
+MIN_VERSION_LENGTH = 8
+
+# (path, mtime_ns, size) -> 内容哈希
+_hash_cache: Dict[Tuple[str, int, int], str] = {}
+_hash_lock = threading.Lock()
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """判断 If-None-Match 请求头是否命中当前 ETag（支持多个值与弱校验前缀 W/）"""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in candidates or etag.removeprefix("W/") in candidates
+
+
+def file_content_hash(path: str, stat_result: os.stat_result) -> str:
+    """
+    计算文件内容哈希（blake2b-128，十六进制），按 mtime/size 缓存，文件不变时不会重复读取
+    """
+    key = (str(path), stat_result.st_mtime_ns, stat_result.st_size)
+    with _hash_lock:
+        cached = _hash_cache.get(key)
+    if cached is not None:
+        return cached
+
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(64 * 1024), b""):
+            digest.update(chunk)
+    content_hash = digest.hexdigest()
+
+    with _hash_lock:
+        _hash_cache[key] = content_hash
+    return content_hash
+
+
+class OptionalDirStaticFiles(StaticFiles):
+    """
+    挂载时不要求目录存在：目录出现之前的请求返回 404（而不是 StaticFiles 默认的 500），出现后正常提供文件
+    """
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault("check_dir", False)
+        super().__init__(*args, **kwargs)
+
+    async def check_config(self) -> None:
+        if self.directory is not None and not os.path.isdir(self.directory):
+            raise HTTPException(status_code=404)
+        await super().check_config()
+
+
+class QuestionsStaticFiles(OptionalDirStaticFiles):
+    """
+    题库目录（manifest.json / *.md / *.json）专用的 StaticFiles
+    """
+
+    def file_response(
+        self,
+        full_path,
+        stat_result: os.stat_result,
+        scope: Scope,
+        status_code: int = 200,
+    ) -> Response:
+        content_hash = file_content_hash(full_path, stat_result)
+
+        response = FileResponse(full_path, status_code=status_code, stat_result=stat_result)
+        response.headers["etag"] = f'"{content_hash}"'
+        if self._is_versioned(full_path, scope, content_hash):
+            response.headers["cache-control"] = IMMUTABLE_CACHE_CONTROL
+        else:
+            response.headers["cache-control"] = REVALIDATE_CACHE_CONTROL
+
+        if self.is_not_modified(response.headers, Headers(scope=scope)):
+            return NotModifiedResponse(response.headers)
+        return response
+
+    @staticmethod
+    def _is_versioned(full_path, scope: Scope, content_hash: str) -> bool:
+        """
+        只有当 URL 中携带的哈希与实际内容一致时才允许长期缓存，
+        避免旧版本号指向新内容时被浏览器永久缓存
+        """
+        match = HASHED_NAME_PATTERN.search(os.path.basename(str(full_path)))
+        if match and content_hash.startswith(match.group(1)):
+            return True
+
+        version = QueryParams(scope.get("query_string", b"")).get("v", "")
+        return len(version) >= MIN_VERSION_LENGTH and content_hash.startswith(version)
+
+
+# === 前端产物（/assets、index.html） ===
+
+# Vite（Rollup）产物文件名中固定 8 位的 base64url 哈希片段，例如 index-BxY2a9_Q.js
+VITE_HASHED_NAME_PATTERN = re.compile(r"-([A-Za-z0-9_-]{8})\.[a-z0-9]+$")
+_WORD_PATTERN = re.compile(r"[a-z-]+")
+# 超过该大小的文件不常驻内存，直接走磁盘（若构建时生成了 .br/.gz 也会优先使用）
+MAX_IN_MEMORY_SIZE = 4 * 1024 * 1024
+# 太小的文件压缩收益不明显
+MIN_COMPRESS_SIZE = 512
+COMPRESSIBLE_SUFFIXES = {".js", ".mjs", ".css", ".html", ".svg", ".json", ".txt", ".map", ".wasm", ".xml"}
+# 按优先级排列的编码及对应的磁盘预压缩文件后缀
+ENCODING_SUFFIXES = (("br", ".br"), ("gzip", ".gz"))
+
+
+@dataclass
+class CachedAsset:
+    body: bytes
+    etag: str
+    media_type: str
+    encoded: Dict[str, bytes]
+
+
+_asset_cache: Dict[Tuple[str, int, int], CachedAsset] = {}
+_asset_lock = threading.Lock()
+
+
+def _compress(body: bytes) -> Dict[str, bytes]:
+    encoded = {"gzip": gzip.compress(body, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        encoded["br"] = brotli.compress(body)
+    return encoded
+
+
+def load_cached_asset(path: str, stat_result: os.stat_result) -> CachedAsset:
+    """
+    读取文件到内存并预压缩；按 (path, mtime, size) 缓存，文件被重新构建后自动更新
+    """
+    key = (str(path), stat_result.st_mtime_ns, stat_result.st_size)
+    with _asset_lock:
+        cached = _asset_cache.get(key)
+    if cached is not None:
+        return cached
+
+    with open(path, "rb") as f:
+        body = f.read()
+
+    encoded: Dict[str, bytes] = {}
+    if os.path.splitext(str(path))[1].lower() in COMPRESSIBLE_SUFFIXES and len(body) >= MIN_COMPRESS_SIZE:
+        # 构建阶段已生成的 .br / .gz 直接复用，否则在此压缩
+        for encoding, suffix in ENCODING_SUFFIXES:
+            precompressed = f"{path}{suffix}"
+            if os.path.isfile(precompressed):
+                with open(precompressed, "rb") as f:
+                    encoded[encoding] = f.read()
+        if not encoded:
+            encoded = _compress(body)
+
+    asset = CachedAsset(
+        body=body,
+        etag=f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"',
+        media_type=mimetypes.guess_type(str(path))[0] or "application/octet-stream",
+        encoded=encoded,
+    )
+    with _asset_lock:
+        # 同一路径的旧版本不再需要
+        for old_key in [k for k in _asset_cache if k[0] == key[0]]:
+            del _asset_cache[old_key]
+        _asset_cache[key] = asset
+    return asset
+
+
+def is_vite_hashed_name(name: str) -> bool:
+    """
+    判断文件名是否带 Vite 内容哈希。
+    只由小写字母和连字符组成的 8 位片段（如 logo-fullsize.svg）更可能是普通单词，按未带哈希处理——
+    误判为无哈希只会多一次条件请求，误判为有哈希则会被浏览器永久缓存
+    """
+    match = VITE_HASHED_NAME_PATTERN.search(name)
+    return match is not None and not _WORD_PATTERN.fullmatch(match.group(1))
+
+
+def choose_encoding(accept_encoding: Optional[str], available) -> Optional[str]:
+    """
+    根据 Accept-Encoding 选择编码（br 优先于 gzip），忽略 q=0 的编码
+    """
+    if not accept_encoding or not available:
+        return None
+    accepted = set()
+    for item in accept_encoding.lower().split(","):
+        name, _, params = item.strip().partition(";")
+        params = params.replace(" ", "")
+        if params in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        accepted.add(name.strip())
+    for encoding, _ in ENCODING_SUFFIXES:
+        if encoding in available and (encoding in accepted or "*" in accepted):
+            return encoding
+    return None
+
+
+def cached_asset_response(
+    asset: CachedAsset, request_headers: Headers, cache_control: str, status_code: int = 200
+) -> Response:
+    headers = {"etag": asset.etag, "cache-control": cache_control}
+    if asset.encoded:
+        headers["vary"] = "Accept-Encoding"
+
+    if etag_matches(request_headers.get("if-none-match"), asset.etag):
+        return Response(status_code=304, headers=headers)
+
+    body = asset.body
+    encoding = choose_encoding(request_headers.get("accept-encoding"), asset.encoded)
+    if encoding:
+        body = asset.encoded[encoding]
+        headers["content-encoding"] = encoding
+    return Response(content=body, status_code=status_code, media_type=asset.media_type, headers=headers)
+
+
+def warm_asset_cache(directory: str) -> int:
+    """
+    启动时预加载并压缩目录下的小文件，返回预热的文件数
+    """
+    count = 0
+    for root, _, files in os.walk(directory):
+        for name in files:
+            if name.endswith((".br", ".gz")):
+                continue
+            path = os.path.join(root, name)
+            stat_result = os.stat(path)
+            if stat_result.st_size <= MAX_IN_MEMORY_SIZE:
+                load_cached_asset(path, stat_result)
+                count += 1
+    return count
+
+
+class CompressedStaticFiles(OptionalDirStaticFiles):
+    """
+    /assets 专用：内存缓存 + 预压缩 + Accept-Encoding 协商
+    """
+
+    def file_response(
+        self,
+        full_path,
+        stat_result: os.stat_result,
+        scope: Scope,
+        status_code: int = 200,
+    ) -> Response:
+        request_headers = Headers(scope=scope)
+        if is_vite_hashed_name(os.path.basename(str(full_path))):
+            cache_control = IMMUTABLE_CACHE_CONTROL
+        else:
+            cache_control = REVALIDATE_CACHE_CONTROL
+
+        if stat_result.st_size <= MAX_IN_MEMORY_SIZE:
+            asset = load_cached_asset(full_path, stat_result)
+            return cached_asset_response(asset, request_headers, cache_control, status_code)
+
+        # 大文件：优先使用构建阶段生成的预压缩文件（ETag 取自预压缩文件本身，与未压缩版本区分）
+        response = None
+        for encoding, suffix in ENCODING_SUFFIXES:
+            precompressed = f"{full_path}{suffix}"
+            if choose_encoding(request_headers.get("accept-encoding"), {encoding}) and os.path.isfile(precompressed):
+                response = FileResponse(
+                    precompressed,
+                    status_code=status_code,
+                    media_type=mimetypes.guess_type(str(full_path))[0],
+                    stat_result=os.stat(precompressed),
+                )
+                response.headers["content-encoding"] = encoding
+                response.headers["vary"] = "Accept-Encoding"
+                break
+
+        if response is None:
+            response = FileResponse(full_path, status_code=status_code, stat_result=stat_result)
+        response.headers["cache-control"] = cache_control
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
+
+
+def spa_index_response(index_path: str, request_headers: Headers) -> Optional[Response]:
+    """
+    返回内存中的 index.html（文件更新后自动重新加载），不存在时返回 None
+    index.html 引用的是带哈希的产物，本身必须每次校验
+    """
+    try:
+        stat_result = os.stat(index_path)
+    except FileNotFoundError:
+        return None
+    asset = load_cached_asset(index_path, stat_result)
+    return cached_asset_response(asset, request_headers, REVALIDATE_CACHE_CONTROL)
@@ -0,0 +1,125 @@
+"""
+PDF 页面文本清洗（在送入模型前去掉无信息的内容，减少 token）：
+
+- 页眉 / 页脚：统计每页开头、结尾若干行出现在哪些页（数字归一化后比较，“第 12 页”与“第 13 页”视为同一行），
+  在相邻的多页中反复出现的即为页眉页脚；单独的页码行直接删除
+- 断行合并：英文连字符断词直接拼接；显示宽度接近整页最大行宽（排版自动换行）且未以句末标点结尾的行与下一行合并，
+  标题、列表等短行保持独立
+- 空白规范化：合并连续空白、去掉中文字符之间多余的空格、连续空行只保留一个
+"""
+
+import re
+from collections import defaultdict
+from typing import Dict, List, Set
+
+# 每页开头 / 结尾参与页眉页脚统计的行数
+EDGE_LINES = 3
+# 同一行在相邻的若干页内（允许奇偶页交替）至少出现这么多次才视为页眉页脚，
+# 避免“#.# 小结”这类各章都有、但相隔很远的标题被误删
+MIN_REPEAT_PAGES = 3
+# 边缘行超过该长度时不参与统计（页眉页脚都是短行，避免误删正文）
+MAX_EDGE_CHARS = 50
+# 行宽达到本页最大行宽的比例时视为排版换行
+WRAP_RATIO = 0.8
+
+_CJK = "\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af"
+
+_SPACES_PATTERN = re.compile("[ \t\u3000\xa0]+")
+_CJK_CHAR_PATTERN = re.compile(f"[{_CJK}]")
+_CJK_GAP_PATTERN = re.compile(f"(?<=[{_CJK}]) (?=[{_CJK}])")
+_DIGITS_PATTERN = re.compile(r"\d+")
+_PAGE_NUMBER_PATTERN = re.compile(
+    r"^(?:[-–—·•]\s*)?(?:第\s*)?(?:\d{1,4}|[ivxlcdm]{1,6}|[IVXLCDM]{1,6})(?:\s*页)?"
+    r"(?:\s*/\s*(?:共\s*)?\d{1,4}\s*页?)?(?:\s*[-–—·•])?$"
+)
+_HYPHEN_END_PATTERN = re.compile(r"[A-Za-z]-$")
+_SENTENCE_END = tuple("。！？；：.!?;:」』”）)")
+
+
+def normalize_line(line: str) -> str:
+    line = _SPACES_PATTERN.sub(" ", line).strip()
+    return _CJK_GAP_PATTERN.sub("", line)
+
+
+def _edge_key(line: str) -> str:
+    return _DIGITS_PATTERN.sub("#", line.replace(" ", ""))
+
+
+def _edge_indexes(lines: List[str]) -> List[int]:
+    """每页开头、结尾各 EDGE_LINES 个非空行的下标"""
+    non_empty = [i for i, line in enumerate(lines) if line]
+    if len(non_empty) <= EDGE_LINES * 2:
+        return non_empty
+    return non_empty[:EDGE_LINES] + non_empty[-EDGE_LINES:]
+
+
+def find_noise_lines(pages: List[List[str]]) -> List[Set[int]]:
+    """
+    pages 为各页已规范化的行，返回每页应删除的行下标（页眉、页脚、页码）
+    """
+    seen: Dict[str, List[int]] = defaultdict(list)
+    for page_no, lines in enumerate(pages):
+        for key in {_edge_key(lines[i]) for i in _edge_indexes(lines) if len(lines[i]) <= MAX_EDGE_CHARS}:
+            seen[key].append(page_no)
+    span = 2 * (MIN_REPEAT_PAGES - 1)
+    repeated = {
+        key for key, page_nos in seen.items()
+        if any(page_nos[j + MIN_REPEAT_PAGES - 1] - page_nos[j] <= span
+               for j in range(len(page_nos) - MIN_REPEAT_PAGES + 1))
+    }
+
+    noise: List[Set[int]] = []
+    for lines in pages:
+        drop = set()
+        for i in _edge_indexes(lines):
+            line = lines[i]
+            if _PAGE_NUMBER_PATTERN.match(line) or (len(line) <= MAX_EDGE_CHARS and _edge_key(line) in repeated):
+                drop.add(i)
+        noise.append(drop)
+    return noise
+
+
+def _display_width(line: str) -> int:
+    """按显示宽度计算行长：中文等全角字符占两个半角宽度"""
+    return len(line) + len(_CJK_CHAR_PATTERN.findall(line))
+
+
+def merge_lines(lines: List[str]) -> List[str]:
+    """合并一页内的排版断行，空行作为段落分隔保留（连续空行只保留一个）"""
+    widths = [_display_width(line) for line in lines]
+    width = max(widths, default=0)
+    merged: List[str] = []
+    wrapped = False  # 上一行是否为排版换行
+    hyphenated = False  # 上一行是否以英文连字符断词结尾
+    for line, line_width in zip(lines, widths):
+        if not line:
+            if merged and merged[-1]:
+                merged.append("")
+            wrapped = hyphenated = False
+            continue
+        previous = merged[-1] if merged else ""
+        if hyphenated and line[0].islower():
+            merged[-1] = previous[:-1] + line
+        elif wrapped:
+            cjk_joint = _CJK_CHAR_PATTERN.match(previous[-1]) or _CJK_CHAR_PATTERN.match(line[0])
+            merged[-1] = previous + line if cjk_joint else f"{previous} {line}"
+        else:
+            merged.append(line)
+        wrapped = line_width >= width * WRAP_RATIO and not line.endswith(_SENTENCE_END)
+        hyphenated = bool(_HYPHEN_END_PATTERN.search(line))
+    while merged and not merged[-1]:
+        merged.pop()
+    return merged
+
+
+def clean_pages(page_texts: List[str]) -> List[str]:
+    """
+    清洗各页文本，返回与输入一一对应的页面文本（非空页以换行结尾，可直接拼接）
+    """
+    pages = [[normalize_line(line) for line in text.splitlines()] for text in page_texts]
+    noise = find_noise_lines(pages)
+    cleaned = []
+    for lines, drop in zip(pages, noise):
+        kept = merge_lines([line for i, line in enumerate(lines) if i not in drop])
+        cleaned.append("\n".join(kept) + "\n" if kept else "")
+    return cleaned
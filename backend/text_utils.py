@@ -0,0 +1,13 @@
+"""
+通用文本工具：不依赖其他后端模块，评分、去重等模块都可以直接导入
+"""
+
+import re
+import unicodedata
+
+_NON_WORD_PATTERN = re.compile(r"[\W_]+", re.UNICODE)
+
+
+def normalize_answer(text: str) -> str:
+    """全角转半角、小写、去掉空白与标点"""
+    return _NON_WORD_PATTERN.sub("", unicodedata.normalize("NFKC", text or "").lower())
@@ -0,0 +1,235 @@
+"""
+轻量级链路追踪（上传 → 解析 → 生成 → 保存）：
+
+- `with trace("course.generation", course_id=...)` 开始一条链路；链路内任意位置用 `with span("...")`
+  或 `@traced("...")` 记录嵌套的耗时片段，父子关系通过 contextvar 传递，不需要逐层传参
+- 不在链路内时 span 直接返回空对象，只多一次 contextvar 读取，可以常开
+- 链路结束时整条写入 data/traces.jsonl（每行一条链路，含全部 span），
+  GET /api/courses/{course_id}/traces 按课程读取并返回瀑布图数据
+- 文件超过 MAX_TRACE_FILE_BYTES 时压缩：每门课程只保留最近 MAX_TRACES_PER_COURSE 条链路（总量不超过上限的一半），
+  写入临时文件后原子替换；读取不加锁（追加按整行写入，替换不影响已打开的文件）
+- 线程池中的任务不会继承调用方的 context，需要时在任务函数内部重新开始链路
+"""
+
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from . import json_codec
+
+TRACE_FILE = Path("data") / "traces.jsonl"
+# 单条链路最多记录的 span 数，超出后丢弃（避免逐题记录时链路过大）
+MAX_SPANS_PER_TRACE = 2000
+# 链路文件超过该大小时压缩，每门课程保留最近的若干条链路
+MAX_TRACE_FILE_BYTES = 20 * 1024 * 1024
+MAX_TRACES_PER_COURSE = 50
+
+_write_lock = threading.Lock()
+
+
+class Span:
+    __slots__ = ("trace", "span_id", "parent_id", "name", "attributes", "start", "_started", "duration_ms",
+                 "status", "error")
+
+    def __init__(self, trace: "_Trace", name: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.trace = trace
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.name = name
+        self.attributes = attributes
+        self.start = time.time()
+        self._started = time.perf_counter()
+        self.duration_ms = 0.0
+        self.status = "ok"
+        self.error: Optional[str] = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.start,
+            "duration_ms": round(self.duration_ms, 3),
+            "status": self.status,
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+
+class _NoopSpan:
+    """不在链路内时返回的空 span"""
+
+    def set(self, **attributes):
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+class _Trace:
+    def __init__(self):
+        self.trace_id = uuid.uuid4().hex
+        self.spans: List[Span] = []
+        self.dropped = 0
+        self.lock = threading.Lock()
+
+    def add(self, span: Span):
+        with self.lock:
+            if len(self.spans) < MAX_SPANS_PER_TRACE:
+                self.spans.append(span)
+            else:
+                self.dropped += 1
+
+
+_current: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+@contextmanager
+def _run(span: Span) -> Iterator[Span]:
+    token = _current.set(span)
+    try:
+        yield span
+    except BaseException as e:
+        span.status = "error"
+        span.error = str(e)[:500]
+        raise
+    finally:
+        span.duration_ms = (time.perf_counter() - span._started) * 1000
+        _current.reset(token)
+        span.trace.add(span)
+
+
+@contextmanager
+def trace(name: str, **attributes) -> Iterator[Span]:
+    """开始一条新链路（已在链路内时作为普通 span），结束时写入 TRACE_FILE"""
+    parent = _current.get()
+    if parent is not None:
+        with _run(Span(parent.trace, name, parent.span_id, attributes)) as s:
+            yield s
+        return
+    root = Span(_Trace(), name, None, attributes)
+    try:
+        with _run(root) as s:
+            yield s
+    finally:
+        _export(root)
+
+
+@contextmanager
+def span(name: str, **attributes) -> Iterator[Any]:
+    parent = _current.get()
+    if parent is None:
+        yield _NOOP
+        return
+    with _run(Span(parent.trace, name, parent.span_id, attributes)) as s:
+        yield s
+
+
+def traced(name: Optional[str] = None):
+    """装饰器：函数调用记录为一个 span"""
+    def decorator(func):
+        span_name = name or func.__name__
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if _current.get() is None:
+                return func(*args, **kwargs)
+            with span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _export(root: Span):
+    trace_ = root.trace
+    record = {
+        "trace_id": trace_.trace_id,
+        "name": root.name,
+        "course_id": root.attributes.get("course_id"),
+        "start": root.start,
+        "duration_ms": round(root.duration_ms, 3),
+        "status": root.status,
+        "dropped_spans": trace_.dropped,
+        "spans": [s.to_dict() for s in sorted(trace_.spans, key=lambda s: s.start)],
+    }
+    try:
+        with _write_lock:
+            TRACE_FILE.parent.mkdir(exist_ok=True)
+            with TRACE_FILE.open("ab") as f:
+                f.write(json_codec.dumps(record) + b"\n")
+                size = f.tell()
+            if size > MAX_TRACE_FILE_BYTES:
+                _compact()
+    except Exception as e:
+        print(f"[WARN] Failed to export trace {root.name}: {e}")
+
+
+def _compact():
+    """
+    每门课程只保留最近 MAX_TRACES_PER_COURSE 条链路，且总大小不超过上限的一半，
+    保证两次压缩之间至少追加一半上限的数据（调用方持有 _write_lock）
+    """
+    kept: List[bytes] = []
+    counts: Dict[Any, int] = {}
+    budget = MAX_TRACE_FILE_BYTES // 2
+    with TRACE_FILE.open("rb") as f:
+        lines = f.readlines()
+    for line in reversed(lines):
+        if len(line) > budget:
+            break
+        try:
+            course_id = json_codec.loads(line).get("course_id")
+        except json_codec.JSONDecodeError:
+            continue
+        counts[course_id] = counts.get(course_id, 0) + 1
+        if counts[course_id] <= MAX_TRACES_PER_COURSE:
+            kept.append(line)
+            budget -= len(line)
+    tmp = TRACE_FILE.with_suffix(".jsonl.tmp")
+    with tmp.open("wb") as f:
+        f.writelines(reversed(kept))
+    os.replace(tmp, TRACE_FILE)
+    print(f"[INFO] Compacted {TRACE_FILE}: kept {len(kept)} of {len(lines)} traces")
+
+
+def load_traces(course_id: int, limit: int = 20) -> List[Dict[str, Any]]:
+    """读取课程最近的 limit 条链路（新的在前）"""
+    if not TRACE_FILE.exists():
+        return []
+    traces = []
+    marker = f'"course_id":{course_id},'.encode()
+    with TRACE_FILE.open("rb") as f:
+        for line in f:
+            # 先按字节粗筛，只解析本课程的完整行（末行可能正在写入）
+            if marker in line and line.endswith(b"\n"):
+                record = json_codec.loads(line)
+                if record.get("course_id") == course_id:
+                    traces.append(record)
+    return traces[::-1][:limit]
+
+
+def waterfall(record: Dict[str, Any]) -> Dict[str, Any]:
+    """把链路转为瀑布图：span 按开始时间排列，给出相对链路开始的偏移与嵌套深度"""
+    parents = {s["span_id"]: s["parent_id"] for s in record["spans"]}
+
+    def depth(span_id: str) -> int:
+        level = 0
+        while parents.get(span_id):
+            span_id = parents[span_id]
+            level += 1
+        return level
+
+    rows = [
+        {**s, "depth": depth(s["span_id"]), "offset_ms": round((s["start"] - record["start"]) * 1000, 3)}
+        for s in record["spans"]
+    ]
+    return {key: value for key, value in record.items() if key != "spans"} | {"spans": rows}
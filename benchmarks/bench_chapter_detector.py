@@ -0,0 +1,127 @@
+"""
+bench_chapter_detector.py
+-------------------------
+
+对比章节识别的候选标题扫描：
+- legacy：逐行 strip 后依次尝试 5 条规则（旧实现，保留在这里作对照）
+- combined：合并后的单个多行正则 finditer 一次扫描（experiments/chapter_detector.py）
+
+生成数 MB 的中英文混排文本，校验两种实现结果一致后输出耗时与加速比。
+
+用法（在项目根目录运行）：
+    python benchmarks/bench_chapter_detector.py
+    python benchmarks/bench_chapter_detector.py --size-mb 8 --repeat 5
+"""
+
+import argparse
+import random
+import re
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from experiments.chapter_detector import _collect_heading_candidates  # noqa: E402
+
+# === 旧实现 ===
+
+_LEGACY_PATTERNS = [
+    (re.compile(r"^第\s*[一二三四五六七八九十百零\d]+\s*(章|节|篇|部分|卷)\b.*"), 3.0),
+    (re.compile(r"^[一二三四五六七八九十百零]+\s*[、.]\s*.+"), 2.0),
+    (re.compile(r"^\d+(\.\d+){0,2}\s+.+"), 2.5),
+    (re.compile(r"^(Chapter|CHAPTER|Part|PART|Section|SECTION)\s+[0-9IVXLC]+\b.*"), 3.0),
+    (re.compile(r"^[A-Z][A-Za-z]+\s+\d+(\.\d+)?\b.*"), 1.5),
+]
+
+
+def legacy_collect_heading_candidates(full_text: str) -> List[Dict]:
+    candidates: List[Dict] = []
+    cursor = 0
+    for line in full_text.splitlines():
+        stripped = line.strip()
+        line_length = len(line)
+        if not stripped or len(stripped) > 160:
+            cursor += line_length + 1
+            continue
+        weight = next((w for pattern, w in _LEGACY_PATTERNS if pattern.match(stripped)), None)
+        if weight is not None:
+            if candidates and cursor - candidates[-1]["start"] < 120:
+                cursor += line_length + 1
+                continue
+            candidates.append({"start": cursor, "title": stripped, "score": weight})
+        cursor += line_length + 1
+    return candidates
+
+
+# === 测试数据 ===
+
+_BODY_WORDS = ["线性表", "栈", "队列", "二叉树", "图", "排序", "查找", "算法", "复杂度", "指针",
+               "list", "stack", "queue", "tree", "graph", "sort", "search", "memory", "index", "node"]
+
+
+def _heading(rng: random.Random, number: int) -> str:
+    return rng.choice([
+        f"第{number}章 数据结构基础",
+        f"{number}.{rng.randint(1, 9)} 小节标题",
+        f"Chapter {number} Introduction",
+        f"Section {number} Overview",
+        "三、 概述",
+        f"Figure {number}.{rng.randint(1, 9)} example",
+    ])
+
+
+def build_text(size_mb: float, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    target = int(size_mb * 1024 * 1024)
+    lines: List[str] = []
+    length = 0
+    number = 1
+    while length < target:
+        if rng.random() < 0.02:
+            line = ("  " if rng.random() < 0.2 else "") + _heading(rng, number)
+            number += 1
+        else:
+            line = " ".join(rng.choice(_BODY_WORDS) for _ in range(rng.randint(4, 30)))
+        lines.append(line)
+        length += len(line) + 1
+    return "\n".join(lines)
+
+
+def _best_of(func, text: str, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(text)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="章节标题扫描基准测试")
+    parser.add_argument("--size-mb", type=float, default=4.0, help="测试文本大小（MB，默认 4）")
+    parser.add_argument("--repeat", type=int, default=3, help="重复次数，取最快一次")
+    args = parser.parse_args()
+
+    text = build_text(args.size_mb)
+    print(f"文本：{len(text) / 1024 / 1024:.1f} MB，{text.count(chr(10)) + 1} 行")
+
+    expected = legacy_collect_heading_candidates(text)
+    actual = _collect_heading_candidates(text)
+    if actual != expected:
+        print(f"[WARN] 结果不一致：legacy {len(expected)} 个候选，combined {len(actual)} 个候选")
+        sys.exit(1)
+    print(f"候选标题：{len(actual)} 个（两种实现一致）")
+
+    legacy = _best_of(legacy_collect_heading_candidates, text, args.repeat)
+    combined = _best_of(_collect_heading_candidates, text, args.repeat)
+    print(f"legacy:   {legacy * 1000:8.1f} ms")
+    print(f"combined: {combined * 1000:8.1f} ms")
+    print(f"加速比:   {legacy / combined:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+bench_startup.py
+----------------
+
+测量后端冷启动：
+- import：子进程中 `import backend.app` 的耗时，以及导入后是否已加载 PyMuPDF / requests / python-docx / dotenv
+  （这些模块应在首次使用时才导入）
+- first response：启动 uvicorn 子进程到 /api/health 首次返回 200 的时间（包含解释器启动、导入与建库）
+
+每次都在新的临时目录中启动（空数据库），重复 --repeat 次取中位数；
+给出 --max-ms 时首次响应中位数超过该值以非零状态退出，可用于防止启动变慢。
+
+用法（在项目根目录运行）：
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --repeat 10 --max-ms 3000
+"""
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+
+HEAVY_MODULES = ["fitz", "requests", "docx", "dotenv"]
+
+_IMPORT_PROBE = f"""
+import json, sys, time
+started = time.perf_counter()
+import backend.app
+elapsed = (time.perf_counter() - started) * 1000
+print(json.dumps({{"import_ms": elapsed, "loaded": [m for m in {HEAVY_MODULES!r} if m in sys.modules]}}))
+"""
+
+
+def _env() -> dict:
+    return {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [str(REPO_ROOT), os.environ.get("PYTHONPATH")]))}
+
+
+def measure_import(workdir: Path) -> dict:
+    output = subprocess.run([sys.executable, "-c", _IMPORT_PROBE], cwd=workdir, env=_env(),
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def measure_first_response(workdir: Path, timeout: float = 60) -> float:
+    port = free_port()
+    url = f"http://127.0.0.1:{port}/api/health"
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.app:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=workdir, env=_env(), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            if process.poll() is not None:
+                raise RuntimeError("uvicorn 启动失败")
+            try:
+                with urllib.request.urlopen(url, timeout=1) as resp:
+                    if resp.status == 200:
+                        return (time.perf_counter() - started) * 1000
+            except (urllib.error.URLError, ConnectionError):
+                time.sleep(0.01)
+        raise RuntimeError("等待 /api/health 超时")
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="后端冷启动耗时")
+    parser.add_argument("--repeat", type=int, default=5, help="重复次数（默认 5）")
+    parser.add_argument("--max-ms", type=float, help="首次响应中位数上限（毫秒），超过时以非零状态退出")
+    args = parser.parse_args()
+
+    import_times, response_times, loaded = [], [], set()
+    for _ in range(args.repeat):
+        with tempfile.TemporaryDirectory(prefix="ai-learning-startup-") as tmp:
+            probe = measure_import(Path(tmp))
+            import_times.append(probe["import_ms"])
+            loaded.update(probe["loaded"])
+        with tempfile.TemporaryDirectory(prefix="ai-learning-startup-") as tmp:
+            response_times.append(measure_first_response(Path(tmp)))
+
+    import_ms = statistics.median(import_times)
+    first_response_ms = statistics.median(response_times)
+    print(f"import backend.app    median {import_ms:8.1f} ms   min {min(import_times):8.1f} ms")
+    print(f"first /api/health     median {first_response_ms:8.1f} ms   min {min(response_times):8.1f} ms")
+    if loaded:
+        print(f"[WARN] 导入 backend.app 时已加载：{', '.join(sorted(loaded))}（应在首次使用时再导入）")
+    else:
+        print(f"[INFO] 导入 backend.app 时未加载 {', '.join(HEAVY_MODULES)}")
+
+    if args.max_ms is not None and first_response_ms > args.max_ms:
+        print(f"[ERROR] 首次响应 {first_response_ms:.0f} ms 超过上限 {args.max_ms:.0f} ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
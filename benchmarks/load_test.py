@@ -0,0 +1,368 @@
+"""
+load_test.py
+------------
+
+后端接口压测：在后台出题进行的同时，模拟多名学生并发访问。
+
+- 启动一个本地模拟 DeepSeek 服务（按 prompt 返回出题 / 单题评分 / 批量评分的 JSON，延迟可配置），
+  再在临时目录中用独立数据库启动 uvicorn，通过 DEEPSEEK_API_URL 把后端接到模拟服务上
+- 准备数据：上传一本生成的样书（见 run_benchmarks.py）→ 解析 → 出题；压测期间后台持续重新出题
+- 并发线程按权重混合请求：课程列表、章节列表、章节测验、加入错题、错题列表、简答题评分、批量评分
+- 按路由输出吞吐量、p50 / p95 / p99 / 最大延迟与错误率，可写入 JSON
+
+用法（在项目根目录运行）：
+    python benchmarks/load_test.py
+    python benchmarks/load_test.py --concurrency 32 --duration 60 --llm-latency 1.5 --output load.json
+    python benchmarks/load_test.py --url http://127.0.0.1:8000   # 压测已启动的服务（需自行配置 DEEPSEEK_API_URL）
+"""
+
+import argparse
+import itertools
+import json
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+import requests  # noqa: E402
+
+from benchmarks.run_benchmarks import build_book  # noqa: E402
+
+# 请求混合：(路由名, 权重)
+MIX = [
+    ("GET /api/courses", 15),
+    ("GET /api/courses/{course_id}/chapters", 15),
+    ("GET /api/chapters/{chapter_id}/quiz", 25),
+    ("POST /api/mistakes", 10),
+    ("GET /api/courses/{course_id}/mistakes", 15),
+    ("POST /api/grade/short-answer", 15),
+    ("POST /api/grade/batch", 5),
+]
+REQUEST_TIMEOUT = 60
+
+
+# === 模拟 DeepSeek ===
+
+class MockLLMHandler(BaseHTTPRequestHandler):
+    latency = 0.5
+    counter = itertools.count(1)
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)))
+        prompt = body["messages"][-1]["content"]
+        time.sleep(self.latency)
+        content = json.dumps(self._answer(prompt), ensure_ascii=False)
+        payload = json.dumps({
+            "id": f"mock-{next(self.counter)}",
+            "model": body.get("model", "deepseek-chat"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": len(prompt), "completion_tokens": len(content),
+                      "total_tokens": len(prompt) + len(content)},
+        }, ensure_ascii=False).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _answer(self, prompt: str) -> Any:
+        if "【章节内容开始】" in prompt:
+            return self._quiz()
+        batch = re.findall(r"【第 (\d+) 份】", prompt)
+        if batch:
+            return [{"index": int(i), "score": random.randint(3, 10), "feedback": "模拟评语"} for i in batch]
+        return {"score": random.randint(3, 10), "feedback": "模拟评语"}
+
+    def _quiz(self) -> Dict[str, Any]:
+        def stem(kind: str) -> str:
+            n = next(self.counter)
+            return f"{kind}题 {n}：第 {n * 7919} 号知识点的含义是什么？"
+
+        return {
+            "quiz_title": "模拟测验",
+            "quiz_description": "mock",
+            "multiple_choice": [{"question": stem("单选"), "options": ["A. 甲", "B. 乙", "C. 丙", "D. 丁"],
+                                 "answer": "A", "explanation": "解析"} for _ in range(3)],
+            "fill_in_blank": [{"question": stem("填空"), "answer": "栈", "explanation": "解析"} for _ in range(2)],
+            "short_answer": [{"question": stem("简答"), "answer": "线性表的顺序存储用连续空间，链式存储用指针连接结点",
+                              "keywords": ["连续", "指针"], "explanation": "解析"} for _ in range(3)],
+        }
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_mock_llm(latency: float) -> ThreadingHTTPServer:
+    MockLLMHandler.latency = latency
+    server = ThreadingHTTPServer(("127.0.0.1", 0), MockLLMHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="mock-llm", daemon=True).start()
+    return server
+
+
+# === 后端 ===
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_backend(workdir: Path, llm_url: str) -> Tuple[subprocess.Popen, str]:
+    port = free_port()
+    env = {
+        **os.environ,
+        "PYTHONPATH": os.pathsep.join(filter(None, [str(REPO_ROOT), os.environ.get("PYTHONPATH")])),
+        "DEEPSEEK_API_URL": llm_url,
+        "DEEPSEEK_API_KEY": "sk-loadtest",
+    }
+    log = (workdir / "server.log").open("wb")
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.app:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"后端启动失败，日志见 {workdir / 'server.log'}")
+        try:
+            requests.get(f"{base_url}/api/health", timeout=1)
+            return process, base_url
+        except requests.RequestException:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("后端启动超时")
+
+
+def wait_for_status(base_url: str, course_id: int, statuses: set, timeout: float = 600) -> str:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        course = next(c for c in requests.get(f"{base_url}/api/courses").json() if c["id"] == course_id)
+        if course["status"] in statuses:
+            return course["status"]
+        time.sleep(0.5)
+    raise RuntimeError(f"课程 {course_id} 等待状态 {statuses} 超时")
+
+
+def prepare_course(base_url: str, workdir: Path, pages: int) -> Dict[str, Any]:
+    """上传样书并解析、出题，返回压测用到的 id"""
+    pdf_path = workdir / "loadtest_book.pdf"
+    build_book(pdf_path, pages, max(pages // 10, 2), with_toc=True)
+    with pdf_path.open("rb") as f:
+        course_id = requests.post(f"{base_url}/api/upload", files={"file": (pdf_path.name, f, "application/pdf")}
+                                  ).json()["course_id"]
+    requests.post(f"{base_url}/api/courses/{course_id}/parse").raise_for_status()
+    wait_for_status(base_url, course_id, {"parsed", "error"})
+    requests.post(f"{base_url}/api/courses/{course_id}/generate", json={"num_mc": 3}).raise_for_status()
+    if wait_for_status(base_url, course_id, {"ready", "error"}) == "error":
+        raise RuntimeError("准备数据时出题失败")
+
+    chapter_ids = [ch["id"] for ch in requests.get(f"{base_url}/api/courses/{course_id}/chapters").json()]
+    questions = [
+        q for chapter_id in chapter_ids
+        for quiz in requests.get(f"{base_url}/api/chapters/{chapter_id}/quiz").json()
+        for q in quiz["questions"]
+    ]
+    short_answers = [q for q in questions if q["type"] == "short_answer"]
+    if not short_answers:
+        raise RuntimeError("没有生成简答题，无法压测评分接口")
+    print(f"[INFO] 课程 {course_id}：{len(chapter_ids)} 章，{len(questions)} 道题")
+    return {"course_id": course_id, "chapter_ids": chapter_ids, "questions": questions,
+            "short_answers": short_answers}
+
+
+def keep_generating(base_url: str, course_id: int, stop: threading.Event, counter: List[int]):
+    """压测期间持续在后台重新出题"""
+    while not stop.is_set():
+        try:
+            requests.post(f"{base_url}/api/courses/{course_id}/generate", json={"num_mc": 3}).raise_for_status()
+            counter[0] += 1
+            while not stop.is_set():
+                course = next(c for c in requests.get(f"{base_url}/api/courses").json() if c["id"] == course_id)
+                if course["status"] in ("ready", "error"):
+                    break
+                stop.wait(0.5)
+        except requests.RequestException as e:
+            print(f"[WARN] 后台出题请求失败: {e}")
+            stop.wait(1)
+
+
+# === 压测 ===
+
+def build_actions(base_url: str, data: Dict[str, Any]) -> Dict[str, Callable[[requests.Session], requests.Response]]:
+    course_id = data["course_id"]
+
+    def grade_answer(question: Dict[str, Any]) -> str:
+        # 一半与参考答案一致（本地评分），一半为随意作答（需要 LLM 评分）
+        return question["answer"] if random.random() < 0.5 else f"随意作答 {random.randint(1, 10 ** 6)}"
+
+    return {
+        "GET /api/courses": lambda s: s.get(f"{base_url}/api/courses", timeout=REQUEST_TIMEOUT),
+        "GET /api/courses/{course_id}/chapters":
+            lambda s: s.get(f"{base_url}/api/courses/{course_id}/chapters", timeout=REQUEST_TIMEOUT),
+        "GET /api/chapters/{chapter_id}/quiz":
+            lambda s: s.get(f"{base_url}/api/chapters/{random.choice(data['chapter_ids'])}/quiz",
+                            timeout=REQUEST_TIMEOUT),
+        "POST /api/mistakes":
+            lambda s: s.post(f"{base_url}/api/mistakes", timeout=REQUEST_TIMEOUT,
+                             json={"question_id": random.choice(data["questions"])["id"], "course_id": course_id}),
+        "GET /api/courses/{course_id}/mistakes":
+            lambda s: s.get(f"{base_url}/api/courses/{course_id}/mistakes", timeout=REQUEST_TIMEOUT),
+        "POST /api/grade/short-answer":
+            lambda s: s.post(f"{base_url}/api/grade/short-answer", timeout=REQUEST_TIMEOUT,
+                             json={"question_id": (q := random.choice(data["short_answers"]))["id"],
+                                   "answer": grade_answer(q)}),
+        "POST /api/grade/batch":
+            lambda s: s.post(f"{base_url}/api/grade/batch", timeout=REQUEST_TIMEOUT, json={"items": [
+                {"question_id": q["id"], "answer": grade_answer(q)}
+                for q in random.sample(data["short_answers"], min(5, len(data["short_answers"])))
+            ]}),
+    }
+
+
+def run_load(actions: Dict[str, Callable], concurrency: int, duration: float) -> Tuple[Dict[str, Any], float]:
+    names = [name for name, _ in MIX]
+    weights = [weight for _, weight in MIX]
+    samples: Dict[str, List[float]] = defaultdict(list)
+    errors: Dict[str, int] = defaultdict(int)
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def worker():
+        session = requests.Session()
+        while time.perf_counter() < deadline:
+            name = random.choices(names, weights)[0]
+            started = time.perf_counter()
+            try:
+                ok = actions[name](session).status_code < 400
+            except requests.RequestException:
+                ok = False
+            elapsed = (time.perf_counter() - started) * 1000
+            with lock:
+                samples[name].append(elapsed)
+                if not ok:
+                    errors[name] += 1
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, name=f"load-{i}") for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    return {name: {"latencies": samples[name], "errors": errors[name]} for name in names if samples[name]}, elapsed
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    index = min(max(round(p / 100 * len(sorted_values) + 0.5) - 1, 0), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+def summarize(raw: Dict[str, Any], elapsed: float) -> Dict[str, Any]:
+    routes = {}
+    for name, item in raw.items():
+        values = sorted(item["latencies"])
+        routes[name] = {
+            "requests": len(values),
+            "errors": item["errors"],
+            "error_rate": round(item["errors"] / len(values), 4),
+            "throughput_rps": round(len(values) / elapsed, 2),
+            "p50_ms": round(percentile(values, 50), 1),
+            "p95_ms": round(percentile(values, 95), 1),
+            "p99_ms": round(percentile(values, 99), 1),
+            "max_ms": round(values[-1], 1),
+        }
+    total = sum(r["requests"] for r in routes.values())
+    total_errors = sum(r["errors"] for r in routes.values())
+    return {
+        "duration_s": round(elapsed, 2),
+        "requests": total,
+        "errors": total_errors,
+        "error_rate": round(total_errors / max(total, 1), 4),
+        "throughput_rps": round(total / elapsed, 2),
+        "routes": routes,
+    }
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    print(f"\n{'route':<40}{'reqs':>7}{'rps':>8}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}{'err%':>7}")
+    for name, r in report["routes"].items():
+        print(f"{name:<40}{r['requests']:>7}{r['throughput_rps']:>8.1f}{r['p50_ms']:>9.1f}{r['p95_ms']:>9.1f}"
+              f"{r['p99_ms']:>9.1f}{r['max_ms']:>9.1f}{r['error_rate']:>7.1%}")
+    print(f"\n共 {report['requests']} 个请求，{report['duration_s']} s，吞吐量 {report['throughput_rps']} req/s，"
+          f"错误率 {report['error_rate']:.2%}（延迟单位 ms）")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="后端接口压测（模拟 DeepSeek）")
+    parser.add_argument("--url", help="压测已启动的后端（默认在临时目录中启动一个）")
+    parser.add_argument("--concurrency", type=int, default=16, help="并发用户数（默认 16）")
+    parser.add_argument("--duration", type=float, default=30, help="压测时长（秒，默认 30）")
+    parser.add_argument("--pages", type=int, default=60, help="样书页数（默认 60）")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="模拟 LLM 的响应延迟（秒，默认 0.5）")
+    parser.add_argument("--no-background-generation", action="store_true", help="压测期间不在后台出题")
+    parser.add_argument("--output", type=Path, help="结果 JSON 路径")
+    args = parser.parse_args()
+
+    mock = start_mock_llm(args.llm_latency)
+    llm_url = f"http://127.0.0.1:{mock.server_address[1]}/chat/completions"
+    print(f"[INFO] 模拟 DeepSeek 服务：{llm_url}")
+
+    with tempfile.TemporaryDirectory(prefix="ai-learning-load-") as tmp:
+        workdir = Path(tmp)
+        process: Optional[subprocess.Popen] = None
+        stop = threading.Event()
+        try:
+            if args.url:
+                base_url = args.url.rstrip("/")
+            else:
+                process, base_url = start_backend(workdir, llm_url)
+                print(f"[INFO] 后端已启动：{base_url}（工作目录 {workdir}）")
+            data = prepare_course(base_url, workdir, args.pages)
+
+            generations = [0]
+            generator = None
+            if not args.no_background_generation:
+                generator = threading.Thread(target=keep_generating, name="generator",
+                                             args=(base_url, data["course_id"], stop, generations), daemon=True)
+                generator.start()
+
+            print(f"[INFO] 开始压测：{args.concurrency} 并发，{args.duration:g} s")
+            raw, elapsed = run_load(build_actions(base_url, data), args.concurrency, args.duration)
+            stop.set()
+            if generator:
+                generator.join(timeout=5)
+        finally:
+            stop.set()
+            if process:
+                process.terminate()
+                process.wait(timeout=10)
+            mock.shutdown()
+
+    report = summarize(raw, elapsed)
+    report["params"] = {"concurrency": args.concurrency, "duration": args.duration, "pages": args.pages,
+                        "llm_latency": args.llm_latency, "background_generation": not args.no_background_generation,
+                        "background_generation_runs": generations[0]}
+    print_report(report)
+    if args.output:
+        args.output.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"[INFO] 结果已写入 {args.output}")
+
+
+if __name__ == "__main__":
+    main()
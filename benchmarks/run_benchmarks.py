@@ -0,0 +1,299 @@
+"""
+run_benchmarks.py
+-----------------
+
+解析 / 出题流水线 / 数据库 / 导出热点路径的基准测试：
+
+- 用 PyMuPDF 生成指定页数的中文样书（带目录书签一份、不带目录一份，章标题使用大号字体，
+  每页带页眉页脚），全部数据写在临时目录中的独立数据库里，不影响项目数据
+- 计时项目：
+  - parse_toc / parse_layout：parse_chapters_from_pdf（有目录 / 按版式识别章节）
+  - split_into_chapters：experiments/chapter_detector.py 对全书文本切分章节
+  - generate_quiz：generate_quiz_for_chapter（LLM 调用替换为本地桩，只计 prompt 构造与 JSON 解析）
+  - save_quiz_to_db：保存每章一份测验（含校验与查重）
+  - get_course_mistakes：全部题目加入错题本后读取错题列表
+  - export_quiz_to_word：导出全部题目为 Word（未安装 python-docx 时跳过）
+- 每项重复 --repeat 次，记录中位数 / 最小值，结果写入 JSON；
+  与基准文件（默认 benchmarks/baseline.json）比较，中位数变慢超过 --threshold 的项目标记为回退并以非零状态退出
+
+用法（在项目根目录运行）：
+    python benchmarks/run_benchmarks.py
+    python benchmarks/run_benchmarks.py --pages 400 --repeat 5 --output bench.json
+    python benchmarks/run_benchmarks.py --save-baseline   # 把本次结果保存为基准
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+import fitz  # noqa: E402  # PyMuPDF
+
+DEFAULT_BASELINE = REPO_ROOT / "benchmarks" / "baseline.json"
+
+_SENTENCES = [
+    "线性表是最常用且最简单的一种数据结构。",
+    "在顺序存储结构中，逻辑上相邻的数据元素在物理位置上也相邻。",
+    "插入和删除操作需要移动大量元素，其平均时间复杂度为 O(n)。",
+    "链表通过指针表示元素之间的逻辑关系，不要求存储空间连续。",
+    "栈是限定仅在表尾进行插入和删除操作的线性表。",
+    "二叉树的第 i 层上至多有 2 的 i-1 次方个结点。",
+    "图的遍历分为深度优先搜索和广度优先搜索两种方式。",
+    "哈希表通过散列函数把关键字映射到表中的位置。",
+]
+
+
+# === 样书 ===
+
+def build_book(path: Path, pages: int, chapters: int, with_toc: bool, seed: int = 0) -> None:
+    rng = random.Random(seed)
+    doc = fitz.open()
+    toc = []
+    pages_per_chapter = max(pages // chapters, 1)
+    for page_no in range(1, pages + 1):
+        page = doc.new_page()
+        chapter, offset = divmod(page_no - 1, pages_per_chapter)
+        chapter += 1
+        page.insert_text((72, 40), f"第{chapter}章 数据结构" if page_no % 2 else "数据结构（C语言版）",
+                         fontname="china-s", fontsize=9)
+        top = 60
+        if offset == 0:
+            title = f"第{chapter}章 数据结构基础 {chapter}"
+            page.insert_text((72, 90), title, fontname="china-s", fontsize=20)
+            toc.append([1, title, page_no])
+            top = 110
+        if offset == pages_per_chapter // 2:
+            toc.append([2, f"{chapter}.1 基本概念", page_no])
+        body = "\n".join("".join(rng.choice(_SENTENCES) for _ in range(rng.randint(3, 8))) for _ in range(6))
+        page.insert_textbox(fitz.Rect(72, top, 523, 780), body, fontname="china-s", fontsize=10)
+        page.insert_text((290, 810), f"- {page_no} -", fontname="helv", fontsize=9)
+    if with_toc:
+        doc.set_toc(toc)
+    doc.save(str(path))
+    doc.close()
+
+
+# === LLM 桩 ===
+
+class StubLLM:
+    """替换 services._chat_completion：按请求的题型数量返回题干互不相同的测验 JSON"""
+
+    def __init__(self, questions_per_type: int):
+        self.questions_per_type = questions_per_type
+        self.counter = 0
+
+    def __call__(self, prompt: str, purpose: str = "chat", **kwargs) -> str:
+        quiz: Dict[str, Any] = {"quiz_title": "基准测验", "quiz_description": "stub"}
+        n = self.questions_per_type
+        quiz["multiple_choice"] = [
+            {"question": self._stem("单选"), "options": ["A. 甲", "B. 乙", "C. 丙", "D. 丁"], "answer": "A",
+             "explanation": "解析"} for _ in range(n)
+        ]
+        quiz["true_false"] = [{"question": self._stem("判断"), "answer": "True", "explanation": "解析"} for _ in range(n)]
+        quiz["fill_in_blank"] = [{"question": self._stem("填空"), "answer": "栈", "explanation": "解析"} for _ in range(n)]
+        quiz["short_answer"] = [
+            {"question": self._stem("简答"), "answer": "参考答案", "keywords": ["线性表", "指针"], "explanation": "解析"}
+            for _ in range(n)
+        ]
+        return json.dumps(quiz, ensure_ascii=False)
+
+    def _stem(self, kind: str) -> str:
+        self.counter += 1
+        return f"{kind}题 {self.counter}：{_SENTENCES[self.counter % len(_SENTENCES)]}第 {self.counter * 7919} 号问题是什么？"
+
+
+# === 计时 ===
+
+def record(name: str, timings: List[float], results: Dict[str, Any]) -> None:
+    results[name] = {
+        "median_ms": round(statistics.median(timings), 3),
+        "min_ms": round(min(timings), 3),
+        "runs": [round(t, 3) for t in timings],
+    }
+    print(f"{name:<22} median {results[name]['median_ms']:>10.1f} ms   min {results[name]['min_ms']:>10.1f} ms")
+
+
+def measure(name: str, func: Callable[[], Any], repeat: int, results: Dict[str, Any]) -> Any:
+    timings: List[float] = []
+    value = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        value = func()
+        timings.append((time.perf_counter() - started) * 1000)
+    record(name, timings, results)
+    return value
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    regressions = []
+    print(f"\n与基准比较（阈值 +{threshold:.0%}）：")
+    for name, current in results.items():
+        base = baseline.get("results", {}).get(name)
+        if not base:
+            print(f"{name:<22} 基准中没有该项")
+            continue
+        ratio = current["median_ms"] / max(base["median_ms"], 1e-9)
+        flag = ""
+        if ratio > 1 + threshold:
+            flag = "  <-- 回退"
+            regressions.append(name)
+        print(f"{name:<22} {base['median_ms']:>10.1f} -> {current['median_ms']:>10.1f} ms ({ratio:.2f}x){flag}")
+    return regressions
+
+
+# === 基准项目 ===
+
+def run_suite(args, workdir: Path) -> Dict[str, Any]:
+    # 数据库文件 ai_learning.db 相对于当前目录，先切到临时目录再导入后端模块
+    os.chdir(workdir)
+    from sqlmodel import Session, select
+
+    from backend import json_codec, services
+    from backend.database import create_db_and_tables, engine
+    from backend.models import Chapter, Course, MistakeRecord, Question, Quiz
+    from backend.quiz_cache import get_chapter_quiz_payload
+    from experiments.chapter_detector import split_into_chapters
+
+    create_db_and_tables()
+    toc_pdf, layout_pdf = workdir / "book_toc.pdf", workdir / "book_layout.pdf"
+    build_book(toc_pdf, args.pages, args.chapters, with_toc=True)
+    build_book(layout_pdf, args.pages, args.chapters, with_toc=False)
+
+    results: Dict[str, Any] = {}
+    chapters_data = measure("parse_toc", lambda: services.parse_chapters_from_pdf(str(toc_pdf)), args.repeat, results)
+    measure("parse_layout", lambda: services.parse_chapters_from_pdf(str(layout_pdf)), args.repeat, results)
+    full_text = services.extract_text_from_pdf(str(layout_pdf))
+    measure("split_into_chapters", lambda: split_into_chapters(full_text), args.repeat, results)
+
+    with Session(engine) as session:
+        course = Course(title="基准课程", description="benchmark")
+        session.add(course)
+        session.commit()
+        chapters = []
+        for ch_data in chapters_data:
+            chapters.append(services.save_chapter(session, course.id, ch_data))
+        session.commit()
+        course_id, chapter_ids = course.id, [chapter.id for chapter in chapters]
+        chapter_texts = [(chapter.content_text, chapter.title) for chapter in chapters]
+
+    # LLM 调用替换为本地桩，API Key 只需通过格式检查
+    services._chat_completion = StubLLM(args.questions)
+    os.environ["DEEPSEEK_API_KEY"] = "sk-benchmark"
+    measure(
+        "generate_quiz",
+        lambda: [services.generate_quiz_for_chapter(text, title) for text, title in chapter_texts],
+        args.repeat, results,
+    )
+
+    def save_all():
+        # 每轮重新生成题干，避免被查重跳过
+        fresh = [services.generate_quiz_for_chapter(text, title) for text, title in chapter_texts]
+        with Session(engine) as session:
+            started = time.perf_counter()
+            for chapter_id, quiz_data in zip(chapter_ids, fresh):
+                services.save_quiz_to_db(session, chapter_id, quiz_data)
+            return time.perf_counter() - started
+
+    # 题干生成不计入保存耗时：只记录每轮的保存时间
+    record("save_quiz_to_db", [save_all() * 1000 for _ in range(args.repeat)], results)
+
+    with Session(engine) as session:
+        question_ids = session.exec(
+            select(Question.id).join(Quiz, Quiz.id == Question.quiz_id)
+            .join(Chapter, Chapter.id == Quiz.chapter_id).where(Chapter.course_id == course_id)
+        ).all()
+        session.add_all(MistakeRecord(question_id=qid, course_id=course_id) for qid in question_ids)
+        session.commit()
+
+    # 错题本接口定义在 app.py 中，导入时会挂载前端目录，只在这里导入
+    from backend.app import get_course_mistakes
+
+    def load_mistakes():
+        with Session(engine) as session:
+            return get_course_mistakes(course_id, session)
+
+    mistakes = measure("get_course_mistakes", load_mistakes, args.repeat, results)
+    print(f"{'':<22} ({len(mistakes)} 道错题)")
+
+    if importlib.util.find_spec("docx") is None:
+        print("[WARN] 未安装 python-docx，跳过 export_quiz_to_word")
+    else:
+        # 与导出接口相同，题目数据取自章节测验缓存
+        with Session(engine) as session:
+            questions = [
+                q for chapter_id in chapter_ids
+                for quiz in json_codec.loads(get_chapter_quiz_payload(session, chapter_id)[1])
+                for q in quiz["questions"]
+            ]
+        export_data = {"title": "基准导出", "description": f"共 {len(questions)} 道题", "questions": questions}
+        measure("export_quiz_to_word",
+                lambda: services.export_quiz_to_word(export_data, str(workdir / "export.docx")),
+                args.repeat, results)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="解析 / 出题流水线 / 数据库 / 导出的基准测试")
+    parser.add_argument("--pages", type=int, default=200, help="样书页数（默认 200）")
+    parser.add_argument("--chapters", type=int, default=10, help="样书章数（默认 10）")
+    parser.add_argument("--questions", type=int, default=5, help="桩 LLM 每种题型返回的题数（默认 5）")
+    parser.add_argument("--repeat", type=int, default=3, help="每项重复次数（默认 3）")
+    parser.add_argument("--output", type=Path, help="结果 JSON 路径（默认只打印）")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE, help="基准 JSON 路径")
+    parser.add_argument("--threshold", type=float, default=0.2, help="中位数变慢超过该比例视为回退（默认 0.2）")
+    parser.add_argument("--save-baseline", action="store_true", help="把本次结果保存为基准")
+    args = parser.parse_args()
+    output = args.output.resolve() if args.output else None
+    baseline_path = args.baseline.resolve()
+
+    with tempfile.TemporaryDirectory(prefix="ai-learning-bench-") as tmp:
+        cwd = os.getcwd()
+        try:
+            results = run_suite(args, Path(tmp))
+        finally:
+            os.chdir(cwd)
+            from backend.database import engine
+            engine.dispose()
+
+    report = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "fitz": fitz.VersionBind,
+        "params": {"pages": args.pages, "chapters": args.chapters, "questions": args.questions,
+                   "repeat": args.repeat},
+        "results": results,
+    }
+    if output:
+        output.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"\n[INFO] 结果已写入 {output}")
+    if args.save_baseline:
+        baseline_path.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"[INFO] 基准已保存到 {baseline_path}")
+        return
+
+    if baseline_path.exists():
+        baseline = json.loads(baseline_path.read_text(encoding="utf-8"))
+        if baseline.get("params") != report["params"]:
+            print(f"[WARN] 基准参数 {baseline.get('params')} 与本次不同，比较结果仅供参考")
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+    else:
+        print(f"\n[INFO] 没有基准文件 {baseline_path}，可用 --save-baseline 保存本次结果")
+
+
+if __name__ == "__main__":
+    main()
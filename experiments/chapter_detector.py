@@ -20,28 +20,30 @@ MIN_SEGMENT_LENGTH = 200
 
 @dataclass
 class HeadingPattern:
-    pattern: Pattern[str]
+    # 行首（去掉缩进后）的匹配规则，不含 ^；空白一律写作 [^\S\n]，避免跨行
+    regex: str
     weight: float
 
 
 HEADING_PATTERNS: List[HeadingPattern] = [
-    HeadingPattern(
-        re.compile(r"^第\s*[一二三四五六七八九十百零\d]+\s*(章|节|篇|部分|卷)\b.*"), 3.0
-    ),
-    HeadingPattern(
-        re.compile(r"^[一二三四五六七八九十百零]+\s*[、.]\s*.+"), 2.0
-    ),
-    HeadingPattern(
-        re.compile(r"^\d+(\.\d+){0,2}\s+.+"), 2.5
-    ),
-    HeadingPattern(
-        re.compile(r"^(Chapter|CHAPTER|Part|PART|Section|SECTION)\s+[0-9IVXLC]+\b.*"), 3.0
-    ),
-    HeadingPattern(
-        re.compile(r"^[A-Z][A-Za-z]+\s+\d+(\.\d+)?\b.*"), 1.5
-    ),
+    HeadingPattern(r"第[^\S\n]*[一二三四五六七八九十百零\d]+[^\S\n]*(?:章|节|篇|部分|卷)\b", 3.0),
+    HeadingPattern(r"[一二三四五六七八九十百零]+[^\S\n]*[、.][^\S\n]*\S", 2.0),
+    HeadingPattern(r"\d+(?:\.\d+){0,2}[^\S\n]+\S", 2.5),
+    HeadingPattern(r"(?:Chapter|CHAPTER|Part|PART|Section|SECTION)[^\S\n]+[0-9IVXLC]+\b", 3.0),
+    HeadingPattern(r"[A-Z][A-Za-z]+[^\S\n]+\d+(?:\.\d+)?\b", 1.5),
 ]
 
+# 所有规则合并为一个多行模式：整篇文本只扫描一次，按 HEADING_PATTERNS 的顺序取第一个命中的分支，
+# 命中分支的组名 h<序号> 对应规则下标
+HEADING_REGEX: Pattern[str] = re.compile(
+    r"^[^\S\n]*(?:" + "|".join(f"(?P<h{i}>{p.regex})" for i, p in enumerate(HEADING_PATTERNS)) + ")",
+    re.MULTILINE,
+)
+
+MAX_HEADING_LENGTH = 160
+# 与上一个候选标题的最小间距（字符），过近的视为同一标题区域
+MIN_HEADING_GAP = 120
+
 
 def split_into_chapters(full_text: str) -> List[Dict]:
     """
@@ -94,38 +96,23 @@ def split_into_chapters(full_text: str) -> List[Dict]:
 
 
 def _collect_heading_candidates(full_text: str) -> List[Dict]:
-    lines = full_text.splitlines()
+    """按行首匹配标题，start 为标题所在行在全文中的偏移"""
     candidates: List[Dict] = []
-    cursor = 0
 
-    for line in lines:
-        stripped = line.strip()
-        line_length = len(line)
-        if not stripped or len(stripped) > 160:
-            cursor += line_length + 1
+    for match in HEADING_REGEX.finditer(full_text):
+        start = match.start()
+        if candidates and start - candidates[-1]["start"] < MIN_HEADING_GAP:
             continue
-
-        matched = _match_heading(stripped)
-        if matched:
-            title = stripped
-            score = matched.weight
-            if candidates and cursor - candidates[-1]["start"] < 120:
-                cursor += line_length + 1
-                continue
-            candidates.append({"start": cursor, "title": title, "score": score})
-
-        cursor += line_length + 1
+        line_end = full_text.find("\n", start)
+        title = full_text[start:line_end if line_end != -1 else len(full_text)].strip()
+        if len(title) > MAX_HEADING_LENGTH:
+            continue
+        weight = HEADING_PATTERNS[int(match.lastgroup[1:])].weight
+        candidates.append({"start": start, "title": title, "score": weight})
 
     return candidates
 
 
-def _match_heading(line: str):
-    for heading in HEADING_PATTERNS:
-        if heading.pattern.match(line):
-            return heading
-    return None
-
-
 if __name__ == "__main__":  # 简单测试
     sample = """第1章 绪论
 内容A
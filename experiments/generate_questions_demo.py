@@ -14,11 +14,20 @@ import argparse
 import json
 import os
 import re
+import sys
 from pathlib import Path
 from typing import Any, Dict, List, Optional
 
 import requests
 
+# 复用后端的 JSON 容错解析与题干近似去重
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from backend.dedup import DedupIndex, fingerprint  # noqa: E402
+from backend.llm_json import parse_llm_json  # noqa: E402
+
 # 默认输入/输出路径（一般由 run_all.py 显式传入）
 DEFAULT_INPUT_PATH = Path("experiments/output/chapter_text.txt")
 DEFAULT_OUTPUT_PATH = Path("experiments/output/chapter_questions.json")
@@ -61,6 +70,7 @@ def filter_questions(payload: Dict[str, Any]) -> Dict[str, Any]:
     """
     对模型返回的题目做质量过滤：
     - 删除严重依赖编号（算法x.x / 例x.x / 图x.x / 表x.x）的题目
+    - 删除题干与前面题目近似重复的题目（MinHash/LSH，见 backend/dedup.py）
 
     若过滤后数量不足 MIN_QUESTIONS_PER_TYPE，仅给出警告，不会自动补题。
     """
@@ -79,6 +89,27 @@ def filter_questions(payload: Dict[str, Any]) -> Dict[str, Any]:
             "（含算法/例/图/表编号）。"
         )
 
+    # 近似重复检测在两种题型间共用一个索引
+    index = DedupIndex()
+    position = 0
+    duplicates = 0
+
+    def is_new(q: Dict[str, Any]) -> bool:
+        nonlocal position, duplicates
+        options = q.get("options")
+        fp = fingerprint(str(q.get("question", "")), options if isinstance(options, list) else None)
+        if index.find_duplicate(fp):
+            duplicates += 1
+            return False
+        index.add(position, fp)
+        position += 1
+        return True
+
+    filtered_mc = [q for q in filtered_mc if is_new(q)]
+    filtered_fb = [q for q in filtered_fb if is_new(q)]
+    if duplicates:
+        print(f"[filter] 移除了 {duplicates} 道题干近似重复的题目。")
+
     payload["multiple_choice"] = filtered_mc
     payload["fill_in_blank"] = filtered_fb
 
@@ -232,18 +263,17 @@ def parse_questions_json(raw_content: str) -> Dict[str, Any]:
     """
     解析模型输出的 JSON，并做一层质量过滤（去掉编号题）。
     """
-    text = raw_content.strip()
-    # 兼容模型偶尔返回 ```json ... ``` 的情况
-    if text.startswith("```"):
-        text = text.strip("`")
-        text = text.replace("json\n", "").replace("JSON\n", "")
-
+    # 兼容 ```json ... ``` 代码块、多余逗号与输出截断（截断时保留所有完整的题目）
     try:
-        data = json.loads(text)
-    except json.JSONDecodeError as e:
+        data, report = parse_llm_json(raw_content)
+    except ValueError as e:
         raise ValueError(
-            f"解析 JSON 失败，请手动检查模型输出。\n错误：{e}\n原始内容：\n{text}"
+            f"解析 JSON 失败，请手动检查模型输出。\n错误：{e}\n原始内容：\n{raw_content}"
         ) from e
+    if report.repaired:
+        print(f"警告：模型输出的 JSON 已自动修复（{report.summary()}）。")
+    if not isinstance(data, dict):
+        raise ValueError(f"解析 JSON 失败：顶层不是对象。\n原始内容：\n{raw_content}")
 
     if "meta" not in data:
         print("警告：JSON 中缺少 meta 字段。")
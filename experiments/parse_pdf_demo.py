@@ -7,7 +7,7 @@ parse_pdf_demo.py
 - 支持命令行参数
 - 支持多处“第X章”标题出现（例如总目录 + 正文）
 - 自动选择最长的章节区段作为正文，避免误抓目录页
-- 对提取的文本做轻量清洗：去掉页码 / 竖排装饰文字、合并断行
+- 对提取的文本做轻量清洗：去掉页眉页脚 / 页码、合并断行（见 backend/text_clean.py）
 """
 
 import argparse
@@ -18,6 +18,12 @@ from typing import Dict, List, Optional, Tuple
 
 import fitz  # PyMuPDF
 
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from backend.text_clean import clean_pages  # noqa: E402
+
 try:
     from .extract_text import extract_text_from_file
     from .chapter_detector import split_into_chapters
@@ -31,7 +37,6 @@ except ImportError:  # pragma: no cover - 兼容直接运行脚本
 # -------------------------
 PDF_FILENAME = "数据结构（C语言版）（第3版）双色版 (李冬梅,严蔚敏,吴伟民) (Z-Library).pdf"
 PDF_PATH = Path(f"/mnt/data/{PDF_FILENAME}")
-REPO_ROOT = Path(__file__).resolve().parents[1]
 
 DEFAULT_PDF_CANDIDATES: List[Path] = [
     PDF_PATH,
@@ -156,17 +161,36 @@ def parse_chapter_no(chapter_arg: str) -> int:
     return chapter_id
 
 
+def load_toc_tree(doc: "fitz.Document") -> List[Dict]:
+    """
+    读取完整的 PDF TOC 层级。
+    返回顶层条目列表，每个条目为 {"level", "title", "page", "end_page", "children"}：
+    page 为 1-based 起始页；end_page 为下一个同级或更高级条目的起始页（不包含），最后的条目到文档末尾。
+    """
+    toc = doc.get_toc(simple=True) or []
+    roots: List[Dict] = []
+    stack: List[Dict] = []
+    for level, title, page in toc:
+        title = (title or "").strip()
+        page_num = max(1, int(page) if isinstance(page, int) else 1)
+        node = {"level": level, "title": title, "page": page_num, "end_page": doc.page_count + 1, "children": []}
+        while stack and stack[-1]["level"] >= level:
+            stack.pop()["end_page"] = page_num
+        (stack[-1]["children"] if stack else roots).append(node)
+        stack.append(node)
+    return roots
+
+
 def load_toc_chapters(doc: "fitz.Document") -> List[Dict]:
     """
-    读取 PDF TOC，只保留顶层“第X章 …”的条目。
+    读取 PDF TOC，只保留顶层“第X章 …”的条目（下级目录保存在 node["children"] 中）。
     返回的 page 字段为 1-based 页码（与 PyMuPDF TOC 一致）。
     """
-    toc = doc.get_toc(simple=True) or []
     chapters: List[Dict] = []
-    for level, title, page in toc:
-        if level != 1:
+    for node in load_toc_tree(doc):
+        if node["level"] != 1:
             continue
-        title = (title or "").strip()
+        title = node["title"]
         if not title:
             continue
         if not CHAPTER_PATTERN.search(title):
@@ -174,19 +198,38 @@ def load_toc_chapters(doc: "fitz.Document") -> List[Dict]:
         chapter_no = _parse_chapter_id(title)
         if chapter_no is None:
             continue
-        page_num = int(page) if isinstance(page, int) else 1
-        page_num = max(1, page_num)
         chapters.append(
             {
                 "chapter_no": chapter_no,
                 "title": title,
-                "page": page_num,
+                "page": node["page"],
+                "node": node,
             }
         )
     chapters.sort(key=lambda item: item["page"])
     return chapters
 
 
+def find_section(node: Dict, section_arg: str) -> Optional[Dict]:
+    """在章节的下级目录中按先序查找标题包含 section_arg 的条目（忽略空白），如“2.3”或“顺序表”。"""
+    target = re.sub(r"\s+", "", section_arg)
+    for child in node["children"]:
+        if target in re.sub(r"\s+", "", child["title"]):
+            return child
+        found = find_section(child, section_arg)
+        if found:
+            return found
+    return None
+
+
+def format_toc_outline(node: Dict, indent: int = 0) -> List[str]:
+    lines: List[str] = []
+    for child in node["children"]:
+        lines.append(f"{'  ' * indent}- {child['title']}（p.{child['page']}）")
+        lines.extend(format_toc_outline(child, indent + 1))
+    return lines
+
+
 def find_chapter_by_no(
     toc_chapters: List[Dict], chapter_no: int
 ) -> Tuple[Dict, Optional[Dict]]:
@@ -201,7 +244,7 @@ def find_chapter_by_no(
 
 def extract_pages_text(doc: "fitz.Document", start_page: int, end_page: int) -> str:
     """
-    根据页码范围抽取正文。
+    根据页码范围抽取正文并清洗（backend/text_clean.py）。
     start_page / end_page 均为 0-based，end_page 不包含在内。
     """
     if start_page < 0:
@@ -213,11 +256,12 @@ def extract_pages_text(doc: "fitz.Document", start_page: int, end_page: int) ->
     for page_index in range(start_page, end_page):
         page = doc.load_page(page_index)
         texts.append(page.get_text("text"))
-    return "\n".join(texts).strip()
+    # 去掉页眉页脚、页码并合并断行
+    return "\n".join(clean_pages(texts)).strip()
 
 
-def extract_chapter_by_toc(doc: "fitz.Document", chapter_arg: str) -> Dict:
-    """优先使用 TOC 精准定位章节。"""
+def extract_chapter_by_toc(doc: "fitz.Document", chapter_arg: str, section_arg: Optional[str] = None) -> Dict:
+    """优先使用 TOC 精准定位章节；指定 section_arg 时只抽取该小节所在的页。"""
     toc_chapters = load_toc_chapters(doc)
     if not toc_chapters:
         raise ValueError("TOC 为空或未包含章节信息。")
@@ -232,15 +276,24 @@ def extract_chapter_by_toc(doc: "fitz.Document", chapter_arg: str) -> Dict:
     # 确保 end_page 大于 start_page
     if end_page <= start_page:
         end_page = start_page + 1
+    title = current["title"]
+    if section_arg:
+        section = find_section(current["node"], section_arg)
+        if section is None:
+            raise ValueError(f"TOC 中第 {chapter_no} 章下未找到小节：{section_arg}")
+        title = section["title"]
+        start_page = section["page"] - 1
+        end_page = max(section["end_page"] - 1, start_page + 1)
     text = extract_pages_text(doc, start_page, end_page)
     if not text.strip():
-        raise ValueError(f"TOC 模式未提取到章节正文：{current['title']}")
+        raise ValueError(f"TOC 模式未提取到章节正文：{title}")
     return {
         "text": text,
-        "title": current["title"],
+        "title": title,
         "chapter_no": chapter_no,
         "start_page": start_page,
         "end_page": end_page,
+        "outline": format_toc_outline(current["node"]),
     }
 
 
@@ -304,6 +357,11 @@ def main() -> None:
         required=True,
         help="目标章节，例如：第2章 / 第 2 章 / 第二章",
     )
+    parser.add_argument(
+        "--section",
+        default=None,
+        help="只输出章节内的某个小节（TOC 模式），例如：2.3 / 顺序表",
+    )
     parser.add_argument(
         "--output",
         default="experiments/output/chapter_2.txt",
@@ -337,7 +395,7 @@ def main() -> None:
     toc_result: Optional[Dict] = None
     with fitz.open(pdf_path) as doc:
         try:
-            toc_result = extract_chapter_by_toc(doc, args.chapter)
+            toc_result = extract_chapter_by_toc(doc, args.chapter, args.section)
         except Exception as exc:
             print(f"章节识别：TOC 模式失败（{exc}）。将尝试兜底方案。")
 
@@ -348,6 +406,9 @@ def main() -> None:
         print(
             f"已匹配章节：{toc_result['title']}（chapter_no={toc_result['chapter_no']}, pages={start_display}~{end_display}）。"
         )
+        if toc_result["outline"]:
+            print("章节目录：")
+            print("\n".join(toc_result["outline"]))
         save_output(toc_result["text"], output_path)
         return
 
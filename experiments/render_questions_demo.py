@@ -9,6 +9,7 @@ render_questions_demo.py
 """
 
 import argparse
+import hashlib
 import json
 from pathlib import Path
 from typing import Dict, List, Any, Optional
@@ -21,6 +22,14 @@ REPO_ROOT = Path(__file__).resolve().parents[1]
 FRONTEND_ROOT = REPO_ROOT / "frontend"
 MANIFEST_PATH = FRONTEND_ROOT / "public" / "questions" / "manifest.json"
 
+# 写入 manifest 的内容哈希长度（与后端 /questions 的 ETag 前缀一致，可作为 ?v= 版本号）
+CONTENT_HASH_LENGTH = 12
+
+
+def content_hash(data: bytes) -> str:
+    """文件内容哈希（blake2b-128 的前缀），与后端 static_files.file_content_hash 算法一致。"""
+    return hashlib.blake2b(data, digest_size=16).hexdigest()[:CONTENT_HASH_LENGTH]
+
 
 def load_questions(path: Path) -> Dict[str, Any]:
     """
@@ -173,6 +182,7 @@ def update_manifest(
     json_filename: str,
     chapter_desc: Optional[str] = None,
     course_source_file: Optional[str] = None,
+    json_file: Optional[Path] = None,
 ) -> None:
     if manifest_path.exists():
         manifest_data = json.loads(manifest_path.read_text(encoding="utf-8"))
@@ -222,6 +232,11 @@ def update_manifest(
         "jsonFile": json_filename,
         "description": chapter_desc or "",
     }
+    # 内容哈希：前端可用 ?v=<hash> 请求题库文件，命中后走长期缓存
+    if markdown_file.exists():
+        chapter_entry["fileHash"] = content_hash(markdown_file.read_bytes())
+    if json_file is not None and json_file.exists():
+        chapter_entry["jsonHash"] = content_hash(json_file.read_bytes())
 
     existing_idx = next(
         (idx for idx, ch in enumerate(chapters) if ch.get("id") == chapter_id), None
@@ -236,6 +251,12 @@ def update_manifest(
     chapters.sort(key=lambda x: x.get("id", 0))
     courses.sort(key=lambda x: x.get("name", ""))
 
+    # manifest 版本号：课程/章节内容任一变化都会改变，客户端据此判断是否需要重新拉取
+    manifest_data.pop("version", None)
+    manifest_data["version"] = content_hash(
+        json.dumps(manifest_data, ensure_ascii=False, sort_keys=True).encode("utf-8")
+    )
+
     manifest_path.parent.mkdir(parents=True, exist_ok=True)
     manifest_path.write_text(
         json.dumps(manifest_data, ensure_ascii=False, indent=2),
@@ -350,6 +371,7 @@ def main() -> None:
             markdown_file=output_path,
             json_filename=json_filename,
             chapter_desc=quiz_description,
+            json_file=input_path,
         )
     else:
         print(markdown)
@@ -5,6 +5,7 @@
 此脚本也是 PyInstaller 打包的入口文件。
 """
 
+import multiprocessing
 import threading
 import time
 import webbrowser
@@ -21,9 +22,11 @@ except ImportError:
     sys.exit(1)
 
 
-def open_browser_delayed():
-    """延迟打开浏览器，等待服务启动"""
-    time.sleep(2)
+def open_browser_delayed(build_thread: threading.Thread):
+    """等待前端构建完成、服务启动后再打开浏览器（首次运行需要先构建，否则打开的是"前端尚未构建"页面）"""
+    started = time.monotonic()
+    build_thread.join()
+    time.sleep(max(0.0, 2 - (time.monotonic() - started)))
     try:
         webbrowser.open("http://127.0.0.1:8000")
     except Exception as e:
@@ -131,8 +134,10 @@ def main() -> None:
     # 确保工作目录正确（影响 backend 模块的导入）
     os.chdir(root)
     
-    # 检查并自动构建前端
-    check_and_build_frontend(root)
+    # 检查并自动构建前端：放到后台线程，不阻塞后端启动（静态目录挂载时不检查目录，构建完成后即可访问）；
+    # 不设为守护线程，服务提前退出时等构建完成，避免留下半成品的 dist 目录
+    build_thread = threading.Thread(target=check_and_build_frontend, args=(root,), name="frontend-build")
+    build_thread.start()
     
     print("=" * 50)
     print("AI 学习助手 - 启动服务")
@@ -143,8 +148,8 @@ def main() -> None:
     print("=" * 50)
     print()
     
-    # 在后台线程中延迟打开浏览器
-    browser_thread = threading.Thread(target=open_browser_delayed, daemon=True)
+    # 在后台线程中等待前端构建完成后打开浏览器
+    browser_thread = threading.Thread(target=open_browser_delayed, args=(build_thread,), daemon=True)
     browser_thread.start()
     
     try:
@@ -169,4 +174,6 @@ def main() -> None:
 
 
 if __name__ == "__main__":
+    # 无目录 PDF 的版式扫描会使用进程池，打包成 exe 后子进程需要由此接管
+    multiprocessing.freeze_support()
     main()
\ No newline at end of file
@@ -0,0 +1,77 @@
+"""
+dedup_questions.py
+------------------
+
+批量检测已有数据库中的近似重复题目（MinHash/LSH，见 backend/dedup.py）：
+- 按课程检测，每组重复题保留 id 最小（最早生成）的一道
+- 默认只打印报告；--flag 写入 duplicate_of 标记；--apply 删除重复题及其错题记录
+
+用法（在项目根目录运行，建议先停止后端服务，服务中的去重索引在重启后重建）：
+    python scripts/dedup_questions.py
+    python scripts/dedup_questions.py --course-id 3 --apply
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from sqlmodel import Session, delete, select, update  # noqa: E402
+
+from backend.database import create_db_and_tables, engine  # noqa: E402
+from backend.dedup import find_duplicate_groups  # noqa: E402
+from backend.models import Course, MistakeRecord, Question  # noqa: E402
+from backend.search import remove_questions  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="检测并清理近似重复的题目")
+    parser.add_argument("--course-id", type=int, help="只处理指定课程（默认处理全部课程）")
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--apply", action="store_true", help="删除重复题目及其错题记录")
+    group.add_argument("--flag", action="store_true", help="仅在 duplicate_of 字段中标记重复题目")
+    args = parser.parse_args()
+
+    create_db_and_tables()
+    with Session(engine) as session:
+        statement = select(Course.id, Course.title).order_by(Course.id)
+        if args.course_id is not None:
+            statement = statement.where(Course.id == args.course_id)
+        courses = session.exec(statement).all()
+
+        total = 0
+        for course_id, title in courses:
+            duplicates = find_duplicate_groups(session, course_id)
+            if not duplicates:
+                continue
+            total += len(duplicates)
+            print(f"课程 {course_id}《{title}》：发现 {len(duplicates)} 道近似重复题目")
+            for question_id, original_id, similarity in duplicates:
+                print(f"  - 题目 {question_id} ≈ 题目 {original_id}（相似度 {similarity:.2f}）")
+
+            duplicate_ids = [question_id for question_id, _, _ in duplicates]
+            if args.apply:
+                session.exec(delete(MistakeRecord).where(MistakeRecord.question_id.in_(duplicate_ids)))
+                session.exec(delete(Question).where(Question.id.in_(duplicate_ids)))
+                # 批量删除绕过了 ORM 事件，需要手动同步全文索引
+                remove_questions(session.connection(), duplicate_ids)
+            elif args.flag:
+                for question_id, original_id, _ in duplicates:
+                    session.exec(update(Question).where(Question.id == question_id).values(duplicate_of=original_id))
+            session.commit()
+
+        if not total:
+            print("未发现近似重复的题目。")
+        elif args.apply:
+            print(f"已删除 {total} 道重复题目。")
+        elif args.flag:
+            print(f"已标记 {total} 道重复题目。")
+        else:
+            print(f"共 {total} 道重复题目；使用 --apply 删除或 --flag 标记。")
+
+
+if __name__ == "__main__":
+    main()
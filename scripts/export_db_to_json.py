@@ -1,73 +1,223 @@
-import sqlite3
+"""
+export_db_to_json.py
+--------------------
+
+流式导出数据库（课程 -> 章节 -> 小节 / 测验 -> 题目）：
+- 每一层只执行一次按相同键排序的联表查询，四个游标同步推进（归并），
+  逐行写出，内存占用与数据库大小无关
+- --format json：嵌套 JSON（与旧版结构一致，章节下新增 sections 数组），边读边写
+- --format ndjson：每行一条记录，record 字段为 course / chapter / section / quiz / question，
+  按 课程、章节、小节、测验、题目 的先序顺序输出，便于逐行处理，可直接用于 import_questions.py 导入；
+  小节按目录顺序输出（上级在前），测验的 section_id 指向所属小节
+- --course-id 只导出指定课程（可重复），--gzip 输出 .gz 压缩文件
+
+用法：
+    python scripts/export_db_to_json.py
+    python scripts/export_db_to_json.py --format ndjson --course-id 3 --gzip
+"""
+
+import argparse
+import gzip
 import json
 import os
+import sqlite3
+from typing import Callable, Iterator, List, Optional, Tuple
 
 # Database path
 DB_PATH = "ai_learning.db"
-OUTPUT_FILE = "data/debug_db_dump.json"
+OUTPUT_DIR = "data"
+OUTPUT_BASENAME = "debug_db_dump"
+
+# 每层的排序键都以上层的排序键为前缀，游标才能同步推进
+_COURSE_ORDER = "course.id"
+_CHAPTER_ORDER = f'{_COURSE_ORDER}, chapter."index", chapter.id'
+_SECTION_ORDER = f'{_CHAPTER_ORDER}, section."index", section.id'
+_QUIZ_ORDER = f"{_CHAPTER_ORDER}, quiz.id"
+_QUESTION_ORDER = f"{_QUIZ_ORDER}, question.id"
+
+
+class _Stream:
+    """按排序键逐组取出子记录的游标包装"""
+
+    def __init__(self, cursor: sqlite3.Cursor, key: Callable[[sqlite3.Row], Tuple]):
+        self._rows = iter(cursor)
+        self._key = key
+        self._next = next(self._rows, None)
+
+    def take(self, parent_key: Tuple) -> Iterator[sqlite3.Row]:
+        while self._next is not None and self._key(self._next) == parent_key:
+            row = self._next
+            self._next = next(self._rows, None)
+            yield row
+
+
+def _query(conn: sqlite3.Connection, sql: str, course_ids: Optional[List[int]]) -> sqlite3.Cursor:
+    params: List[int] = []
+    if course_ids:
+        sql = sql.replace("{where}", f"WHERE course.id IN ({', '.join('?' for _ in course_ids)})")
+        params = list(course_ids)
+    else:
+        sql = sql.replace("{where}", "")
+    return conn.execute(sql, params)
+
+
+def iter_records(conn: sqlite3.Connection, course_ids: Optional[List[int]] = None) -> Iterator[Tuple[str, Optional[dict]]]:
+    """
+    先序遍历整棵树，依次产出 (record, 行数据)；每个节点的子节点输出完毕后产出 ("end", None)
+    """
+    courses = _query(conn, f"SELECT course.* FROM course {{where}} ORDER BY {_COURSE_ORDER}", course_ids)
+    chapters = _Stream(
+        _query(conn, f"""
+            SELECT chapter.* FROM chapter JOIN course ON chapter.course_id = course.id
+            {{where}} ORDER BY {_CHAPTER_ORDER}
+        """, course_ids),
+        key=lambda row: (row["course_id"],),
+    )
+    sections = _Stream(
+        _query(conn, f"""
+            SELECT section.*, chapter.course_id AS _course_id FROM section
+            JOIN chapter ON section.chapter_id = chapter.id JOIN course ON chapter.course_id = course.id
+            {{where}} ORDER BY {_SECTION_ORDER}
+        """, course_ids),
+        key=lambda row: (row["_course_id"], row["chapter_id"]),
+    )
+    quizzes = _Stream(
+        _query(conn, f"""
+            SELECT quiz.*, chapter.course_id AS _course_id FROM quiz
+            JOIN chapter ON quiz.chapter_id = chapter.id JOIN course ON chapter.course_id = course.id
+            {{where}} ORDER BY {_QUIZ_ORDER}
+        """, course_ids),
+        key=lambda row: (row["_course_id"], row["chapter_id"]),
+    )
+    questions = _Stream(
+        _query(conn, f"""
+            SELECT question.*, chapter.course_id AS _course_id, quiz.chapter_id AS _chapter_id FROM question
+            JOIN quiz ON question.quiz_id = quiz.id JOIN chapter ON quiz.chapter_id = chapter.id
+            JOIN course ON chapter.course_id = course.id
+            {{where}} ORDER BY {_QUESTION_ORDER}
+        """, course_ids),
+        key=lambda row: (row["_course_id"], row["_chapter_id"], row["quiz_id"]),
+    )
+
+    for course in courses:
+        yield "course", dict(course)
+        for chapter in chapters.take((course["id"],)):
+            # 每章的小节数量有限，随章节一起输出
+            chapter_record = dict(chapter)
+            chapter_record["sections"] = [_public(section) for section in sections.take((course["id"], chapter["id"]))]
+            yield "chapter", chapter_record
+            for quiz in quizzes.take((course["id"], chapter["id"])):
+                yield "quiz", _public(quiz)
+                for question in questions.take((course["id"], chapter["id"], quiz["id"])):
+                    yield "question", _question_record(question)
+                yield "end", None
+            yield "end", None
+        yield "end", None
+
+
+def _public(row: sqlite3.Row) -> dict:
+    """去掉联表时附带的排序辅助列"""
+    return {k: row[k] for k in row.keys() if not k.startswith("_")}
 
-def export_db_to_json():
+
+def _question_record(row: sqlite3.Row) -> dict:
+    question = _public(row)
+    # Parse options_json if it exists
+    if question.get("options_json"):
+        try:
+            question["options"] = json.loads(question["options_json"])
+        except json.JSONDecodeError:
+            question["options"] = question["options_json"]  # Keep as string if fail
+    return question
+
+
+def _dumps(value: dict) -> str:
+    return json.dumps(value, ensure_ascii=False)
+
+
+def write_ndjson(records: Iterator[Tuple[str, Optional[dict]]], f) -> int:
+    count = 0
+    for kind, row in records:
+        if kind == "end":
+            continue
+        lines = [{"record": kind, **row}]
+        if kind == "chapter":
+            # 小节拆成独立记录，紧跟在所属章节之后
+            lines = [{"record": kind, **{k: v for k, v in row.items() if k != "sections"}}]
+            lines += [{"record": "section", **section} for section in row["sections"]]
+        for line in lines:
+            f.write(_dumps(line))
+            f.write("\n")
+        count += len(lines)
+    return count
+
+
+_CHILD_KEYS = {"course": "chapters", "chapter": "quizzes", "quiz": "questions"}
+
+
+def write_nested_json(records: Iterator[Tuple[str, Optional[dict]]], f) -> int:
+    """把先序事件流写成嵌套 JSON 数组：父节点先写出自身字段并打开子数组，子节点结束后再闭合"""
+    count = 0
+    first = [True]
+    f.write("[")
+    for kind, row in records:
+        if kind == "end":
+            f.write("]}")
+            first.pop()
+            continue
+
+        f.write("\n" if first[-1] else ",\n")
+        first[-1] = False
+        count += 1
+        child_key = _CHILD_KEYS.get(kind)
+        if child_key is None:
+            f.write(_dumps(row))
+        else:
+            f.write(f'{_dumps(row)[:-1]}, "{child_key}": [')
+            first.append(True)
+    f.write("\n]\n")
+    return count
+
+
+def export_db_to_json(output_format: str = "json", course_ids: Optional[List[int]] = None,
+                      compress: bool = False, output: Optional[str] = None):
     if not os.path.exists(DB_PATH):
         print(f"Error: Database file '{DB_PATH}' not found.")
         return
 
+    if output is None:
+        output = os.path.join(OUTPUT_DIR, f"{OUTPUT_BASENAME}.{output_format}")
+        if compress:
+            output += ".gz"
+    parent = os.path.dirname(output)
+    if parent:
+        os.makedirs(parent, exist_ok=True)
+
     conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row # Access columns by name
-    cursor = conn.cursor()
+    conn.row_factory = sqlite3.Row  # Access columns by name
+    opener = gzip.open if compress else open
+    writer = write_ndjson if output_format == "ndjson" else write_nested_json
 
     try:
-        # 1. Fetch Courses
-        cursor.execute("SELECT * FROM course")
-        courses = [dict(row) for row in cursor.fetchall()]
-
-        for course in courses:
-            course_id = course["id"]
-            
-            # 2. Fetch Chapters for each Course
-            cursor.execute('SELECT * FROM chapter WHERE course_id = ? ORDER BY "index"', (course_id,))
-            chapters = [dict(row) for row in cursor.fetchall()]
-            
-            for chapter in chapters:
-                chapter_id = chapter["id"]
-                
-                # 3. Fetch Quizzes for each Chapter
-                cursor.execute("SELECT * FROM quiz WHERE chapter_id = ?", (chapter_id,))
-                quizzes = [dict(row) for row in cursor.fetchall()]
-                
-                for quiz in quizzes:
-                    quiz_id = quiz["id"]
-                    
-                    # 4. Fetch Questions for each Quiz
-                    cursor.execute("SELECT * FROM question WHERE quiz_id = ?", (quiz_id,))
-                    questions = [dict(row) for row in cursor.fetchall()]
-                    
-                    # Parse options_json if it exists
-                    for q in questions:
-                        if q.get("options_json"):
-                            try:
-                                q["options"] = json.loads(q["options_json"])
-                            except:
-                                q["options"] = q["options_json"] # Keep as string if fail
-                        # Remove raw json string to be cleaner
-                        # q.pop("options_json", None) 
-                    
-                    quiz["questions"] = questions
-                
-                chapter["quizzes"] = quizzes
-            
-            course["chapters"] = chapters
-
-        # Write to JSON file
-        with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
-            json.dump(courses, f, ensure_ascii=False, indent=2)
-
-        print(f"Successfully exported database to '{OUTPUT_FILE}'.")
-
+        with opener(output, "wt", encoding="utf-8") as f:
+            count = writer(iter_records(conn, course_ids), f)
+        print(f"Successfully exported {count} records to '{output}'.")
     except sqlite3.Error as e:
         print(f"Database error: {e}")
     finally:
         conn.close()
 
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="流式导出数据库中的课程、章节、测验与题目")
+    parser.add_argument("--format", choices=("json", "ndjson"), default="json", help="输出格式（默认嵌套 JSON）")
+    parser.add_argument("--course-id", type=int, action="append", dest="course_ids",
+                        help="只导出指定课程，可重复传入")
+    parser.add_argument("--gzip", action="store_true", help="以 gzip 压缩输出")
+    parser.add_argument("--output", "-o", help=f"输出文件路径（默认 {OUTPUT_DIR}/{OUTPUT_BASENAME}.<format>[.gz]）")
+    args = parser.parse_args()
+    export_db_to_json(args.format, args.course_ids, args.gzip, args.output)
+
+
 if __name__ == "__main__":
-    os.makedirs("data", exist_ok=True)
-    export_db_to_json()
+    main()
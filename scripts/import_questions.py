@@ -0,0 +1,62 @@
+"""
+import_questions.py
+-------------------
+
+把题库文件批量导入数据库（见 backend/importer.py）：
+- export_db_to_json.py 导出的 NDJSON（.ndjson / .jsonl，可 .gz 压缩）或嵌套 JSON
+- run_all.py 生成的 ch*_questions.json，需用 --course-title 指定导入到哪门课程
+
+按内容哈希幂等导入，重复执行不会产生重复题目。
+
+用法（在项目根目录运行）：
+    python scripts/import_questions.py data/debug_db_dump.ndjson.gz
+    python scripts/import_questions.py experiments/output/ch*_questions.json --course-title 数据结构
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from backend.database import create_db_and_tables, engine  # noqa: E402
+from backend.importer import IMPORT_BATCH_SIZE, QuestionImporter, import_records, iter_input  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="批量导入题库（JSON / NDJSON）")
+    parser.add_argument("inputs", nargs="+", type=Path, help="输入文件")
+    parser.add_argument("--course-title", help="导入到指定课程（题库文件必填；导出文件默认沿用原课程标题）")
+    parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE, help="每个事务写入的题目数")
+    args = parser.parse_args()
+
+    create_db_and_tables()
+    started = time.perf_counter()
+    with engine.connect() as connection:
+        importer = QuestionImporter(connection, batch_size=args.batch_size)
+        for path in args.inputs:
+            if not path.exists():
+                print(f"[跳过] 文件不存在：{path}")
+                continue
+            print(f"正在导入：{path}")
+            try:
+                import_records(importer, iter_input(path), args.course_title)
+            except ValueError as e:
+                # 已写入的批次保留，重新运行时按内容哈希跳过
+                print(f"[ERROR] 导入 {path} 失败：{e}")
+                importer.finish()
+                sys.exit(1)
+        stats = importer.finish()
+
+    elapsed = time.perf_counter() - started
+    print(
+        f"导入完成（{elapsed:.1f}s）：新建课程 {stats.courses}、章节 {stats.chapters}、小节 {stats.sections}、测验 {stats.quizzes}；"
+        f"题目新增 {stats.inserted}、更新 {stats.updated}、未变化 {stats.unchanged}、无效 {stats.invalid}"
+    )
+
+
+if __name__ == "__main__":
+    main()
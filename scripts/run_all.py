@@ -44,6 +44,8 @@ python .\scripts\run_all.py `
 """
 
 import argparse
+import hashlib
+import re
 import shutil
 import subprocess
 import sys
@@ -58,6 +60,8 @@ PARSE_SCRIPT = REPO_ROOT / "experiments" / "parse_pdf_demo.py"
 GENERATE_SCRIPT = REPO_ROOT / "experiments" / "generate_questions_demo.py"
 RENDER_SCRIPT = REPO_ROOT / "experiments" / "render_questions_demo.py"
 FRONTEND_QUESTIONS_DIR = REPO_ROOT / "frontend" / "public" / "questions"
+# 带内容哈希的副本文件名长度，与 render_questions_demo.content_hash 保持一致
+CONTENT_HASH_LENGTH = 12
 
 
 def parse_chapters_arg(raw: Optional[str]) -> List[int]:
@@ -114,6 +118,29 @@ def slugify(value: str) -> str:
     return slug or "course"
 
 
+def sync_to_frontend(source: Path) -> Path:
+    """
+    复制文件到前端 questions 目录：
+    - 固定文件名（兼容现有前端按 chN_questions.* 读取）
+    - 带内容哈希的不可变副本（chN_questions.<hash>.md），后端会对其启用长期缓存
+    同名的旧哈希副本会被清理。
+    """
+    FRONTEND_QUESTIONS_DIR.mkdir(parents=True, exist_ok=True)
+    target = FRONTEND_QUESTIONS_DIR / source.name
+    shutil.copy2(source, target)
+
+    digest = hashlib.blake2b(source.read_bytes(), digest_size=16).hexdigest()
+    hashed_name = f"{source.stem}.{digest[:CONTENT_HASH_LENGTH]}{source.suffix}"
+    stale_pattern = re.compile(
+        rf"^{re.escape(source.stem)}\.[0-9a-f]{{{CONTENT_HASH_LENGTH}}}{re.escape(source.suffix)}$"
+    )
+    for existing in FRONTEND_QUESTIONS_DIR.iterdir():
+        if existing.name != hashed_name and stale_pattern.match(existing.name):
+            existing.unlink()
+    shutil.copy2(source, FRONTEND_QUESTIONS_DIR / hashed_name)
+    return target
+
+
 def process_chapter(
     chapter_id: int,
     chapter_title: str,
@@ -170,9 +197,7 @@ def process_chapter(
             ]
         )
         try:
-            FRONTEND_QUESTIONS_DIR.mkdir(parents=True, exist_ok=True)
-            target_json = FRONTEND_QUESTIONS_DIR / questions_json.name
-            shutil.copy2(questions_json, target_json)
+            target_json = sync_to_frontend(questions_json)
             print(f"[同步] 已复制题目 JSON 到前端目录：{target_json}")
         except Exception as exc:
             print(f"[警告] 同步题目 JSON 到前端目录失败：{exc}")
@@ -201,9 +226,7 @@ def process_chapter(
 
     # Step 4: 同步 Markdown 到前端 public/questions 目录
     try:
-        FRONTEND_QUESTIONS_DIR.mkdir(parents=True, exist_ok=True)
-        target_md = FRONTEND_QUESTIONS_DIR / markdown_file.name
-        shutil.copy2(markdown_file, target_md)
+        target_md = sync_to_frontend(markdown_file)
         print(f"[同步] 已复制 Markdown 到前端目录：{target_md}")
     except Exception as exc:
         print(f"[警告] 同步 Markdown 到前端目录失败（不影响主流程）：{exc}")